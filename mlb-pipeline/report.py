@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+MLB Pipeline Step Timings
+=========================
+Summarizes .pipeline_timings.jsonl (written by run_pipeline.py, one line per
+step run) into a per-mode, per-step table of run counts, failures and
+p50/p95/max wall time.
+
+Usage:
+  python report.py
+  python report.py path/to/timings.jsonl
+"""
+
+import sys
+import os
+
+import pandas as pd
+
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+TIMINGS_PATH = os.path.join(PIPELINE_DIR, ".pipeline_timings.jsonl")
+
+
+def summarize(df: pd.DataFrame) -> pd.DataFrame:
+    """Per (mode, script) timing stats in seconds."""
+    df = df.assign(mode=df["mode"].fillna("-"), failed=df["rc"] != 0)
+    grouped = df.groupby(["mode", "script"])
+    return pd.DataFrame({
+        "runs": grouped.size(),
+        "failed": grouped["failed"].sum(),
+        "p50": grouped["elapsed"].quantile(0.50),
+        "p95": grouped["elapsed"].quantile(0.95),
+        "max": grouped["elapsed"].max(),
+    }).round(1)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else TIMINGS_PATH
+    if not os.path.exists(path):
+        print(f"No timings found at {path}")
+        sys.exit(1)
+
+    df = pd.read_json(path, lines=True)
+    if df.empty:
+        print(f"No timings recorded in {path}")
+        return
+
+    first = pd.to_datetime(df["start"].min(), unit="s", utc=True)
+    last = pd.to_datetime(df["start"].max(), unit="s", utc=True)
+    print(f"\n  {len(df)} step runs, {first:%Y-%m-%d %H:%M} to {last:%Y-%m-%d %H:%M} UTC\n")
+    print(summarize(df).to_string())
+    print()
+
+
+if __name__ == "__main__":
+    main()
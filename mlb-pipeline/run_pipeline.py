@@ -10,23 +10,46 @@ Three modes designed for different scheduling cadences:
 
   current     — Daily delta update. Run once per day (early morning).
                 Refreshes players/playerstats for recent games, rebuilds
-                gamelogs for the last few days, and retrains the model.
+                gamelogs for the last few days, and retrains the model
+                (skipped when the training data fingerprint is unchanged).
 
   live        — Lightweight loop: games → gamelogs → predict.
                 Designed to run every ~10 minutes during game days to
                 capture newly posted lineups and generate predictions.
+                With --daemon it stays resident and repeats the sequence
+                every LIVE_INTERVAL_SEC (default 600) seconds.
+
+Every step runs in this interpreter through its src/<step>.py run(mode)
+entrypoint, so heavy imports and client set-up are paid once per process.
 
 Usage:
   python run_pipeline.py historical
+  python run_pipeline.py historical --resume   # skip steps finished last time
   python run_pipeline.py current
   python run_pipeline.py live
+  python run_pipeline.py live --daemon   # long-running loop, one pass per 10 min
+  python run_pipeline.py <mode> --isolated   # each step in a child process
+                                             # with a per-step deadline
 """
 
 import sys
 import os
+import json
+import fcntl
+import importlib
+import random
 import subprocess
+import tempfile
 import time
+import signal
 import logging
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from filelock import FileLock, Timeout
 
 logging.basicConfig(
     level=logging.INFO,
@@ -37,35 +60,325 @@ logger = logging.getLogger(__name__)
 PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
 SRC_DIR = os.path.join(PIPELINE_DIR, "src")
 
+# Steps are imported by bare module name (train.py/predict.py already do
+# `from gamelogs import ...`), so one interpreter holds a single copy of each.
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+# Imported step modules, kept warm across calls so repeated runs in the same
+# process skip interpreter start-up, heavy imports and client construction.
+_MODULES = {}
+
+
+def load_step(name: str):
+    """Import (or reuse) the module behind a pipeline script name."""
+    module_name = name[:-3] if name.endswith(".py") else name
+    if module_name not in _MODULES:
+        _MODULES[module_name] = importlib.import_module(module_name)
+    return _MODULES[module_name]
+
+
+# Per-step wall-clock limits for --isolated runs; a child still running
+# past its deadline is killed so a hung HTTP call can't stall the pipeline.
+# In-process steps can't be interrupted safely, so these only apply there.
+STEP_DEADLINE_SEC = {
+    ("games.py", "current"): 300,
+    ("games.py", "full"): 3600,
+    ("players.py", "current"): 300,
+    ("players.py", "full"): 900,
+    ("playerstats.py", "current"): 900,
+    ("playerstats.py", "full"): 5400,
+    ("gamelogs.py", "current"): 900,
+    ("gamelogs.py", "full"): 3600,
+    ("train.py", None): 1800,
+    ("train.py", "current"): 1800,
+    ("predict.py", None): 300,
+}
+
+# Run each step in its own child process (--isolated or PIPELINE_ISOLATED=1)
+# instead of in-process — trades start-up cost for crash isolation and
+# enforceable deadlines.
+ISOLATED = os.environ.get("PIPELINE_ISOLATED") == "1"
+
+
+def _run_in_process(name: str, mode: str | None, label: str) -> int:
+    try:
+        rc = load_step(name).run(mode)
+    except SystemExit as e:
+        rc = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        logger.exception(f"✗  {label} raised")
+        rc = 1
+    return rc
 
-def run_script(name: str, mode: str | None = None) -> bool:
-    """Run a pipeline script. Returns True on success."""
-    script = os.path.join(SRC_DIR, name)
-    cmd = [sys.executable, script]
+
+def _run_isolated(name: str, mode: str | None, label: str) -> int:
+    """Run a step as a child process, forwarding its combined stdout/stderr
+    line by line to the logger and killing it after its deadline."""
+    cmd = [sys.executable, os.path.join(SRC_DIR, name)]
     if mode:
         cmd.append(mode)
 
+    proc = subprocess.Popen(
+        cmd, cwd=PIPELINE_DIR,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, bufsize=1,
+        env=dict(os.environ, PYTHONUNBUFFERED="1"),
+    )
+
+    def _forward():
+        for line in proc.stdout:
+            line = line.rstrip()
+            if line:
+                logger.info(f"[{name}] {line}")
+
+    reader = threading.Thread(target=_forward, daemon=True)
+    reader.start()
+
+    deadline = STEP_DEADLINE_SEC.get((name, mode))
+    try:
+        rc = proc.wait(timeout=deadline)
+    except subprocess.TimeoutExpired:
+        logger.error(f"✗  {label} exceeded {deadline}s deadline — killing")
+        proc.kill()
+        proc.wait()
+        rc = 1
+
+    reader.join(timeout=5)
+    return rc
+
+
+def _exec_step(name: str, mode: str | None, label: str):
+    """Replace this process with the step's script (never returns)."""
+    cmd = [sys.executable, os.path.join(SRC_DIR, name)]
+    if mode:
+        cmd.append(mode)
+    logger.info(f"↪  {label} (exec, final step)")
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+    os.chdir(PIPELINE_DIR)
+    os.execv(sys.executable, cmd)
+
+
+# One JSON line per step run, for spotting which step regresses over time
+# (summarize with `python report.py`).
+TIMINGS_PATH = os.path.join(PIPELINE_DIR, ".pipeline_timings.jsonl")
+
+# Pipeline mode being run (historical/current/live), set by main()
+PIPELINE_MODE = None
+
+
+def record_timing(name: str, mode: str | None, started_at: float, elapsed: float, rc: int):
+    """Append a step timing record; flock keeps concurrent writers whole."""
+    record = {
+        "mode": PIPELINE_MODE,
+        "script": name,
+        "step_mode": mode,
+        "start": round(started_at, 3),
+        "elapsed": round(elapsed, 3),
+        "rc": rc,
+    }
+    try:
+        with open(TIMINGS_PATH, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(json.dumps(record) + "\n")
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    except OSError as e:
+        logger.warning(f"Could not record timing for {name}: {e}")
+
+
+def run_script(name: str, mode: str | None = None, final_exec: bool = False) -> bool:
+    """Run a pipeline script, in-process via its run(mode) entrypoint or as a
+    child process when ISOLATED. Returns True on success.
+
+    final_exec: in ISOLATED mode, exec the script in place of this process
+    instead of fork+wait — for the last step of a run that has nothing left
+    to do afterwards. Ignored in-process, where no child is spawned anyway."""
     label = f"{name} {mode}" if mode else name
-    logger.info(f"▶  {label}")
-    start = time.time()
 
-    result = subprocess.run(cmd, cwd=PIPELINE_DIR)
+    if final_exec and ISOLATED:
+        _exec_step(name, mode, label)
 
-    elapsed = time.time() - start
-    if result.returncode != 0:
-        logger.error(f"✗  {label} failed (exit {result.returncode}) [{elapsed:.1f}s]")
+    logger.info(f"▶  {label}")
+    started_at = time.time()
+    start = time.perf_counter()
+
+    if ISOLATED:
+        rc = _run_isolated(name, mode, label)
+    else:
+        rc = _run_in_process(name, mode, label)
+
+    elapsed = time.perf_counter() - start
+    record_timing(name, mode, started_at, elapsed, rc)
+    if rc:
+        logger.error(f"✗  {label} failed (exit {rc}) [{elapsed:.1f}s]")
         return False
 
     logger.info(f"✓  {label} [{elapsed:.1f}s]")
     return True
 
 
+# Inputs each step reads that an earlier step writes. players.py only talks
+# to the MLB API, so it runs alongside games.py; playerstats.py needs both
+# (lineups from mlb_games, player types from mlb_players).
+STEP_DEPS = {
+    "games.py": [],
+    "players.py": [],
+    "playerstats.py": ["games.py", "players.py"],
+    "gamelogs.py": ["games.py", "playerstats.py"],
+    "train.py": ["gamelogs.py"],
+    "predict.py": ["gamelogs.py", "train.py"],
+}
+
+MAX_PARALLEL_STEPS = 4
+
+# Rough peak resident memory per step (GB). run_dag only starts a step when
+# it fits next to the ones already running, so e.g. playerstats.py full and
+# train.py never overlap on a small runner.
+STEP_MEMORY_GB = {
+    "games.py": 1.0,
+    "players.py": 0.5,
+    "playerstats.py": 3.0,
+    "gamelogs.py": 3.0,
+    "train.py": 4.0,
+    "predict.py": 1.0,
+}
+
+
+def host_memory_gb() -> float:
+    """Memory budget for concurrent steps: PIPELINE_MEMORY_GB if set,
+    otherwise the host's physical memory (8 GB if it can't be read)."""
+    if os.environ.get("PIPELINE_MEMORY_GB"):
+        return float(os.environ["PIPELINE_MEMORY_GB"])
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3
+    except (AttributeError, ValueError, OSError):
+        return 8.0
+
+
+# Completion times of historical-mode steps, so `historical --resume` can
+# pick up after the step that failed instead of redoing ~30 minutes of work.
+CHECKPOINT_PATH = os.path.join(PIPELINE_DIR, ".state.json")
+
+
+def load_checkpoint() -> dict:
+    try:
+        with open(CHECKPOINT_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_checkpoint(state: dict):
+    with open(CHECKPOINT_PATH, "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def clear_checkpoint():
+    try:
+        os.remove(CHECKPOINT_PATH)
+    except FileNotFoundError:
+        pass
+
+
+def _is_checkpointed(script: str, deps, state: dict) -> bool:
+    """A step can be reused if it completed after every step it reads from."""
+    if script not in state:
+        return False
+    return all(dep in state and state[dep] <= state[script] for dep in deps)
+
+
+def run_dag(steps, max_workers: int = MAX_PARALLEL_STEPS,
+            memory_gb: float | None = None, state: dict | None = None) -> str | None:
+    """Run (script, mode) steps as a dependency graph (STEP_DEPS), starting
+    each step as soon as the steps it depends on have succeeded and its
+    STEP_MEMORY_GB fits in the remaining memory budget. A step bigger than
+    the whole budget still runs, alone. Steps are network/DB bound, so they
+    share this process on a thread pool.
+
+    state: checkpoint dict {script: completed_at}. When given, steps that
+    completed after all their dependencies are skipped, and each success is
+    recorded and saved to CHECKPOINT_PATH.
+
+    After a failure no new steps are started; in-flight ones are allowed to
+    finish. Returns the first failed script name, or None on success."""
+    budget = memory_gb if memory_gb is not None else host_memory_gb()
+    modes = dict(steps)
+    pending = {
+        script: {dep for dep in STEP_DEPS.get(script, []) if dep in modes}
+        for script in modes
+    }
+    done = set()
+    failed = None
+    in_use = 0.0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while pending or running:
+            progress = failed is None
+            while progress:
+                progress = False
+                ready = [script for script, deps in pending.items() if deps <= done]
+                for script in ready:
+                    if state is not None and _is_checkpointed(script, pending[script], state):
+                        del pending[script]
+                        done.add(script)
+                        progress = True  # may unblock dependents
+                        logger.info(f"✓  {script} (cached)")
+                        continue
+                    need = STEP_MEMORY_GB.get(script, 1.0)
+                    if running and in_use + need > budget:
+                        continue
+                    del pending[script]
+                    in_use += need
+                    running[pool.submit(run_script, script, modes[script])] = script
+
+            if not running:
+                # Nothing in flight: either everything is done (e.g. all
+                # steps were checkpointed) or an earlier failure (or an
+                # unsatisfiable dependency) blocks the rest.
+                if pending:
+                    failed = failed or next(iter(pending))
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                script = running.pop(future)
+                in_use -= STEP_MEMORY_GB.get(script, 1.0)
+                if future.result():
+                    done.add(script)
+                    if state is not None:
+                        state[script] = time.time()
+                        save_checkpoint(state)
+                elif failed is None:
+                    failed = script
+
+    return failed
+
+
+def run_steps(steps, final_exec: bool = False) -> str | None:
+    """Run (script, mode) steps in order, stopping at the first failure.
+    Returns the failed script name, or None if every step succeeded.
+    final_exec is passed to run_script for the last step."""
+    for i, (script, mode) in enumerate(steps):
+        last = i == len(steps) - 1
+        if not run_script(script, mode, final_exec=final_exec and last):
+            return script
+    return None
+
+
 # ─── Historical Mode ────────────────────────────────────────────────────────
-def run_historical():
+def run_historical(resume: bool = False):
     """
     Full rebuild from scratch. Backfills all data from 2020 to present.
 
-    Pipeline order:
+    Each completed step is checkpointed to CHECKPOINT_PATH. With resume=True
+    (`historical --resume`), steps that already completed after their
+    inputs are skipped. The checkpoint is cleared once the rebuild finishes.
+
+    Pipeline order (1 and 2 run concurrently, see STEP_DEPS):
       1. games.py full        — fetch all games + lineups
       2. players.py full      — fetch all player metadata
       3. playerstats.py full  — fetch all per-player game stats (~380k rows)
@@ -86,13 +399,18 @@ def run_historical():
         ("predict.py", None),
     ]
 
-    start = time.time()
-    for script, mode in steps:
-        if not run_script(script, mode):
-            logger.error(f"Pipeline aborted at {script}")
-            sys.exit(1)
+    state = load_checkpoint() if resume else {}
+    if resume and state:
+        logger.info(f"Resuming from checkpoint ({len(state)} steps completed)")
+
+    start = time.perf_counter()
+    failed = run_dag(steps, state=state)
+    if failed:
+        logger.error(f"Pipeline aborted at {failed} — rerun with --resume to continue")
+        sys.exit(1)
 
-    logger.info(f"Historical pipeline complete [{time.time() - start:.0f}s total]")
+    clear_checkpoint()
+    logger.info(f"Historical pipeline complete [{time.perf_counter() - start:.0f}s total]")
 
 
 # ─── Current Mode ───────────────────────────────────────────────────────────
@@ -100,12 +418,12 @@ def run_current():
     """
     Daily delta update. Run once per day, ideally early morning.
 
-    Pipeline order:
+    Pipeline order (1 and 2 run concurrently, see STEP_DEPS):
       1. games.py current        — fetch/update recent games + lineups
       2. players.py current      — add any new players this season
       3. playerstats.py current  — fetch stats for players in recent games
       4. gamelogs.py current     — recompute rolling features for recent games
-      5. train.py                — retrain model (picks up latest data)
+      5. train.py current        — retrain model unless training data is unchanged
       6. predict.py              — generate predictions for today
     """
     logger.info("=" * 60)
@@ -117,20 +435,135 @@ def run_current():
         ("players.py", "current"),
         ("playerstats.py", "current"),
         ("gamelogs.py", "current"),
-        ("train.py", None),
+        ("train.py", "current"),
         ("predict.py", None),
     ]
 
-    start = time.time()
-    for script, mode in steps:
-        if not run_script(script, mode):
-            logger.error(f"Pipeline aborted at {script}")
-            sys.exit(1)
+    start = time.perf_counter()
+    failed = run_dag(steps)
+    if failed:
+        logger.error(f"Pipeline aborted at {failed}")
+        sys.exit(1)
 
-    logger.info(f"Current pipeline complete [{time.time() - start:.0f}s total]")
+    logger.info(f"Current pipeline complete [{time.perf_counter() - start:.0f}s total]")
 
 
 # ─── Live Mode ──────────────────────────────────────────────────────────────
+LIVE_STEPS = [
+    ("games.py", "current"),
+    ("gamelogs.py", "current"),
+    ("predict.py", None),
+]
+
+LIVE_INTERVAL_SEC = int(os.environ.get("LIVE_INTERVAL_SEC", "600"))
+
+# Only one live run (or daemon) at a time. A run that finds the lock held
+# skips instead of racing the previous one on the DB. The holder records its
+# PID and a heartbeat next to the lock, refreshed from a background thread
+# while it holds the lock. A holder silent for STALE_LOCK_SEC is only
+# reported — the flock is released by the OS when that process exits.
+LIVE_LOCK_PATH = os.environ.get(
+    "MLB_LIVE_LOCK", os.path.join(tempfile.gettempdir(), "mlb_live.lock")
+)
+STALE_LOCK_SEC = 30 * 60
+HEARTBEAT_SEC = 60
+
+
+MLB_SCHEDULE_URL = "https://statsapi.mlb.com/api/v1/schedule"
+GAMES_TODAY_TTL_SEC = 3600
+
+# {date: (checked_at, has_games)} — lets the daemon probe at most hourly
+_games_today_cache = {}
+
+
+def _has_games_today() -> bool:
+    """True if MLB has regular-season games scheduled today (US/Eastern).
+    Fails open: if the schedule can't be read, assume there are games."""
+    today = datetime.now(ZoneInfo("America/New_York")).strftime("%Y-%m-%d")
+    cached = _games_today_cache.get(today)
+    if cached and time.time() - cached[0] < GAMES_TODAY_TTL_SEC:
+        return cached[1]
+
+    try:
+        resp = requests.get(MLB_SCHEDULE_URL, params={
+            "sportId": 1, "date": today, "gameType": "R",
+        }, timeout=5)
+        resp.raise_for_status()
+        has_games = resp.json().get("totalGames", 0) > 0
+    except Exception as e:
+        logger.warning(f"Schedule probe failed ({e}) — running live pipeline anyway")
+        return True
+
+    _games_today_cache.clear()
+    _games_today_cache[today] = (time.time(), has_games)
+    return has_games
+
+
+def _write_lock_heartbeat():
+    with open(LIVE_LOCK_PATH + ".info", "w") as f:
+        json.dump({"pid": os.getpid(), "heartbeat": time.time()}, f)
+
+
+# Set while this process holds the live lock; stops the heartbeat thread.
+_heartbeat_stop = None
+
+
+def _start_heartbeat() -> threading.Event:
+    """Refresh the lock heartbeat every HEARTBEAT_SEC until the returned
+    event is set, so long steps don't look hung."""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SEC):
+            try:
+                _write_lock_heartbeat()
+            except OSError as e:
+                logger.warning(f"Could not refresh live lock heartbeat: {e}")
+
+    threading.Thread(target=beat, name="live-lock-heartbeat", daemon=True).start()
+    return stop
+
+
+def _report_stale_lock():
+    """Log when the lock holder's heartbeat has gone quiet. Never signals
+    the holder: it may be mid-upsert, and its lock frees when it exits."""
+    try:
+        with open(LIVE_LOCK_PATH + ".info") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return
+
+    age = time.time() - info.get("heartbeat", 0)
+    if age >= STALE_LOCK_SEC:
+        logger.warning(f"Live lock held by pid {info.get('pid')} with no heartbeat for "
+                       f"{age / 60:.0f} min — it may be hung; leaving it alone")
+
+
+def acquire_live_lock() -> FileLock | None:
+    """Take the live-mode lock without waiting. Returns the held lock, or
+    None if another live run holds it. Release with release_live_lock."""
+    global _heartbeat_stop
+    lock = FileLock(LIVE_LOCK_PATH)
+    try:
+        lock.acquire(timeout=0)
+    except Timeout:
+        logger.info("Previous live run still active, skipping")
+        _report_stale_lock()
+        return None
+    _write_lock_heartbeat()
+    _heartbeat_stop = _start_heartbeat()
+    return lock
+
+
+def release_live_lock(lock: FileLock):
+    """Stop the heartbeat and release the live-mode lock."""
+    global _heartbeat_stop
+    if _heartbeat_stop is not None:
+        _heartbeat_stop.set()
+        _heartbeat_stop = None
+    lock.release()
+
+
 def run_live():
     """
     Lightweight refresh: games → gamelogs → predict.
@@ -146,19 +579,82 @@ def run_live():
     logger.info("  MLB PIPELINE — LIVE (lineup capture + predict)")
     logger.info("=" * 60)
 
-    steps = [
-        ("games.py", "current"),
-        ("gamelogs.py", "current"),
-        ("predict.py", None),
-    ]
-
-    start = time.time()
-    for script, mode in steps:
-        if not run_script(script, mode):
-            logger.error(f"Pipeline aborted at {script}")
+    if not _has_games_today():
+        logger.info("No games today; skipping live pipeline")
+        return
+
+    # Cron fires on the :00/:10 marks like every other scraper; spread our
+    # StatsAPI/DB burst over a short random window. LIVE_JITTER_SEC=0 disables.
+    jitter = float(os.environ.get("LIVE_JITTER_SEC", "30"))
+    if jitter > 0:
+        delay = random.uniform(0, jitter)
+        logger.info(f"Jitter: sleeping {delay:.1f}s")
+        time.sleep(delay)
+
+    lock = acquire_live_lock()
+    if lock is None:
+        return
+
+    try:
+        start = time.perf_counter()
+        # With --isolated, predict.py is exec'd in place of this process
+        # (the lock fd is close-on-exec, so the lock is released then).
+        failed = run_steps(LIVE_STEPS, final_exec=True)
+        if failed:
+            logger.error(f"Pipeline aborted at {failed}")
             sys.exit(1)
 
-    logger.info(f"Live pipeline complete [{time.time() - start:.0f}s total]")
+        logger.info(f"Live pipeline complete [{time.perf_counter() - start:.0f}s total]")
+    finally:
+        release_live_lock(lock)
+
+
+def run_live_daemon(interval: int = LIVE_INTERVAL_SEC):
+    """
+    Run the live sequence forever, once every `interval` seconds.
+
+    Step modules stay imported between iterations, so their HTTP sessions
+    and Supabase clients (and the connections they pool) are reused instead
+    of being rebuilt by a fresh interpreter every 10 minutes. A failed
+    iteration is logged and retried on the next tick. SIGTERM/SIGINT stop
+    the loop after the current iteration.
+    """
+    logger.info("=" * 60)
+    logger.info(f"  MLB PIPELINE — LIVE DAEMON (every {interval}s)")
+    logger.info("=" * 60)
+
+    stop = threading.Event()
+
+    def _request_stop(signum, frame):
+        logger.info(f"Received signal {signum} — stopping after current iteration")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    lock = acquire_live_lock()
+    if lock is None:
+        return
+
+    try:
+        while not stop.is_set():
+            if not _has_games_today():
+                logger.info("No games today; skipping live iteration")
+                stop.wait(interval)
+                continue
+
+            start = time.perf_counter()
+            failed = run_steps(LIVE_STEPS)
+            elapsed = time.perf_counter() - start
+            if failed:
+                logger.error(f"Live iteration aborted at {failed} [{elapsed:.0f}s]")
+            else:
+                logger.info(f"Live iteration complete [{elapsed:.0f}s]")
+            stop.wait(max(0.0, interval - elapsed))
+    finally:
+        release_live_lock(lock)
+
+    logger.info("Live daemon stopped")
 
 
 # ─── CLI Entry Point ────────────────────────────────────────────────────────
@@ -175,7 +671,22 @@ def main():
         print(f"Available modes: {', '.join(MODES.keys())}")
         sys.exit(1)
 
+    global ISOLATED, PIPELINE_MODE
+
     mode = sys.argv[1]
+    flags = sys.argv[2:]
+    PIPELINE_MODE = mode
+    if "--isolated" in flags:
+        ISOLATED = True
+
+    if mode == "live" and "--daemon" in flags:
+        run_live_daemon()
+        return
+
+    if mode == "historical":
+        run_historical(resume="--resume" in flags)
+        return
+
     MODES[mode]()
 
 
@@ -0,0 +1,158 @@
+# mlb-pipeline/src/cache.py
+"""
+Shared HTTP session for MLB Stats API calls.
+
+Wraps requests in a SQLite-backed requests_cache session with per-endpoint
+TTLs, so repeated runs (live mode every ~10 minutes, the live daemon, a
+retried backfill) don't re-download data that can't have changed yet.
+Expired entries that carried an ETag/Last-Modified are revalidated with a
+conditional request rather than downloaded again.
+
+Requests that reach the network are paced by a token bucket shared by every
+session in the process ($MLB_API_RATE per second, bursts of $MLB_API_BURST),
+so parallel fetchers stay under MLB's limit instead of backing off on 429s.
+
+High fan-out endpoints (per-game live feeds) can instead use an uncached
+HTTP/2 httpx client, multiplexing concurrent requests over a few
+connections; http2_get applies the same token bucket and retry policy.
+
+Cache file: $MLB_CACHE_PATH, default mlb-pipeline/.cache/mlb_http.sqlite
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+import httpx
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession, DO_NOT_CACHE
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # optional — falls back to the stdlib decoder
+    orjson = None
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[1] / ".cache" / "mlb_http.sqlite"
+
+# TTLs in seconds, first matching pattern wins. Anything not listed is
+# passed straight through.
+URLS_EXPIRE_AFTER = {
+    "statsapi.mlb.com/api/v1/schedule*": 300,
+    # Under a day, so a daily run that starts a little earlier than
+    # yesterday's still refetches rosters.
+    "statsapi.mlb.com/api/v1/sports/1/players*": 20 * 3600,
+    "statsapi.mlb.com/api/v1/teams/*/roster*": 20 * 3600,
+    "statsapi.mlb.com/api/v1.1/game/*/feed/live*": 60,
+    # Per-player game logs: past seasons never change. Callers revalidate
+    # the in-progress season per request (see playerstats.fetch_player_gamelog).
+    "statsapi.mlb.com/api/v1/people/*/stats*": 30 * 86400,
+    "*": DO_NOT_CACHE,
+}
+
+
+# Connections kept per host. Callers that fan out across threads (lineup and
+# gameLog fetches) size their worker pools to this so no request waits on the
+# pool; raising $MLB_HTTP_POOL_SIZE raises both together.
+POOL_MAXSIZE = int(os.getenv("MLB_HTTP_POOL_SIZE", "32"))
+
+
+RATE_PER_SEC = float(os.getenv("MLB_API_RATE", "20"))
+BURST = int(os.getenv("MLB_API_BURST", "40"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket. acquire() takes one token, sleeping until
+    the bucket has refilled enough when it is empty."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Going negative reserves a slot, so waiters queue in call order.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+BUCKET = TokenBucket(RATE_PER_SEC, BURST)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter that takes a BUCKET token per request. Cache hits are
+    answered by requests_cache before reaching the adapter, so they are free."""
+
+    def send(self, request, **kwargs):
+        BUCKET.acquire()
+        return super().send(request, **kwargs)
+
+
+def response_json(resp):
+    """Decode a Stats API response body; orjson when available (live feeds
+    run to several hundred KB)."""
+    if orjson is None:
+        return resp.json()
+    return orjson.loads(resp.content)
+
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 2
+
+
+def create_http2_client():
+    """Uncached HTTP/2 client for many concurrent requests to one host.
+    Callers revalidate with their own ETags (see games.fetch_lineup)."""
+    limits = httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_MAXSIZE)
+    transport = httpx.HTTPTransport(http2=True, retries=RETRY_TOTAL, limits=limits)
+    return httpx.Client(http2=True, transport=transport, timeout=30)
+
+
+def http2_get(client, url, **kwargs):
+    """GET through client with the session's pacing and retry policy:
+    one BUCKET token per attempt, exponential backoff (or Retry-After) on
+    429/5xx. The last response is returned whatever its status."""
+    for attempt in range(RETRY_TOTAL + 1):
+        BUCKET.acquire()
+        resp = client.get(url, **kwargs)
+        if resp.status_code not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+            return resp
+        retry_after = resp.headers.get("Retry-After")
+        time.sleep(float(retry_after) if retry_after and retry_after.isdigit()
+                   else RETRY_BACKOFF * 2 ** attempt)
+
+
+def cache_path():
+    return Path(os.getenv("MLB_CACHE_PATH") or DEFAULT_CACHE_PATH)
+
+
+def create_session():
+    """Rate-limit-safe, response-caching session for the MLB Stats API."""
+    path = cache_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    session = CachedSession(
+        str(path),
+        backend="sqlite",
+        urls_expire_after=URLS_EXPIRE_AFTER,
+        allowable_methods=("GET",),
+    )
+    retry_strategy = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=list(RETRY_STATUSES),
+        allowed_methods=["GET"],
+    )
+    adapter = RateLimitedAdapter(max_retries=retry_strategy, pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    return session
@@ -5,7 +5,7 @@ Generates one row per game with pre-game rolling features.
 Individual player rolling stats → weighted team features.
 
 Modes:
-- full:    backfill 2020 to present (delete + full insert)
+- full:    backfill 2020 to present (full upsert, stale rows pruned)
 - current: games from last 3 days (delta upsert), 120-day history window
 
 Rolling features:
@@ -19,6 +19,8 @@ All data from Supabase (no MLB API calls). No data leakage (shift(1)).
 """
 
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 
@@ -26,6 +28,7 @@ REPO_ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(REPO_ROOT))
 
 import os
+import time
 import logging
 import pandas as pd
 import numpy as np
@@ -50,6 +53,8 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 PAGE_SIZE = 1000
 UPSERT_BATCH_SIZE = 400
+UPSERT_WORKERS = 8  # concurrent upsert batches; the supabase client pools connections
+PREFETCH_WORKERS = 8  # concurrent page requests in fetch_paginated
 
 # Batting stats for rolling averages
 BATTING_ROLLING_STATS = ["BA", "OBP", "SLG", "OPS", "R", "HR", "RBI", "BB", "SO", "SB"]
@@ -66,69 +71,168 @@ WINDOWS = [10, 50]
 # Lineup weights: batter 1 = 9, batter 2 = 8, ..., batter 9 = 1
 LINEUP_WEIGHTS = np.array([9, 8, 7, 6, 5, 4, 3, 2, 1], dtype=float)
 LINEUP_WEIGHTS_NORM = LINEUP_WEIGHTS / LINEUP_WEIGHTS.sum()  # sum to 1.0
+_SLOT_BITS = 1 << np.arange(9)
+
+
+def _lineup_weights_by_mask():
+    """Re-normalized lineup weights for every "which slots have data" bitmask
+    (bit i = batter i+1), so missing batters never need a per-game division.
+    Row 0 (nobody) is all zeros. float32 to match the feature table."""
+    masked = LINEUP_WEIGHTS * ((np.arange(1 << 9)[:, None] & _SLOT_BITS) > 0)
+    totals = masked.sum(axis=1, keepdims=True)
+    return np.divide(masked, totals, out=np.zeros_like(masked), where=totals > 0).astype(np.float32)
+
+
+LINEUP_WEIGHTS_BY_MASK = _lineup_weights_by_mask()
 
 
 # ---------------------------------------------------------------------------
 # Paginated Supabase fetch
 # ---------------------------------------------------------------------------
-def fetch_paginated(table, select, filters=None, order_col=None, max_retries=3):
-    """Paginated Supabase fetch with retry on timeout. order_col ensures
-    stable pagination — without it, rows can shift between pages."""
-    all_rows = []
-    offset = 0
-    while True:
-        for attempt in range(1, max_retries + 1):
-            try:
-                query = supabase.table(table).select(select)
-                for method, col, val in (filters or []):
-                    query = getattr(query, method)(col, val)
-                if order_col:
-                    query = query.order(order_col)
+def _fetch_page(table, select, filters, order_col, offset, count=None, max_retries=3):
+    """Fetch one PAGE_SIZE page starting at offset (or just the first PAGE_SIZE
+    rows when offset is None), retrying on statement timeout."""
+    for attempt in range(1, max_retries + 1):
+        try:
+            kwargs = {"count": count} if count else {}
+            query = supabase.table(table).select(select, **kwargs)
+            for method, col, val in (filters or []):
+                # Dotted methods chain, e.g. "not_.is_" -> query.not_.is_(col, val)
+                fn = query
+                for attr in method.split("."):
+                    fn = getattr(fn, attr)
+                query = fn(col, val)
+            if order_col:
+                query = query.order(order_col)
+            if offset is None:
+                query = query.limit(PAGE_SIZE)
+            else:
                 query = query.range(offset, offset + PAGE_SIZE - 1)
-                response = query.execute()
-                break
-            except Exception as e:
-                if "57014" in str(e) and attempt < max_retries:
-                    wait = attempt * 2
-                    logger.warning(f"  Query timeout (attempt {attempt}/{max_retries}), retrying in {wait}s...")
-                    import time
-                    time.sleep(wait)
-                else:
-                    raise
+            return query.execute()
+        except Exception as e:
+            if "57014" in str(e) and attempt < max_retries:
+                wait = attempt * 2
+                logger.warning(f"  Query timeout (attempt {attempt}/{max_retries}), retrying in {wait}s...")
+                time.sleep(wait)
+            else:
+                raise
+
+
+def _keyset_pages(table, select, filters, keyset_col, max_retries=3):
+    """Keyset pagination: each page is `keyset_col > last seen value`, so the
+    server seeks the index instead of scanning and discarding OFFSET rows.
+    Yields one list of rows per page."""
+    last = None
+    while True:
+        page_filters = list(filters or [])
+        if last is not None:
+            page_filters.append(("gt", keyset_col, last))
+        response = _fetch_page(table, select, page_filters, keyset_col, None, max_retries=max_retries)
         batch = response.data or []
-        all_rows.extend(batch)
+        yield batch
         if len(batch) < PAGE_SIZE:
-            break
+            return
+        last = batch[-1][keyset_col]
+
+
+def _fetch_keyset(table, select, filters, keyset_col, max_retries=3):
+    all_rows = []
+    for batch in _keyset_pages(table, select, filters, keyset_col, max_retries):
+        all_rows.extend(batch)
+    return all_rows
+
+
+def fetch_paginated(table, select, filters=None, order_col=None, max_retries=3, keyset_col=None):
+    """Paginated Supabase fetch with retry on timeout. order_col ensures
+    stable pagination — without it, rows can shift between pages.
+
+    With keyset_col (a unique, selected column) pages are fetched by keyset,
+    which stays cheap deep into large tables. Otherwise the first page also
+    asks for the exact row count and the remaining pages are fetched
+    concurrently and concatenated in offset order."""
+    if keyset_col:
+        return _fetch_keyset(table, select, filters, keyset_col, max_retries)
+
+    first = _fetch_page(table, select, filters, order_col, 0, count="exact", max_retries=max_retries)
+    all_rows = list(first.data or [])
+    if len(all_rows) < PAGE_SIZE:
+        return all_rows
+
+    total = first.count if isinstance(first.count, int) else 0
+    offsets = list(range(PAGE_SIZE, total, PAGE_SIZE))
+    batch = all_rows
+    if offsets:
+        with ThreadPoolExecutor(max_workers=min(PREFETCH_WORKERS, len(offsets))) as executor:
+            pages = executor.map(
+                lambda off: _fetch_page(table, select, filters, order_col, off, max_retries=max_retries),
+                offsets,
+            )
+            for response in pages:
+                batch = response.data or []
+                all_rows.extend(batch)
+
+    # Rows added after the count (or no count at all): continue serially.
+    offset = offsets[-1] + PAGE_SIZE if offsets else PAGE_SIZE
+    while len(batch) == PAGE_SIZE:
+        batch = _fetch_page(table, select, filters, order_col, offset, max_retries=max_retries).data or []
+        all_rows.extend(batch)
         offset += PAGE_SIZE
     return all_rows
 
 
+def _date_chunks(filters, date_col, date_from, date_to, chunk_days):
+    """Yield (chunk_start, chunk_end, filters) for consecutive date chunks."""
+    chunk_start = date_from
+    while chunk_start < date_to:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days), date_to)
+        chunk_filters = list(filters or [])
+        chunk_filters.append(("gte", date_col, chunk_start.isoformat()))
+        chunk_filters.append(("lte", date_col, chunk_end.isoformat()))
+        yield chunk_start, chunk_end, chunk_filters
+        chunk_start = chunk_end + timedelta(days=1)
+
+
 def fetch_paginated_chunked(table, select, filters=None, order_col=None,
                             date_col=None, date_from=None, date_to=None,
-                            chunk_days=7):
+                            chunk_days=7, keyset_col=None):
     """Fetch large date ranges by splitting into smaller date chunks to avoid
     Supabase statement timeouts. Falls back to regular fetch if no date
     range is provided."""
     if not (date_col and date_from and date_to):
-        return fetch_paginated(table, select, filters, order_col)
+        return fetch_paginated(table, select, filters, order_col, keyset_col=keyset_col)
 
     all_rows = []
-    chunk_start = date_from
-    chunk_num = 0
-    while chunk_start < date_to:
-        chunk_end = min(chunk_start + timedelta(days=chunk_days), date_to)
-        chunk_filters = list(filters or [])
-        chunk_filters.append(("gte", date_col, chunk_start.isoformat()))
-        chunk_filters.append(("lte", date_col, chunk_end.isoformat()))
-        rows = fetch_paginated(table, select, chunk_filters, order_col)
+    chunks = _date_chunks(filters, date_col, date_from, date_to, chunk_days)
+    for chunk_num, (chunk_start, chunk_end, chunk_filters) in enumerate(chunks, 1):
+        rows = fetch_paginated(table, select, chunk_filters, order_col, keyset_col=keyset_col)
         all_rows.extend(rows)
-        chunk_num += 1
         if rows:
             logger.info(f"  chunk {chunk_num}: {chunk_start.date()} to {chunk_end.date()} → {len(rows)} rows")
-        chunk_start = chunk_end + timedelta(days=1)
     return all_rows
 
 
+def fetch_frame(table, select, keyset_col, filters=None,
+                date_col=None, date_from=None, date_to=None, chunk_days=7):
+    """Keyset-paginated fetch straight into a DataFrame.
+
+    Each page is converted to a columnar frame as soon as it arrives, so
+    the row dicts of only one page are alive at a time instead of the
+    whole result. Date chunking works as in fetch_paginated_chunked.
+    Returns an empty DataFrame when nothing matches."""
+    columns = None if select == "*" else [c.strip() for c in select.split(",")]
+    if date_col and date_from and date_to:
+        chunks = [f for _, _, f in _date_chunks(filters, date_col, date_from, date_to, chunk_days)]
+    else:
+        chunks = [filters]
+
+    frames = []
+    for chunk_filters in chunks:
+        for batch in _keyset_pages(table, select, chunk_filters, keyset_col):
+            if batch:
+                frames.append(pd.DataFrame.from_records(batch, columns=columns))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
 # ---------------------------------------------------------------------------
 # 1. Fetch games and playerstats from Supabase
 # ---------------------------------------------------------------------------
@@ -141,17 +245,15 @@ def fetch_games(date_from=None, date_to=None, season_ids=None):
     if season_ids:
         filters.append(("in_", "SEASON_ID", season_ids))
 
-    rows = fetch_paginated("mlb_games", "*", filters, order_col="GAME_ID")
-    if not rows:
-        return pd.DataFrame()
+    df = fetch_frame("mlb_games", "*", "GAME_ID", filters)
+    if df.empty:
+        return df
 
-    df = pd.DataFrame(rows)
     for col in ["GAME_ID", "SEASON_ID", "AWAY_ID", "HOME_ID", "GAME_STATUS",
                  "GAME_OUTCOME", "AWAY_RUNS", "HOME_RUNS", "TOTAL_RUNS",
                  "HOME_SP", "AWAY_SP"]:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
-    df["GAME_DATE"] = pd.to_datetime(df["GAME_DATE"], utc=True)
     return df
 
 
@@ -166,20 +268,18 @@ def fetch_batting_stats(date_from=None, date_to=None, season_ids=None):
         "AB", "H", "R", "HR", "RBI", "BB", "SO", "SB", "PA",
         "BA", "OBP", "SLG", "OPS",
     ])
-    rows = fetch_paginated_chunked(
-        "mlb_playerstats", select + ",id", filters, order_col="id",
+    df = fetch_frame(
+        "mlb_playerstats", select + ",id", "id", filters,
         date_col="GAME_DATE", date_from=date_from, date_to=date_to,
     )
-    if not rows:
-        return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    df["GAME_DATE"] = pd.to_datetime(df["GAME_DATE"], utc=True)
+    if df.empty:
+        return df
     for col in ["GAME_ID", "PLAYER_ID", "TEAM_ID"]:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
     for col in BATTING_ROLLING_STATS:
         if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float32)
     return df
 
 
@@ -194,93 +294,215 @@ def fetch_pitching_stats(date_from=None, date_to=None, season_ids=None):
         "IP", "H_P", "R_P", "ER", "BB_P", "SO_P", "HR_P", "BF", "PIT",
         "ERA", "WHIP",
     ])
-    rows = fetch_paginated_chunked(
-        "mlb_playerstats", select + ",id", filters, order_col="id",
+    df = fetch_frame(
+        "mlb_playerstats", select + ",id", "id", filters,
         date_col="GAME_DATE", date_from=date_from, date_to=date_to,
     )
-    if not rows:
-        return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    df["GAME_DATE"] = pd.to_datetime(df["GAME_DATE"], utc=True)
+    if df.empty:
+        return df
     for col in ["GAME_ID", "PLAYER_ID", "TEAM_ID"]:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
     for col in PITCHING_ROLLING_STATS:
         if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float32)
     return df
 
 
+def fetch_concurrently(*calls):
+    """Run independent (fn, kwargs) fetches in parallel; results in call order."""
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        futures = [executor.submit(fn, **kwargs) for fn, kwargs in calls]
+        return [f.result() for f in futures]
+
+
 # ---------------------------------------------------------------------------
 # 2. Compute individual player rolling stats
 # ---------------------------------------------------------------------------
+def _date_key(dates):
+    """GAME_DATE as UTC datetimes, for ordering only.
+
+    Fetched frames keep GAME_DATE as the raw ISO string from Supabase; it is
+    parsed here just where sorting or date comparisons need it.
+    """
+    return pd.to_datetime(dates, utc=True)
+
+
+def _group_starts(keys):
+    """For rows sorted by key, the index of each row's group start."""
+    n = len(keys)
+    if n == 0:
+        return np.zeros(0, dtype=np.intp)
+    starts = np.r_[0, np.flatnonzero(keys[1:] != keys[:-1]) + 1]
+    return np.repeat(starts, np.diff(np.r_[starts, n]))
+
+
+def _shifted_rolling_mean(values, group_start, window):
+    """Per-group shift(1).rolling(window, min_periods=1) mean and count.
+
+    values is (n_rows, n_stats), sorted by group; group_start is from
+    _group_starts. Uses running sums, so it is O(n) regardless of window
+    size. Non-finite values count as missing. Sums accumulate in float64
+    whatever the input dtype. Returns (mean, count) with NaN mean where the
+    window has no values.
+    """
+    n = len(values)
+    finite = np.isfinite(values)
+    csum = np.zeros((n + 1, values.shape[1]))
+    csum[1:] = np.cumsum(np.where(finite, values, 0.0), axis=0, dtype=np.float64)
+    ccount = np.zeros((n + 1, values.shape[1]), dtype=np.int64)
+    ccount[1:] = np.cumsum(finite, axis=0)
+
+    # Window for row i covers rows [max(i - window, group start), i) — the
+    # previous `window` games of the same group, never the current one.
+    end = np.arange(n)
+    begin = np.maximum(end - window, group_start)
+    count = ccount[end] - ccount[begin]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(count > 0, (csum[end] - csum[begin]) / count, np.nan)
+    return mean, count
+
+
+def _rolling_by_player(stats_df, stat_map):
+    """Vectorized per-player rolling means for every window in one pass.
+
+    stat_map maps source columns to output names. Returns a DataFrame
+    sorted by (PLAYER_ID, GAME_DATE, GAME_ID) with PLAYER_ID, GAME_ID and
+    one "{out_stat}_{window}" column per stat/window. shift(1) = no leakage.
+    """
+    src_cols = [c for c in stat_map if c in stats_df.columns]
+    df = stats_df[stats_df["PLAYER_ID"].notna() & stats_df["GAME_ID"].notna()]
+    df = (df.assign(_DATE_KEY=_date_key(df["GAME_DATE"]))
+          .sort_values(["PLAYER_ID", "_DATE_KEY", "GAME_ID"])
+          .reset_index(drop=True))
+
+    out = df[["PLAYER_ID", "GAME_ID"]].copy()
+    if not src_cols:
+        return out
+
+    values = df[src_cols].to_numpy(dtype=np.float32, na_value=np.nan)
+    group_start = _group_starts(df["PLAYER_ID"].to_numpy(dtype=np.int64))
+    for window in WINDOWS:
+        rolled, _ = _shifted_rolling_mean(values, group_start, window)
+        for k, src in enumerate(src_cols):
+            out[f"{stat_map[src]}_{window}"] = rolled[:, k].astype(np.float32)
+    return out
+
+
+@dataclass
+class PlayerRolling:
+    """Per-player rolling stats as one contiguous table.
+
+    values is a float32 (n_player_games + 1, n_stat_windows) matrix whose
+    last row is all-NaN and stands in for unknown players. row_index maps
+    (player_id, game_id) to a row; latest maps player_id to the row of the
+    player's most recent game; columns names the stat_window columns.
+
+    player_index dictionary-encodes PLAYER_ID: a player's position in it is
+    their code, and latest_rows[code] is the same row as latest[player_id].
+    """
+    columns: list
+    values: np.ndarray
+    row_index: dict = field(default_factory=dict)
+    latest: dict = field(default_factory=dict)
+    player_index: pd.Index = field(default_factory=lambda: pd.Index([], dtype=np.int64))
+    latest_rows: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.intp))
+    _index: tuple = field(default=None, init=False, repr=False)
+
+    @property
+    def missing_row(self):
+        """Index of the trailing all-NaN row."""
+        return len(self.values) - 1
+
+    def lookup(self, player_id, game_id, latest=None):
+        """Row for (player_id, game_id), falling back to the player's latest row."""
+        row = self.row_index.get((player_id, game_id))
+        if row is None:
+            row = (self.latest if latest is None else latest).get(player_id, self.missing_row)
+        return row
+
+    def lookup_many(self, player_ids, game_ids, latest=None):
+        """Vectorized lookup() over parallel id arrays; returns an intp row array."""
+        player_ids = np.asarray(player_ids, dtype=np.int64)
+        game_ids = np.asarray(game_ids, dtype=np.int64)
+        if self._index is None:
+            keys = list(self.row_index)
+            self._index = (pd.MultiIndex.from_tuples(keys, names=["PLAYER_ID", "GAME_ID"])
+                           if keys else None,
+                           np.fromiter(self.row_index.values(), dtype=np.intp, count=len(keys)))
+        index, index_rows = self._index
+
+        rows = np.full(len(player_ids), -1, dtype=np.intp)
+        if index is not None and len(player_ids):
+            pos = index.get_indexer(pd.MultiIndex.from_arrays([player_ids, game_ids]))
+            rows[pos >= 0] = index_rows[pos[pos >= 0]]
+        miss = rows < 0
+        if not miss.any():
+            return rows
+        if latest is None or latest is self.latest:
+            # Unknown players get code -1, which picks the appended missing row.
+            codes = self.player_index.get_indexer(player_ids[miss])
+            rows[miss] = np.append(self.latest_rows, self.missing_row)[codes]
+        else:
+            fallback = pd.Series(latest, dtype="float64")
+            rows[miss] = (fallback.reindex(player_ids[miss])
+                          .fillna(self.missing_row).to_numpy(dtype=np.intp))
+        return rows
+
+    def as_dict(self, row):
+        """{stat_window: value} for one row. NaN becomes None."""
+        return {col: (None if np.isnan(v) else float(v))
+                for col, v in zip(self.columns, self.values[row])}
+
+
+def _rolling_table(rolled, columns):
+    """Pack a _rolling_by_player frame into a PlayerRolling table."""
+    keys = [c for c in columns if c in rolled.columns]
+    values = np.full((len(rolled) + 1, len(keys)), np.nan, dtype=np.float32)
+    values[:-1] = rolled[keys].to_numpy(dtype=np.float32, na_value=np.nan)
+
+    pid_arr = rolled["PLAYER_ID"].to_numpy(dtype=np.int64)
+    pids = pid_arr.tolist()
+    gids = rolled["GAME_ID"].astype(int).tolist()
+    row_index = dict(zip(zip(pids, gids), range(len(pids))))
+
+    # Rows are sorted by (PLAYER_ID, GAME_DATE, GAME_ID): each player's last
+    # row is their most recent game, and players appear in code order.
+    players = pd.Categorical(pid_arr)
+    codes = players.codes
+    latest_rows = np.flatnonzero(np.r_[codes[1:] != codes[:-1], True]) if pids else np.empty(0, dtype=np.intp)
+    latest = dict(zip(players.categories.tolist(), latest_rows.tolist()))
+    return PlayerRolling(columns=keys, values=values, row_index=row_index, latest=latest,
+                         player_index=players.categories, latest_rows=latest_rows)
+
+
+def _rolling_columns(stat_map):
+    return [f"{out}_{window}" for window in WINDOWS for out in stat_map.values()]
+
+
 def compute_player_batting_rolling(batting_df):
     """Compute per-player rolling batting averages. shift(1) = no leakage."""
+    stat_map = {stat: stat for stat in BATTING_ROLLING_STATS}
+    columns = _rolling_columns(stat_map)
     if batting_df.empty:
-        return {}
-
-    batting_df = batting_df.sort_values(["PLAYER_ID", "GAME_DATE", "GAME_ID"]).reset_index(drop=True)
+        return PlayerRolling(columns=columns, values=np.full((1, len(columns)), np.nan, dtype=np.float32))
 
-    player_rolling = {}  # {player_id: {game_id: {stat_window: value}}}
-
-    for pid, group in batting_df.groupby("PLAYER_ID"):
-        player_rolling[int(pid)] = {}
-        for _, row in group.iterrows():
-            gid = int(row["GAME_ID"])
-            player_rolling[int(pid)][gid] = {}
-
-        for window in WINDOWS:
-            for stat in BATTING_ROLLING_STATS:
-                if stat not in group.columns:
-                    continue
-                rolled = group[stat].shift(1).rolling(window, min_periods=1).mean()
-                for i, (_, row) in enumerate(group.iterrows()):
-                    gid = int(row["GAME_ID"])
-                    val = rolled.iloc[i]
-                    player_rolling[int(pid)][gid][f"{stat}_{window}"] = val if pd.notna(val) else None
-
-    return player_rolling
+    return _rolling_table(_rolling_by_player(batting_df, stat_map), columns)
 
 
 def compute_player_pitching_rolling(pitching_df):
     """Compute per-player rolling pitching averages. shift(1) = no leakage."""
+    columns = _rolling_columns(PITCHING_STAT_MAP)
     if pitching_df.empty:
-        return {}
+        return PlayerRolling(columns=columns, values=np.full((1, len(columns)), np.nan, dtype=np.float32))
 
-    pitching_df = pitching_df.sort_values(["PLAYER_ID", "GAME_DATE", "GAME_ID"]).reset_index(drop=True)
+    return _rolling_table(_rolling_by_player(pitching_df, PITCHING_STAT_MAP), columns)
 
-    player_rolling = {}
 
-    for pid, group in pitching_df.groupby("PLAYER_ID"):
-        player_rolling[int(pid)] = {}
-        for _, row in group.iterrows():
-            gid = int(row["GAME_ID"])
-            player_rolling[int(pid)][gid] = {}
-
-        for window in WINDOWS:
-            for src_stat, out_stat in PITCHING_STAT_MAP.items():
-                if src_stat not in group.columns:
-                    continue
-                rolled = group[src_stat].shift(1).rolling(window, min_periods=1).mean()
-                for i, (_, row) in enumerate(group.iterrows()):
-                    gid = int(row["GAME_ID"])
-                    val = rolled.iloc[i]
-                    player_rolling[int(pid)][gid][f"{out_stat}_{window}"] = val if pd.notna(val) else None
-
-    return player_rolling
-
-
-def get_latest_player_rolling(player_rolling_dict):
-    """Get the most recent rolling values for each player (for future games).
-    Returns {player_id: {stat_window: value}}."""
-    latest = {}
-    for pid, games in player_rolling_dict.items():
-        if not games:
-            continue
-        # Get the last game_id (highest)
-        last_gid = max(games.keys())
-        latest[pid] = games[last_gid]
-    return latest
+def get_latest_player_rolling(player_rolling):
+    """Get the row of each player's most recent game (for future games).
+    Returns {player_id: row}; tracked while the table is built."""
+    return player_rolling.latest
 
 
 # ---------------------------------------------------------------------------
@@ -289,62 +511,51 @@ def get_latest_player_rolling(player_rolling_dict):
 def compute_team_win_rolling(games_df):
     """Compute per-team rolling win rate from completed games.
     Returns {team_id: {game_id: {WIN_RATE_W: val, GAMES_W: val}}}."""
-    completed = games_df[games_df["GAME_STATUS"].isin([3, 4])].copy()
+    completed = games_df[games_df["GAME_STATUS"].isin([3, 4]) & games_df["GAME_OUTCOME"].notna()]
     if completed.empty:
         return {}, {}
 
-    # Build team-game records (one per team per game)
-    records = []
-    for _, row in completed.iterrows():
-        gid = row["GAME_ID"]
-        gdate = row["GAME_DATE"]
-        outcome = row["GAME_OUTCOME"]
-
-        if pd.isna(outcome):
-            continue
-
-        outcome_int = int(outcome)
-        if pd.notna(row["HOME_ID"]):
-            records.append({
-                "TEAM_ID": int(row["HOME_ID"]),
-                "GAME_ID": int(gid),
-                "GAME_DATE": gdate,
-                "WIN": 1 if outcome_int == 1 else 0,
-            })
-        if pd.notna(row["AWAY_ID"]):
-            records.append({
-                "TEAM_ID": int(row["AWAY_ID"]),
-                "GAME_ID": int(gid),
-                "GAME_DATE": gdate,
-                "WIN": 1 if outcome_int == 0 else 0,
-            })
-
-    if not records:
+    # Build team-game records (one per team per game) column-wise
+    outcome = completed["GAME_OUTCOME"].astype(int)
+    sides = []
+    for team_col, win_outcome in [("HOME_ID", 1), ("AWAY_ID", 0)]:
+        side = pd.DataFrame({
+            "TEAM_ID": completed[team_col],
+            "GAME_ID": completed["GAME_ID"],
+            "GAME_DATE": _date_key(completed["GAME_DATE"]),
+            "WIN": (outcome == win_outcome).astype(int),
+        })
+        sides.append(side[side["TEAM_ID"].notna()])
+    tdf = pd.concat(sides, ignore_index=True)
+    if tdf.empty:
         return {}, {}
 
-    tdf = pd.DataFrame(records).sort_values(["TEAM_ID", "GAME_DATE", "GAME_ID"]).reset_index(drop=True)
+    tdf = tdf.sort_values(["TEAM_ID", "GAME_DATE", "GAME_ID"]).reset_index(drop=True)
+    wins = tdf[["WIN"]].to_numpy(dtype=np.float64)
+    group_start = _group_starts(tdf["TEAM_ID"].to_numpy(dtype=np.int64))
+
+    stat_cols = {}
+    for window in WINDOWS:
+        win_rate, games = _shifted_rolling_mean(wins, group_start, window)
+        stat_cols[f"WIN_RATE_{window}"] = win_rate[:, 0].tolist()
+        stat_cols[f"GAMES_{window}"] = games[:, 0].tolist()
 
     team_rolling = {}  # {team_id: {game_id: {stat: val}}}
     team_latest = {}   # {team_id: {stat: val}}
 
-    for tid, group in tdf.groupby("TEAM_ID"):
-        team_rolling[int(tid)] = {}
-        for _, row in group.iterrows():
-            gid = int(row["GAME_ID"])
-            team_rolling[int(tid)][gid] = {}
-
-        for window in WINDOWS:
-            wr = group["WIN"].shift(1).rolling(window, min_periods=1).mean()
-            gc = group["WIN"].shift(1).rolling(window, min_periods=1).count()
-
-            for i, (_, row) in enumerate(group.iterrows()):
-                gid = int(row["GAME_ID"])
-                team_rolling[int(tid)][gid][f"WIN_RATE_{window}"] = wr.iloc[i] if pd.notna(wr.iloc[i]) else None
-                team_rolling[int(tid)][gid][f"GAMES_{window}"] = int(gc.iloc[i]) if pd.notna(gc.iloc[i]) else None
-
-        # Latest values for future games
-        last_gid = max(team_rolling[int(tid)].keys())
-        team_latest[int(tid)] = team_rolling[int(tid)][last_gid]
+    keys = list(stat_cols)
+    is_count = [k.startswith("GAMES_") for k in keys]
+    tids = tdf["TEAM_ID"].astype(int).tolist()
+    gids = tdf["GAME_ID"].astype(int).tolist()
+    for tid, gid, vals in zip(tids, gids, zip(*stat_cols.values())):
+        stats = {
+            k: (None if pd.isna(v) else int(v) if count else v)
+            for k, v, count in zip(keys, vals, is_count)
+        }
+        team_rolling.setdefault(tid, {})[gid] = stats
+        # Rows are in (TEAM_ID, GAME_DATE, GAME_ID) order, so the last write
+        # per team is its most recent game — latest values for future games.
+        team_latest[tid] = stats
 
     return team_rolling, team_latest
 
@@ -352,176 +563,233 @@ def compute_team_win_rolling(games_df):
 # ---------------------------------------------------------------------------
 # 4. Build gamelogs with features
 # ---------------------------------------------------------------------------
+def _to_int_list(arr):
+    """Convert a lineup/bullpen array to a plain list of ints (None if empty)."""
+    if not isinstance(arr, (list, tuple, np.ndarray)):
+        return None
+    return [int(x) for x in arr if x is not None and not (isinstance(x, float) and np.isnan(x))] or None
+
+
+def _column(games, col):
+    """games[col] as a list, or all-None when the column is absent."""
+    return games[col].tolist() if col in games.columns else [None] * len(games)
+
+
+def _nullable_ints(games, col, default=None):
+    """Python ints from a nullable column; missing values become default."""
+    if col not in games.columns:
+        return [default] * len(games)
+    s = pd.to_numeric(games[col], errors="coerce").astype("Int64")
+    return s.astype(object).where(s.notna(), default).tolist()
+
+
+def _iso_dates(dates):
+    """GAME_DATE values for records: raw strings pass through unchanged,
+    datetimes are formatted with isoformat(), missing dates become None."""
+    return [d if isinstance(d, str) else d.isoformat() if pd.notna(d) else None
+            for d in dates]
+
+
+def _rounded(arr):
+    """Round a float array to 3 decimals as Python floats; NaN becomes None."""
+    out = np.round(arr.astype(np.float64), 3).astype(object)
+    out[np.isnan(arr)] = None
+    return out
+
+
+def _explode_ids(id_lists):
+    """Flatten per-game player id lists into parallel (game, slot, player_id)
+    arrays. Slots keep their list position; None/NaN entries are dropped."""
+    long = pd.Series(list(id_lists), dtype=object).explode()
+    slots = long.groupby(level=0).cumcount().to_numpy()
+    valid = long.notna().to_numpy()
+    return (long.index.to_numpy()[valid], slots[valid],
+            long.to_numpy()[valid].astype(np.int64))
+
+
+def _player_rows(rolling, latest, id_lists, gids, width):
+    """(n_games, width) matrix of table rows for each game's player ids.
+    Slots keep their position; empty slots point at the all-NaN missing row."""
+    rows = np.full((len(gids), width), rolling.missing_row, dtype=np.intp)
+    games, slots, pids = _explode_ids(id_lists)
+    keep = slots < width
+    games, slots = games[keep], slots[keep]
+    rows[games, slots] = rolling.lookup_many(pids[keep], np.asarray(gids)[games], latest)
+    return rows
+
+
 def build_gamelogs(games_df, batting_rolling, pitching_rolling, team_win_rolling,
                    batting_latest, pitching_latest, team_win_latest):
-    """Build final gamelogs DataFrame with all rolling features."""
-    records = []
-
-    for _, game in games_df.iterrows():
-        gid = int(game["GAME_ID"])
-        # Convert lineup/bullpen arrays to plain Python lists of ints
-        def to_int_list(arr):
-            if arr is None:
-                return None
-            lst = list(arr) if not isinstance(arr, list) else arr
-            if not lst:
-                return None
-            return [int(x) for x in lst if x is not None and not (isinstance(x, float) and np.isnan(x))] or None
-
-        rec = {
-            "GAME_ID": gid,
-            "SEASON_ID": int(game["SEASON_ID"]) if pd.notna(game.get("SEASON_ID")) else None,
-            "GAME_DATE": game["GAME_DATE"].isoformat() if pd.notna(game.get("GAME_DATE")) else None,
-            "AWAY_NAME": game.get("AWAY_NAME"),
-            "HOME_NAME": game.get("HOME_NAME"),
-            "AWAY_ID": int(game["AWAY_ID"]) if pd.notna(game.get("AWAY_ID")) else None,
-            "HOME_ID": int(game["HOME_ID"]) if pd.notna(game.get("HOME_ID")) else None,
-            "GAME_STATUS": int(game["GAME_STATUS"]) if pd.notna(game.get("GAME_STATUS")) else 1,
-            "GAME_OUTCOME": int(game["GAME_OUTCOME"]) if pd.notna(game.get("GAME_OUTCOME")) else None,
-            "AWAY_RUNS": int(game["AWAY_RUNS"]) if pd.notna(game.get("AWAY_RUNS")) else None,
-            "HOME_RUNS": int(game["HOME_RUNS"]) if pd.notna(game.get("HOME_RUNS")) else None,
-            "TOTAL_RUNS": int(game["TOTAL_RUNS"]) if pd.notna(game.get("TOTAL_RUNS")) else None,
-            "HOME_SP": int(game["HOME_SP"]) if pd.notna(game.get("HOME_SP")) else None,
-            "AWAY_SP": int(game["AWAY_SP"]) if pd.notna(game.get("AWAY_SP")) else None,
-            "HOME_LINEUP": to_int_list(game.get("HOME_LINEUP")),
-            "AWAY_LINEUP": to_int_list(game.get("AWAY_LINEUP")),
-            "HOME_BULLPEN": to_int_list(game.get("HOME_BULLPEN")),
-            "AWAY_BULLPEN": to_int_list(game.get("AWAY_BULLPEN")),
-        }
-
-        for side in ["HOME", "AWAY"]:
-            lineup = game.get(f"{side}_LINEUP", []) or []
-            sp_id = game.get(f"{side}_SP")
-            bullpen = game.get(f"{side}_BULLPEN", []) or []
-            team_id = int(game[f"{side}_ID"]) if pd.notna(game.get(f"{side}_ID")) else None
-
-            # --- Batting features: weighted average of lineup's rolling stats ---
-            for window in WINDOWS:
-                for stat in BATTING_ROLLING_STATS:
-                    col = f"{side}_{stat}_{window}"
-                    values = []
-                    weights = []
-
-                    for i, pid in enumerate(lineup[:9]):
-                        if pid is None or (isinstance(pid, float) and np.isnan(pid)):
-                            continue
-                        pid = int(pid)
-                        # Try game-specific rolling, fall back to latest
-                        player_games = batting_rolling.get(pid, {})
-                        player_vals = player_games.get(gid) or batting_latest.get(pid, {})
-                        val = player_vals.get(f"{stat}_{window}")
-                        if val is not None:
-                            values.append(val)
-                            weights.append(LINEUP_WEIGHTS_NORM[i])
-
-                    if values:
-                        w = np.array(weights)
-                        v = np.array(values)
-                        w_norm = w / w.sum()  # re-normalize for available batters
-                        rec[col] = round(float(np.dot(w_norm, v)), 3)
-                    else:
-                        rec[col] = None
-
-            # --- SP features: individual rolling stats ---
-            if pd.notna(sp_id):
-                sp_id = int(sp_id)
-                sp_games = pitching_rolling.get(sp_id, {})
-                sp_vals = sp_games.get(gid) or pitching_latest.get(sp_id, {})
-
-                for window in WINDOWS:
-                    for stat in PITCHING_OUTPUT_STATS:
-                        col = f"{side}_SP_{stat}_{window}"
-                        rec[col] = sp_vals.get(f"{stat}_{window}")
-                        if rec[col] is not None:
-                            rec[col] = round(float(rec[col]), 3)
-            else:
-                for window in WINDOWS:
-                    for stat in PITCHING_OUTPUT_STATS:
-                        rec[f"{side}_SP_{stat}_{window}"] = None
-
-            # --- Bullpen features: average across bullpen pitchers ---
-            for window in WINDOWS:
-                for stat in PITCHING_OUTPUT_STATS:
-                    col = f"{side}_BP_{stat}_{window}"
-                    values = []
-
-                    for pid in (bullpen or []):
-                        if pid is None or (isinstance(pid, float) and np.isnan(pid)):
-                            continue
-                        pid = int(pid)
-                        p_games = pitching_rolling.get(pid, {})
-                        p_vals = p_games.get(gid) or pitching_latest.get(pid, {})
-                        val = p_vals.get(f"{stat}_{window}")
-                        if val is not None:
-                            values.append(val)
-
-                    if values:
-                        rec[col] = round(float(np.mean(values)), 3)
-                    else:
-                        rec[col] = None
-
-            # --- Team win rate ---
-            if team_id:
-                team_games = team_win_rolling.get(team_id, {})
-                team_vals = team_games.get(gid) or team_win_latest.get(team_id, {})
-
-                for window in WINDOWS:
-                    wr_col = f"{side}_WIN_RATE_{window}"
-                    gc_col = f"{side}_GAMES_{window}"
-                    rec[wr_col] = team_vals.get(f"WIN_RATE_{window}")
-                    rec[gc_col] = team_vals.get(f"GAMES_{window}")
-                    if rec[wr_col] is not None:
-                        rec[wr_col] = round(float(rec[wr_col]), 3)
-            else:
-                for window in WINDOWS:
-                    rec[f"{side}_WIN_RATE_{window}"] = None
-                    rec[f"{side}_GAMES_{window}"] = None
+    """Build final gamelogs records with all rolling features.
 
-        records.append(rec)
+    batting_rolling/pitching_rolling are PlayerRolling tables; the *_latest
+    dicts map player_id to that player's latest row for future games.
+    Features are computed for all games at once as (n_games, n_features)
+    arrays and zipped into records in a single pass."""
+    if games_df.empty:
+        return []
+
+    games = games_df.reset_index(drop=True)
+    n = len(games)
+    gids = games["GAME_ID"].astype(int).tolist()
+
+    # Bind builtins used in the per-game loops below as locals (LOAD_FAST).
+    _dict, _zip, _round, _float = dict, zip, round, float
+    empty = {}
+
+    lineups = {side: [_to_int_list(x) for x in _column(games, f"{side}_LINEUP")] for side in ["HOME", "AWAY"]}
+    bullpens = {side: [_to_int_list(x) for x in _column(games, f"{side}_BULLPEN")] for side in ["HOME", "AWAY"]}
+
+    columns = {
+        "GAME_ID": gids,
+        "SEASON_ID": _nullable_ints(games, "SEASON_ID"),
+        "GAME_DATE": _iso_dates(_column(games, "GAME_DATE")),
+        "AWAY_NAME": _column(games, "AWAY_NAME"),
+        "HOME_NAME": _column(games, "HOME_NAME"),
+        "AWAY_ID": _nullable_ints(games, "AWAY_ID"),
+        "HOME_ID": _nullable_ints(games, "HOME_ID"),
+        "GAME_STATUS": _nullable_ints(games, "GAME_STATUS", default=1),
+        "GAME_OUTCOME": _nullable_ints(games, "GAME_OUTCOME"),
+        "AWAY_RUNS": _nullable_ints(games, "AWAY_RUNS"),
+        "HOME_RUNS": _nullable_ints(games, "HOME_RUNS"),
+        "TOTAL_RUNS": _nullable_ints(games, "TOTAL_RUNS"),
+        "HOME_SP": _nullable_ints(games, "HOME_SP"),
+        "AWAY_SP": _nullable_ints(games, "AWAY_SP"),
+        "HOME_LINEUP": lineups["HOME"],
+        "AWAY_LINEUP": lineups["AWAY"],
+        "HOME_BULLPEN": bullpens["HOME"],
+        "AWAY_BULLPEN": bullpens["AWAY"],
+    }
+
+    batting_pos = {c: j for j, c in enumerate(batting_rolling.columns)}
+    pitching_pos = {c: j for j, c in enumerate(pitching_rolling.columns)}
+    batting_keys = [f"{stat}_{window}" for window in WINDOWS for stat in BATTING_ROLLING_STATS]
+    pitching_keys = [f"{stat}_{window}" for window in WINDOWS for stat in PITCHING_OUTPUT_STATS]
+
+    def select(arr, pos, keys):
+        """Reorder table columns to keys; keys missing from the table are NaN."""
+        out = np.full((arr.shape[0], len(keys)), np.nan)
+        for k, key in enumerate(keys):
+            if key in pos:
+                out[:, k] = arr[:, pos[key]]
+        return out
+
+    for side in ["HOME", "AWAY"]:
+        # --- Batting features: weighted average of lineup's rolling stats ---
+        rows = _player_rows(batting_rolling, batting_latest, _column(games, f"{side}_LINEUP"), gids, 9)
+        lineup_vals = batting_rolling.values[rows]                 # (games, 9, stats)
+        has = ~np.isnan(lineup_vals)
+        # Availability bitmask per (game, stat) picks pre-normalized weights,
+        # re-normalizing for batters without data.
+        mask = np.einsum("s,gsk->gk", _SLOT_BITS, has.astype(np.int64))
+        weights = LINEUP_WEIGHTS_BY_MASK[mask]                     # (games, stats, 9)
+        lineup_avg = np.einsum("gks,gsk->gk", weights, np.where(has, lineup_vals, np.float32(0)))
+        lineup_avg[mask == 0] = np.nan
+        for key, vals in zip(batting_keys, _rounded(select(lineup_avg, batting_pos, batting_keys)).T):
+            columns[f"{side}_{key}"] = vals.tolist()
+
+        # --- SP features: individual rolling stats ---
+        sp_ids = [[pid] if pid is not None else None for pid in columns[f"{side}_SP"]]
+        rows = _player_rows(pitching_rolling, pitching_latest, sp_ids, gids, 1)[:, 0]
+        sp_vals = select(pitching_rolling.values[rows], pitching_pos, pitching_keys)
+        for key, vals in zip(pitching_keys, _rounded(sp_vals).T):
+            columns[f"{side}_SP_{key}"] = vals.tolist()
+
+        # --- Bullpen features: average across bullpen pitchers ---
+        bp_games, _, bp_pids = _explode_ids(bullpens[side])
+        bp_rows = pitching_rolling.lookup_many(bp_pids, np.asarray(gids)[bp_games], pitching_latest)
+        bp_long = pd.DataFrame(pitching_rolling.values[bp_rows].astype(np.float64), index=bp_games)
+        bp_avg = bp_long.groupby(level=0).mean().reindex(range(n)).to_numpy(dtype=np.float64)
+        for key, vals in zip(pitching_keys, _rounded(select(bp_avg, pitching_pos, pitching_keys)).T):
+            columns[f"{side}_BP_{key}"] = vals.tolist()
+
+        # --- Team win rate ---
+        team_get, latest_get = team_win_rolling.get, team_win_latest.get
+        team_vals = [
+            (team_get(team_id, empty).get(gid) or latest_get(team_id, empty)) if team_id else empty
+            for team_id, gid in _zip(columns[f"{side}_ID"], gids)
+        ]
+        for window in WINDOWS:
+            rate_key, games_key = f"WIN_RATE_{window}", f"GAMES_{window}"
+            win_rates = [v.get(rate_key) for v in team_vals]
+            columns[f"{side}_WIN_RATE_{window}"] = [
+                _round(_float(v), 3) if v is not None else None for v in win_rates
+            ]
+            columns[f"{side}_GAMES_{window}"] = [v.get(games_key) for v in team_vals]
 
-    return records
+    keys = list(columns)
+    return [_dict(_zip(keys, vals)) for vals in _zip(*columns.values())]
 
 
 # ---------------------------------------------------------------------------
 # 5. Upsert gamelogs
 # ---------------------------------------------------------------------------
+def clean_records(records):
+    """Make records JSON-safe column by column: NaN/NA/NaT/inf become None and
+    numpy scalars become Python numbers. Integer columns stay ints (a plain
+    DataFrame round-trip would upcast nullable ints to float)."""
+    df = pd.DataFrame(records, dtype=object)
+    for col in df.columns:
+        kind = pd.api.types.infer_dtype(df[col], skipna=True)
+        if kind == "integer":
+            values = df[col].astype("Int64")
+        elif kind in ("floating", "mixed-integer-float"):
+            values = pd.to_numeric(df[col]).astype(float).replace([np.inf, -np.inf], np.nan)
+        else:
+            values = df[col]
+        df[col] = values.astype(object).where(values.notna(), None)
+    return df.to_dict("records")
+
+
+def _upsert_batch(batch):
+    """Upsert one batch, falling back to row-by-row on failure. Returns rows written."""
+    try:
+        supabase.table("mlb_gamelogs").upsert(batch, on_conflict="GAME_ID").execute()
+        return len(batch)
+    except Exception as e:
+        logger.error(f"Batch upsert failed: {e}")
+    success = 0
+    for row in batch:
+        try:
+            supabase.table("mlb_gamelogs").upsert(row, on_conflict="GAME_ID").execute()
+            success += 1
+        except Exception as re:
+            logger.error(f"Row failed GAME_ID={row.get('GAME_ID')}: {re}")
+    return success
+
+
 def upsert_gamelogs(records):
     if not records:
         logger.info("No gamelogs to upsert")
         return
 
-    # Clean NaN/NA values
-    for rec in records:
-        for key, val in rec.items():
-            if isinstance(val, float) and (np.isnan(val) or np.isinf(val)):
-                rec[key] = None
-            elif val is pd.NA or val is pd.NaT:
-                rec[key] = None
-            elif isinstance(val, (np.integer,)):
-                rec[key] = int(val)
-            elif isinstance(val, (np.floating,)):
-                rec[key] = round(float(val), 3) if not np.isnan(val) else None
+    records = clean_records(records)
 
+    batches = [records[i:i + UPSERT_BATCH_SIZE] for i in range(0, len(records), UPSERT_BATCH_SIZE)]
     success = 0
-    with tqdm(total=len(records), desc="Upserting gamelogs") as pbar:
-        for i in range(0, len(records), UPSERT_BATCH_SIZE):
-            batch = records[i:i + UPSERT_BATCH_SIZE]
-            try:
-                supabase.table("mlb_gamelogs").upsert(batch, on_conflict="GAME_ID").execute()
-                success += len(batch)
-            except Exception as e:
-                logger.error(f"Batch upsert failed: {e}")
-                for row in batch:
-                    try:
-                        supabase.table("mlb_gamelogs").upsert(row, on_conflict="GAME_ID").execute()
-                        success += 1
-                    except Exception as re:
-                        logger.error(f"Row failed GAME_ID={row.get('GAME_ID')}: {re}")
-            pbar.update(len(batch))
+    with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as executor, \
+            tqdm(total=len(records), desc="Upserting gamelogs") as pbar:
+        futures = {executor.submit(_upsert_batch, batch): len(batch) for batch in batches}
+        for future in as_completed(futures):
+            success += future.result()
+            pbar.update(futures[future])
 
     logger.info(f"Upserted {success}/{len(records)} gamelog rows")
 
 
+def delete_stale_gamelogs(keep_ids, batch_size=200):
+    """Delete gamelog rows whose GAME_ID is not in keep_ids. Returns the count."""
+    existing = fetch_paginated("mlb_gamelogs", "GAME_ID", keyset_col="GAME_ID")
+    stale = sorted({int(r["GAME_ID"]) for r in existing if r.get("GAME_ID") is not None} - set(keep_ids))
+    for i in range(0, len(stale), batch_size):
+        try:
+            supabase.table("mlb_gamelogs").delete().in_("GAME_ID", stale[i:i + batch_size]).execute()
+        except Exception as e:
+            logger.error(f"Delete failed: {e}")
+    logger.info(f"  {len(stale)} stale gamelog rows removed")
+    return len(stale)
+
+
 # ---------------------------------------------------------------------------
 # Modes
 # ---------------------------------------------------------------------------
@@ -530,30 +798,28 @@ def run_full_mode():
     current_year = datetime.now().year
     season_ids = list(range(2020, current_year + 1))
 
-    logger.info("Fetching all games...")
-    games_df = fetch_games(season_ids=season_ids)
+    logger.info("Fetching all games, batting and pitching stats...")
+    games_df, batting_df, pitching_df = fetch_concurrently(
+        (fetch_games, {"season_ids": season_ids}),
+        (fetch_batting_stats, {"season_ids": season_ids}),
+        (fetch_pitching_stats, {"season_ids": season_ids}),
+    )
     if games_df.empty:
         logger.info("No games found")
         return
     logger.info(f"  {len(games_df)} games loaded")
-
-    logger.info("Fetching batting stats...")
-    batting_df = fetch_batting_stats(season_ids=season_ids)
     logger.info(f"  {len(batting_df)} batting rows")
-
-    logger.info("Fetching pitching stats...")
-    pitching_df = fetch_pitching_stats(season_ids=season_ids)
     logger.info(f"  {len(pitching_df)} pitching rows")
 
     logger.info("Computing individual batting rolling stats...")
     batting_rolling = compute_player_batting_rolling(batting_df)
     batting_latest = get_latest_player_rolling(batting_rolling)
-    logger.info(f"  {len(batting_rolling)} batters with rolling stats")
+    logger.info(f"  {len(batting_latest)} batters with rolling stats")
 
     logger.info("Computing individual pitching rolling stats...")
     pitching_rolling = compute_player_pitching_rolling(pitching_df)
     pitching_latest = get_latest_player_rolling(pitching_rolling)
-    logger.info(f"  {len(pitching_rolling)} pitchers with rolling stats")
+    logger.info(f"  {len(pitching_latest)} pitchers with rolling stats")
 
     logger.info("Computing team win rolling stats...")
     team_win_rolling, team_win_latest = compute_team_win_rolling(games_df)
@@ -566,48 +832,15 @@ def run_full_mode():
     )
     logger.info(f"  {len(records)} gamelog records built")
 
-    # Preserve existing predictions before rebuilding.
-    # In full mode we do delete + insert, which would destroy predictions.
-    # Read them first and carry them over into the new records.
-    logger.info("Reading existing predictions to preserve...")
-    pred_rows = []
-    offset = 0
-    while True:
-        resp = (supabase.table("mlb_gamelogs")
-                .select("GAME_ID,PREDICTION,PREDICTION_PCT")
-                .filter("PREDICTION", "not.is", "null")
-                .range(offset, offset + PAGE_SIZE - 1)
-                .execute())
-        batch = resp.data or []
-        pred_rows.extend(batch)
-        if len(batch) < PAGE_SIZE:
-            break
-        offset += PAGE_SIZE
-    pred_map = {}
-    for pr in pred_rows:
-        gid = pr.get("GAME_ID")
-        if gid is not None:
-            pred_map[int(gid)] = {
-                "PREDICTION": pr.get("PREDICTION"),
-                "PREDICTION_PCT": pr.get("PREDICTION_PCT"),
-            }
-    logger.info(f"  {len(pred_map)} existing predictions to preserve")
-
-    # Carry predictions into new records
-    for rec in records:
-        gid = rec.get("GAME_ID")
-        if gid in pred_map:
-            rec["PREDICTION"] = pred_map[gid]["PREDICTION"]
-            rec["PREDICTION_PCT"] = pred_map[gid]["PREDICTION_PCT"]
-
-    logger.info("Deleting existing gamelogs...")
-    try:
-        supabase.table("mlb_gamelogs").delete().neq("GAME_ID", 0).execute()
-    except Exception as e:
-        logger.error(f"Delete failed: {e}")
-
+    # Upsert in place instead of delete + insert. The merge-duplicates upsert
+    # only updates columns present in the payload, so existing
+    # PREDICTION/PREDICTION_PCT values (never in rebuilt records) survive
+    # without reading them back first.
     logger.info("Upserting gamelogs...")
     upsert_gamelogs(records)
+
+    logger.info("Removing gamelogs for games no longer in mlb_games...")
+    delete_stale_gamelogs({rec["GAME_ID"] for rec in records})
     logger.info("=== FULL MODE COMPLETE ===")
 
 
@@ -622,23 +855,25 @@ def run_current_mode():
 
     logger.info(f"=== CURRENT MODE: games {date_from.date()} to {date_to.date()} ===")
 
-    logger.info("Fetching target games...")
-    games_df = fetch_games(date_from=date_from, date_to=date_to)
+    logger.info("Fetching games, batting and pitching stats (history window)...")
+    window = {"date_from": hist_from, "date_to": date_to}
+    all_games_df, batting_df, pitching_df = fetch_concurrently(
+        (fetch_games, window),
+        (fetch_batting_stats, window),
+        (fetch_pitching_stats, window),
+    )
+
+    # Target games are the tail of the history window — no separate fetch.
+    if all_games_df.empty:
+        games_df = all_games_df
+    else:
+        games_df = all_games_df[_date_key(all_games_df["GAME_DATE"]) >= date_from].reset_index(drop=True)
     if games_df.empty:
         logger.info("No games in date range")
         return
     logger.info(f"  {len(games_df)} target games")
-
-    logger.info("Fetching all historical games for win rate...")
-    all_games_df = fetch_games(date_from=hist_from, date_to=date_to)
     logger.info(f"  {len(all_games_df)} games (including history)")
-
-    logger.info("Fetching batting stats (history window)...")
-    batting_df = fetch_batting_stats(date_from=hist_from, date_to=date_to)
     logger.info(f"  {len(batting_df)} batting rows")
-
-    logger.info("Fetching pitching stats (history window)...")
-    pitching_df = fetch_pitching_stats(date_from=hist_from, date_to=date_to)
     logger.info(f"  {len(pitching_df)} pitching rows")
 
     logger.info("Computing individual batting rolling stats...")
@@ -664,15 +899,21 @@ def run_current_mode():
     logger.info("=== CURRENT MODE COMPLETE ===")
 
 
-def main():
-    mode = sys.argv[1] if len(sys.argv) > 1 else "current"
+def run(mode: str | None = None) -> int:
+    """Run the gamelogs pipeline in-process. Returns a process exit code."""
+    mode = mode or "current"
     if mode == "full":
         run_full_mode()
     elif mode == "current":
         run_current_mode()
     else:
         print(f"Unknown mode: {mode}. Use 'full' or 'current'.")
-        sys.exit(1)
+        return 1
+    return 0
+
+
+def main():
+    sys.exit(run(sys.argv[1] if len(sys.argv) > 1 else "current"))
 
 
 if __name__ == "__main__":
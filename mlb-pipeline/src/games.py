@@ -7,8 +7,10 @@ Modes:
   Designed to run many times per day to capture newly posted lineups.
 
 Data sources:
-- MLB Schedule API: game metadata, scores, statuses
-- MLB Live Feed API: lineups (1-9 batting order), SP, bullpen per game
+- MLB Schedule API: game metadata, scores, statuses, probable pitchers,
+  posted lineups
+- MLB Live Feed API: lineups (1-9 batting order), SP, bullpen per game;
+  only for live/final games and scheduled games with posted lineups
 """
 
 import sys
@@ -17,6 +19,7 @@ from datetime import datetime, timedelta, timezone
 
 REPO_ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "mlb-pipeline" / "src"))
 
 from shared.mlb.mlb_constants import TEAM_ID_TO_NAME
 
@@ -28,13 +31,12 @@ import requests
 from supabase import create_client, Client
 from dotenv import load_dotenv
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from time import sleep
-import random
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
 import functools
 
+from cache import create_session, create_http2_client, http2_get, response_json, POOL_MAXSIZE
+
 load_dotenv()
 
 logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -58,26 +60,32 @@ GAME_STATUS_LIVE = 2
 GAME_STATUS_FINAL = 3
 GAME_STATUS_POSTPONED = 4
 
-UPSERT_BATCH_SIZE = 500
+# Rows per upsert POST. PostgREST parses each body as one statement; larger
+# batches mostly save HTTP round-trips (~1 KB per game row).
+UPSERT_BATCH_SIZE = int(os.environ.get("MLB_GAMES_UPSERT_BATCH_SIZE", "2000"))
+
+# fetch_db_games by id: the mlb_games_by_ids RPC takes ids in the POST body,
+# so a batch is bounded only by PostgREST max-rows. The IN-filter fallback
+# puts ids in the URL and keeps batches small.
+DB_GAMES_RPC = "mlb_games_by_ids"
+DB_GAMES_RPC_BATCH_SIZE = 1000
+DB_GAMES_IN_BATCH_SIZE = 200
+
+# Concurrent live-feed requests. Matches the feed client's connection
+# limit; 429s are absorbed by http2_get's retry/backoff.
+LINEUP_WORKERS = POOL_MAXSIZE
+LINEUP_WINDOW = LINEUP_WORKERS * 4  # futures in flight in fetch_lineups_parallel
 
 
 # ---------------------------------------------------------------------------
-# Rate-limit-safe HTTP session
+# Rate-limit-safe, response-caching HTTP session (see cache.py)
 # ---------------------------------------------------------------------------
-def create_session():
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=3,
-        backoff_factor=2,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["GET"],
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("https://", adapter)
-    return session
-
 SESSION = create_session()
 
+# Live feeds fan out to hundreds of per-game requests: multiplex them over
+# HTTP/2. Unchanged feeds are skipped via the ETag stored on mlb_games.
+FEED_CLIENT = create_http2_client()
+
 
 # ---------------------------------------------------------------------------
 # 1. Fetch schedule from MLB API
@@ -92,11 +100,12 @@ def fetch_schedule(start_date, end_date):
             "startDate": start_date,
             "endDate": end_date,
             "gameType": "R",  # Regular season only
-            "hydrate": "linescore",
+            "hydrate": "linescore,probablePitcher,lineups",
         }, timeout=30)
         resp.raise_for_status()
-        data = resp.json()
+        data = response_json(resp)
 
+        team_name = TEAM_ID_TO_NAME.get  # bound once for the loop below
         for date_entry in data.get("dates", []):
             for game in date_entry.get("games", []):
                 game_pk = game.get("gamePk")
@@ -114,19 +123,22 @@ def fetch_schedule(start_date, end_date):
                 else:
                     game_status = GAME_STATUS_SCHEDULED
 
-                away_team = game.get("teams", {}).get("away", {}).get("team", {})
-                home_team = game.get("teams", {}).get("home", {}).get("team", {})
+                teams = game.get("teams", {})
+                home, away = teams.get("home", {}), teams.get("away", {})
+                away_team = away.get("team", {})
+                home_team = home.get("team", {})
+                away_id, home_id = away_team.get("id"), home_team.get("id")
 
                 # Scores from linescore
-                linescore = game.get("linescore", {})
-                home_runs = linescore.get("teams", {}).get("home", {}).get("runs")
-                away_runs = linescore.get("teams", {}).get("away", {}).get("runs")
+                line_teams = game.get("linescore", {}).get("teams", {})
+                home_runs = line_teams.get("home", {}).get("runs")
+                away_runs = line_teams.get("away", {}).get("runs")
 
                 # Fallback to teams score
                 if home_runs is None:
-                    home_runs = game.get("teams", {}).get("home", {}).get("score")
+                    home_runs = home.get("score")
                 if away_runs is None:
-                    away_runs = game.get("teams", {}).get("away", {}).get("score")
+                    away_runs = away.get("score")
 
                 game_outcome = None
                 if game_status == GAME_STATUS_FINAL and home_runs is not None and away_runs is not None:
@@ -142,19 +154,29 @@ def fetch_schedule(start_date, end_date):
                 game_date = game.get("officialDate") or game.get("gameDate", "")[:10]
                 season = int(game_date[:4]) if game_date else None
 
+                # Posted lineups and probable pitchers (hydrated). The live
+                # feed overrides these for games it is fetched for.
+                lineups = game.get("lineups", {})
+                home_sp = home.get("probablePitcher", {}).get("id")
+                away_sp = away.get("probablePitcher", {}).get("id")
+
                 games.append({
                     "GAME_ID": game_pk,
                     "SEASON_ID": season,
                     "GAME_DATE": game_date,
-                    "AWAY_NAME": TEAM_ID_TO_NAME.get(away_team.get("id"), away_team.get("name")),
-                    "HOME_NAME": TEAM_ID_TO_NAME.get(home_team.get("id"), home_team.get("name")),
-                    "AWAY_ID": away_team.get("id"),
-                    "HOME_ID": home_team.get("id"),
+                    "AWAY_NAME": team_name(away_id, away_team.get("name")),
+                    "HOME_NAME": team_name(home_id, home_team.get("name")),
+                    "AWAY_ID": away_id,
+                    "HOME_ID": home_id,
                     "GAME_STATUS": game_status,
                     "GAME_OUTCOME": game_outcome,
                     "AWAY_RUNS": away_runs,
                     "HOME_RUNS": home_runs,
                     "TOTAL_RUNS": total_runs,
+                    "HOME_LINEUP": [p.get("id") for p in lineups.get("homePlayers", [])],
+                    "AWAY_LINEUP": [p.get("id") for p in lineups.get("awayPlayers", [])],
+                    "HOME_SP": home_sp,
+                    "AWAY_SP": away_sp,
                 })
 
     except Exception as e:
@@ -167,9 +189,32 @@ def fetch_schedule(start_date, end_date):
 # ---------------------------------------------------------------------------
 # 2. Fetch lineups from live feed API (per game)
 # ---------------------------------------------------------------------------
-def fetch_lineup(game_pk):
+def _lineup_from_players(players):
+    """{order_pos: player_id} from per-player battingOrder codes (100-900;
+    substitutes have codes like 101 and are skipped)."""
+    lineup = {}
+    for player_info in players.values():
+        batting_order = player_info.get("battingOrder")
+        if batting_order is not None:
+            try:
+                order_int = int(batting_order)
+                if order_int % 100 == 0 and 100 <= order_int <= 900:
+                    lineup[order_int // 100] = player_info["person"]["id"]
+            except (ValueError, KeyError):
+                pass
+    return lineup
+
+
+LINEUP_FIELDS = ["HOME_LINEUP", "AWAY_LINEUP", "HOME_SP", "AWAY_SP", "HOME_BULLPEN", "AWAY_BULLPEN", "ETAG"]
+
+
+def fetch_lineup(game_pk, etag=None):
     """Fetch lineup data for a single game from the live feed API.
-    Returns dict with HOME_LINEUP, AWAY_LINEUP, HOME_SP, AWAY_SP, HOME_BULLPEN, AWAY_BULLPEN."""
+    Returns dict with HOME_LINEUP, AWAY_LINEUP, HOME_SP, AWAY_SP, HOME_BULLPEN,
+    AWAY_BULLPEN and the response ETAG.
+
+    With etag (from the stored game), returns None without parsing when the
+    feed is unchanged: a 304, or a cached response carrying the same ETag."""
     result = {
         "HOME_LINEUP": [],
         "AWAY_LINEUP": [],
@@ -177,36 +222,35 @@ def fetch_lineup(game_pk):
         "AWAY_SP": None,
         "HOME_BULLPEN": [],
         "AWAY_BULLPEN": [],
+        "ETAG": None,
     }
 
     try:
-        sleep(random.uniform(0.05, 0.15))
         url = MLB_GAME_FEED_URL.format(gamePk=game_pk)
-        resp = SESSION.get(url, timeout=15)
+        headers = {"If-None-Match": etag} if etag else None
+        resp = http2_get(FEED_CLIENT, url, headers=headers, timeout=15)
+        if etag and (resp.status_code == 304 or resp.headers.get("ETag") == etag):
+            return None
         resp.raise_for_status()
-        data = resp.json()
+        data = response_json(resp)
+        result["ETAG"] = resp.headers.get("ETag")
 
         boxscore = data.get("liveData", {}).get("boxscore", {}).get("teams", {})
 
         for side, prefix in [("home", "HOME"), ("away", "AWAY")]:
             team_data = boxscore.get(side, {})
-            players = team_data.get("players", {})
 
-            # Extract batting lineup (battingOrder 100-900)
-            lineup = {}
-            for player_key, player_info in players.items():
-                batting_order = player_info.get("battingOrder")
-                if batting_order is not None:
-                    try:
-                        order_int = int(batting_order)
-                        if order_int % 100 == 0 and 100 <= order_int <= 900:
-                            order_pos = order_int // 100
-                            lineup[order_pos] = player_info["person"]["id"]
-                    except (ValueError, KeyError):
-                        pass
+            # The team-level battingOrder is the starting nine, already in
+            # order; older feeds without it need a scan of players.
+            starters = team_data.get("battingOrder") or []
+            if starters:
+                lineup = dict(enumerate((int(pid) for pid in starters[:9]), start=1))
+            else:
+                lineup = _lineup_from_players(team_data.get("players", {}))
 
-            # Build ordered lineup array (positions 1-9)
-            result[f"{prefix}_LINEUP"] = [lineup.get(i) for i in range(1, 10)]
+            # Build ordered lineup array (positions 1-9); [] until posted
+            if lineup:
+                result[f"{prefix}_LINEUP"] = [lineup.get(i) for i in range(1, 10)]
 
             # Starting pitcher (first in pitchers list)
             pitchers_list = team_data.get("pitchers", [])
@@ -217,7 +261,7 @@ def fetch_lineup(game_pk):
             bullpen_ids = team_data.get("bullpen", [])
             # Also add relief pitchers (all pitchers except SP)
             relief = pitchers_list[1:] if len(pitchers_list) > 1 else []
-            all_bp = list(set(bullpen_ids + relief))
+            all_bp = list(dict.fromkeys(bullpen_ids + relief))  # dedup, keep order
             result[f"{prefix}_BULLPEN"] = all_bp
 
     except Exception as e:
@@ -226,55 +270,101 @@ def fetch_lineup(game_pk):
     return result
 
 
-def fetch_lineups_parallel(game_pks):
-    """Fetch lineups for multiple games in parallel."""
+def fetch_lineups_parallel(game_pks, etags=None):
+    """Fetch lineups for multiple games in parallel. etags maps GAME_ID to
+    the stored feed ETag; unchanged games map to None.
+
+    At most LINEUP_WINDOW requests are queued at once; a new one is submitted
+    as each completes, so a full backfill never holds a future per game."""
+    etags = etags or {}
     lineups = {}
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = {executor.submit(fetch_lineup, pk): pk for pk in game_pks}
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching lineups", unit="game"):
-            pk = futures[future]
-            try:
-                lineups[pk] = future.result()
-            except Exception as e:
-                logger.error(f"Lineup future failed for {pk}: {e}")
-                lineups[pk] = {}
+    pks = iter(game_pks)
+    with ThreadPoolExecutor(max_workers=LINEUP_WORKERS) as executor, \
+            tqdm(total=len(game_pks), desc="Fetching lineups", unit="game") as pbar:
+        def submit(pk):
+            return executor.submit(fetch_lineup, pk, etags.get(pk))
+
+        pending = {submit(pk): pk for pk in islice(pks, LINEUP_WINDOW)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pk = pending.pop(future)
+                try:
+                    lineups[pk] = future.result()
+                except Exception as e:
+                    logger.error(f"Lineup future failed for {pk}: {e}")
+                    lineups[pk] = {}
+                pbar.update(1)
+                for next_pk in islice(pks, 1):
+                    pending[submit(next_pk)] = next_pk
     return lineups
 
 
 # ---------------------------------------------------------------------------
 # 3. Merge games + lineups
 # ---------------------------------------------------------------------------
-def merge_games_and_lineups(games_list, lineups_dict):
-    """Merge schedule data with lineup data into final records."""
+def needs_live_feed(game):
+    """Live/final games need the boxscore (actual SP, bullpen). Scheduled
+    games only once lineups are posted, for the bullpen; before that the
+    schedule's probable pitchers are all there is."""
+    status = game.get("GAME_STATUS")
+    if status in (GAME_STATUS_LIVE, GAME_STATUS_FINAL):
+        return True
+    return status == GAME_STATUS_SCHEDULED and bool(game.get("HOME_LINEUP") or game.get("AWAY_LINEUP"))
+
+
+def merge_games_and_lineups(games_list, lineups_dict, db_map=None):
+    """Merge schedule data with lineup data into final records.
+    A None lineup means the feed is unchanged: the stored row in db_map
+    supplies the lineup fields. Empty feed fields fall back to the lineups
+    and probable pitchers from the schedule."""
     for game in games_list:
         pk = game["GAME_ID"]
         lineup = lineups_dict.get(pk, {})
-        game["HOME_LINEUP"] = lineup.get("HOME_LINEUP", [])
-        game["AWAY_LINEUP"] = lineup.get("AWAY_LINEUP", [])
-        game["HOME_SP"] = lineup.get("HOME_SP")
-        game["AWAY_SP"] = lineup.get("AWAY_SP")
+        if lineup is None:
+            stored = (db_map or {}).get(pk, {})
+            lineup = {field: stored.get(field) for field in LINEUP_FIELDS}
+        game["HOME_LINEUP"] = lineup.get("HOME_LINEUP") or game.get("HOME_LINEUP") or []
+        game["AWAY_LINEUP"] = lineup.get("AWAY_LINEUP") or game.get("AWAY_LINEUP") or []
+        game["HOME_SP"] = lineup.get("HOME_SP") or game.get("HOME_SP")
+        game["AWAY_SP"] = lineup.get("AWAY_SP") or game.get("AWAY_SP")
         game["HOME_BULLPEN"] = lineup.get("HOME_BULLPEN", [])
         game["AWAY_BULLPEN"] = lineup.get("AWAY_BULLPEN", [])
+        game["ETAG"] = lineup.get("ETAG")
     return games_list
 
 
 # ---------------------------------------------------------------------------
 # 4. Supabase interaction
 # ---------------------------------------------------------------------------
+def _fetch_db_games_by_ids(game_ids):
+    """Fetch games by id via the mlb_games_by_ids RPC, falling back to
+    batched IN filters if the function is not deployed."""
+    all_data = []
+    try:
+        for i in range(0, len(game_ids), DB_GAMES_RPC_BATCH_SIZE):
+            batch = [int(pk) for pk in game_ids[i:i + DB_GAMES_RPC_BATCH_SIZE]]
+            resp = supabase.rpc(DB_GAMES_RPC, {"ids": batch}).execute()
+            all_data.extend(resp.data or [])
+        return all_data
+    except Exception as e:
+        logger.warning(f"{DB_GAMES_RPC} RPC failed ({e}), falling back to IN batches")
+
+    all_data = []
+    for i in range(0, len(game_ids), DB_GAMES_IN_BATCH_SIZE):
+        batch = game_ids[i:i + DB_GAMES_IN_BATCH_SIZE]
+        resp = supabase.table("mlb_games").select("*").in_("GAME_ID", batch).execute()
+        all_data.extend(resp.data or [])
+    return all_data
+
+
 def fetch_db_games(game_ids=None, season_ids=None):
     """Fetch existing games from Supabase."""
     try:
-        query = supabase.table("mlb_games").select("*")
         if game_ids:
-            batch_size = 200
-            all_data = []
-            for i in range(0, len(game_ids), batch_size):
-                batch = game_ids[i:i + batch_size]
-                resp = supabase.table("mlb_games").select("*").in_("GAME_ID", batch).execute()
-                if resp.data:
-                    all_data.extend(resp.data)
-            return all_data
-        elif season_ids:
+            return _fetch_db_games_by_ids(game_ids)
+        query = supabase.table("mlb_games").select("*")
+        if season_ids:
             query = query.in_("SEASON_ID", season_ids)
         response = query.execute()
         return response.data or []
@@ -283,98 +373,130 @@ def fetch_db_games(game_ids=None, season_ids=None):
         return []
 
 
+DELTA_FIELDS = [
+    "GAME_STATUS", "GAME_OUTCOME", "HOME_RUNS", "AWAY_RUNS", "TOTAL_RUNS",
+    "HOME_SP", "AWAY_SP",
+]
+DELTA_LIST_FIELDS = ["HOME_LINEUP", "AWAY_LINEUP"]          # batting order matters
+DELTA_SET_FIELDS = ["HOME_BULLPEN", "AWAY_BULLPEN"]         # membership only
+
+
+def _row_key(game):
+    """Canonical tuple of the fields find_deltas compares. Lists drop Nones;
+    bullpens are sorted so stored rows in any order compare equal."""
+    return (
+        tuple(game.get(field) for field in DELTA_FIELDS)
+        + tuple(tuple(x for x in (game.get(field) or []) if x is not None)
+                for field in DELTA_LIST_FIELDS)
+        + tuple(tuple(sorted(x for x in (game.get(field) or []) if x is not None))
+                for field in DELTA_SET_FIELDS)
+    )
+
+
 def find_deltas(new_games, db_games):
-    """Find games that are new or changed compared to DB."""
+    """Find games that are new or changed compared to DB.
+
+    Each side is reduced to one fingerprint per game; the full keys are only
+    compared when fingerprints match, to rule out a hash collision."""
     if not db_games:
         return new_games
 
-    db_map = {g["GAME_ID"]: g for g in db_games}
+    db_keys = {g["GAME_ID"]: _row_key(g) for g in db_games}
+    db_prints = {pk: hash(key) for pk, key in db_keys.items()}
     deltas = []
 
-    compare_fields = [
-        "GAME_STATUS", "GAME_OUTCOME", "HOME_RUNS", "AWAY_RUNS", "TOTAL_RUNS",
-        "HOME_SP", "AWAY_SP",
-    ]
-    list_fields = ["HOME_LINEUP", "AWAY_LINEUP", "HOME_BULLPEN", "AWAY_BULLPEN"]
-
     for game in new_games:
         pk = game["GAME_ID"]
-        db_game = db_map.get(pk)
-
-        if db_game is None:
+        db_print = db_prints.get(pk)
+        if db_print is None:
             deltas.append(game)
             continue
 
-        changed = False
-        for field in compare_fields:
-            new_val = game.get(field)
-            db_val = db_game.get(field)
-            if new_val != db_val and (new_val is not None or db_val is not None):
-                changed = True
-                break
-
-        if not changed:
-            for field in list_fields:
-                new_val = game.get(field, [])
-                db_val = db_game.get(field, [])
-                # Filter out Nones for comparison
-                new_clean = [x for x in (new_val or []) if x is not None]
-                db_clean = [x for x in (db_val or []) if x is not None]
-                if new_clean != db_clean:
-                    changed = True
-                    break
-
-        if changed:
+        key = _row_key(game)
+        if hash(key) != db_print or key != db_keys[pk]:
             deltas.append(game)
 
     return deltas
 
 
+PAYLOAD_COLUMNS = [
+    "GAME_ID", "SEASON_ID", "GAME_DATE", "AWAY_NAME", "HOME_NAME", "AWAY_ID", "HOME_ID",
+    "GAME_STATUS", "GAME_OUTCOME", "AWAY_RUNS", "HOME_RUNS", "TOTAL_RUNS",
+    "HOME_LINEUP", "AWAY_LINEUP", "HOME_SP", "AWAY_SP", "HOME_BULLPEN", "AWAY_BULLPEN",
+    "ETAG",
+]
+# Id columns where 0 means "unknown" and is stored as NULL.
+NONZERO_COLUMNS = ["SEASON_ID", "AWAY_ID", "HOME_ID", "HOME_SP", "AWAY_SP"]
+LIST_COLUMNS = ["HOME_LINEUP", "AWAY_LINEUP", "HOME_BULLPEN", "AWAY_BULLPEN"]
+
+
 def _clean_payload(game):
-    """Convert game dict to a Supabase-safe payload."""
-    payload = {
-        "GAME_ID": int(game["GAME_ID"]),
-        "SEASON_ID": int(game["SEASON_ID"]) if game.get("SEASON_ID") else None,
-        "GAME_DATE": game.get("GAME_DATE"),
-        "AWAY_NAME": game.get("AWAY_NAME"),
-        "HOME_NAME": game.get("HOME_NAME"),
-        "AWAY_ID": int(game["AWAY_ID"]) if game.get("AWAY_ID") else None,
-        "HOME_ID": int(game["HOME_ID"]) if game.get("HOME_ID") else None,
-        "GAME_STATUS": int(game["GAME_STATUS"]) if game.get("GAME_STATUS") is not None else GAME_STATUS_SCHEDULED,
-        "GAME_OUTCOME": int(game["GAME_OUTCOME"]) if game.get("GAME_OUTCOME") is not None else None,
-        "AWAY_RUNS": int(game["AWAY_RUNS"]) if game.get("AWAY_RUNS") is not None else None,
-        "HOME_RUNS": int(game["HOME_RUNS"]) if game.get("HOME_RUNS") is not None else None,
-        "TOTAL_RUNS": int(game["TOTAL_RUNS"]) if game.get("TOTAL_RUNS") is not None else None,
-        "HOME_LINEUP": [int(x) for x in game.get("HOME_LINEUP", []) if x is not None] or [],
-        "AWAY_LINEUP": [int(x) for x in game.get("AWAY_LINEUP", []) if x is not None] or [],
-        "HOME_SP": int(game["HOME_SP"]) if game.get("HOME_SP") else None,
-        "AWAY_SP": int(game["AWAY_SP"]) if game.get("AWAY_SP") else None,
-        "HOME_BULLPEN": [int(x) for x in game.get("HOME_BULLPEN", []) if x is not None] or [],
-        "AWAY_BULLPEN": [int(x) for x in game.get("AWAY_BULLPEN", []) if x is not None] or [],
-    }
+    """Convert one game dict to a Supabase-safe payload.
+
+    Values pass through uncast: the Stats API returns JSON numbers and
+    Postgres enforces the column types. Only NULL handling is applied."""
+    get = game.get
+    payload = {col: get(col) for col in PAYLOAD_COLUMNS}
+    for col in NONZERO_COLUMNS:
+        if not payload[col]:
+            payload[col] = None
+    if payload["GAME_STATUS"] is None:
+        payload["GAME_STATUS"] = GAME_STATUS_SCHEDULED
+    for col in LIST_COLUMNS:
+        ids = payload[col]
+        payload[col] = [x for x in ids if x is not None] if ids else []
     return payload
 
 
+def _clean_payloads(games_list):
+    return [_clean_payload(g) for g in games_list]
+
+
+# Cleared the first time PostgREST reports the ETAG column missing
+# (migration 003 not applied); later batches are sent without it.
+_send_etag = True
+
+
+def _missing_etag_column(err):
+    """PGRST204: the payload names a column the table doesn't have."""
+    msg = str(err)
+    return "PGRST204" in msg and "ETAG" in msg
+
+
+def _upsert_batch(batch):
+    global _send_etag
+    if not _send_etag:
+        batch = [{k: v for k, v in p.items() if k != "ETAG"} for p in batch]
+    try:
+        supabase.table("mlb_games").upsert(batch, on_conflict="GAME_ID").execute()
+    except Exception as e:
+        if not (_send_etag and _missing_etag_column(e)):
+            raise
+        logger.warning("mlb_games has no ETAG column (apply migration 003) — upserting without it")
+        _send_etag = False
+        _upsert_batch(batch)
+
+
 def upsert_games(games_list):
     """Upsert games to Supabase in batches."""
     if not games_list:
         logger.info("No games to upsert")
         return
 
-    payloads = [_clean_payload(g) for g in games_list]
+    payloads = _clean_payloads(games_list)
     success = 0
 
     with tqdm(total=len(payloads), desc="Upserting games") as pbar:
         for i in range(0, len(payloads), UPSERT_BATCH_SIZE):
             batch = payloads[i:i + UPSERT_BATCH_SIZE]
             try:
-                supabase.table("mlb_games").upsert(batch, on_conflict="GAME_ID").execute()
+                _upsert_batch(batch)
                 success += len(batch)
             except Exception as e:
                 logger.warning(f"Batch upsert failed: {e}")
                 for payload in batch:
                     try:
-                        supabase.table("mlb_games").upsert(payload, on_conflict="GAME_ID").execute()
+                        _upsert_batch([payload])
                         success += 1
                     except Exception as row_err:
                         logger.error(f"Row upsert failed GAME_ID={payload['GAME_ID']}: {row_err}")
@@ -392,28 +514,24 @@ def run_full_mode():
     all_games = []
 
     logger.info("Step 1: Fetching schedule for all seasons...")
-    for year in range(2020, current_year + 1):
-        start = f"{year}-01-01"
-        end = f"{year}-12-31" if year < current_year else datetime.now().strftime("%Y-%m-%d")
-        games = fetch_schedule(start, end)
-        all_games.extend(games)
+    today = datetime.now().strftime("%Y-%m-%d")
+    ranges = [(f"{year}-01-01", f"{year}-12-31" if year < current_year else today)
+              for year in range(2020, current_year + 1)]
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        for games in executor.map(lambda r: fetch_schedule(*r), ranges):
+            all_games.extend(games)
 
     if not all_games:
         logger.info("No games found")
         return
 
-    # Deduplicate by GAME_ID
-    seen = set()
-    unique_games = []
-    for g in all_games:
-        if g["GAME_ID"] not in seen:
-            seen.add(g["GAME_ID"])
-            unique_games.append(g)
-    all_games = unique_games
+    # Deduplicate by GAME_ID (seasons don't overlap, so which copy wins is moot)
+    all_games = list({g["GAME_ID"]: g for g in all_games}.values())
     logger.info(f"  {len(all_games)} unique games across all seasons")
 
-    logger.info("Step 2: Fetching lineups for all games...")
-    game_pks = [g["GAME_ID"] for g in all_games]
+    logger.info("Step 2: Fetching lineups for live/final games and posted lineups...")
+    game_pks = [g["GAME_ID"] for g in all_games if needs_live_feed(g)]
+    logger.info(f"  {len(game_pks)} live feeds ({len(all_games) - len(game_pks)} covered by schedule)")
     lineups = fetch_lineups_parallel(game_pks)
 
     logger.info("Step 3: Merging games + lineups...")
@@ -437,20 +555,31 @@ def run_current_mode():
         logger.info("No games in range")
         return
 
-    logger.info("Step 2: Fetching lineups...")
+    logger.info("Step 2: Fetching stored games...")
     game_pks = [g["GAME_ID"] for g in games]
-    lineups = fetch_lineups_parallel(game_pks)
-
-    logger.info("Step 3: Merging games + lineups...")
-    games = merge_games_and_lineups(games, lineups)
-
-    logger.info("Step 4: Finding deltas...")
     db_games = fetch_db_games(game_ids=game_pks)
+    db_map = {g["GAME_ID"]: g for g in db_games}
+
+    logger.info("Step 3: Fetching lineups...")
+    # Final games with a stored SP have frozen lineups: reuse the stored row.
+    final_pks = {pk for pk, g in db_map.items()
+                 if g.get("GAME_STATUS") == GAME_STATUS_FINAL and g.get("HOME_SP") is not None}
+    etags = {pk: g.get("ETAG") for pk, g in db_map.items() if g.get("ETAG")}
+    feed_pks = [g["GAME_ID"] for g in games if needs_live_feed(g) and g["GAME_ID"] not in final_pks]
+    lineups = fetch_lineups_parallel(feed_pks, etags)
+    unchanged = sum(1 for v in lineups.values() if v is None)
+    logger.info(f"  {len(final_pks)} final games reused, {unchanged} live feeds unchanged")
+    lineups.update(dict.fromkeys(final_pks))
+
+    logger.info("Step 4: Merging games + lineups...")
+    games = merge_games_and_lineups(games, lineups, db_map)
+
+    logger.info("Step 5: Finding deltas...")
     deltas = find_deltas(games, db_games)
     logger.info(f"  {len(deltas)} deltas found")
 
     if deltas:
-        logger.info(f"Step 5: Upserting {len(deltas)} changed games...")
+        logger.info(f"Step 6: Upserting {len(deltas)} changed games...")
         upsert_games(deltas)
     else:
         logger.info("No changes to upsert")
@@ -459,8 +588,9 @@ def run_current_mode():
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
-def main():
-    mode = sys.argv[1] if len(sys.argv) > 1 else "current"
+def run(mode: str | None = None) -> int:
+    """Run the games pipeline in-process. Returns a process exit code."""
+    mode = mode or "current"
 
     if mode == "full":
         print("\n=== FULL MODE: backfill 2020 to present ===")
@@ -470,7 +600,12 @@ def main():
         run_current_mode()
     else:
         print(f"Unknown mode: {mode}. Use 'full' or 'current'.")
-        sys.exit(1)
+        return 1
+    return 0
+
+
+def main():
+    sys.exit(run(sys.argv[1] if len(sys.argv) > 1 else "current"))
 
 
 if __name__ == "__main__":
@@ -14,6 +14,7 @@ from datetime import datetime
 
 REPO_ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "mlb-pipeline" / "src"))
 
 from shared.mlb.mlb_constants import TEAM_ID_TO_NAME
 
@@ -25,6 +26,8 @@ from supabase import create_client, Client
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+from cache import create_session, response_json
+
 load_dotenv()
 
 logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -45,23 +48,29 @@ MLB_PLAYERS_URL = "https://statsapi.mlb.com/api/v1/sports/1/players"
 PITCHER_POSITIONS = {"P", "SP", "RP"}
 TWP_POSITION = "TWP"
 
+SESSION = create_session()
+
 
-def fetch_players_for_season(season):
-    """Fetch all players for a given season from MLB API."""
+def fetch_players_for_season(season, skip_ids=()):
+    """Fetch all players for a given season from MLB API. Players whose id is
+    in skip_ids are left out without building their record."""
     try:
-        resp = requests.get(MLB_PLAYERS_URL, params={"season": season}, timeout=30)
+        resp = SESSION.get(MLB_PLAYERS_URL, params={"season": season}, timeout=30)
         resp.raise_for_status()
-        people = resp.json().get("people", [])
+        people = response_json(resp).get("people", [])
         logger.info(f"  {len(people)} players from MLB API for {season}")
 
         players = []
+        lookup_team = TEAM_ID_TO_NAME.get  # bound once for the loop below
         for p in people:
             player_id = p.get("id")
+            if player_id in skip_ids:
+                continue
             full_name = p.get("fullName")
             position = p.get("primaryPosition", {}).get("abbreviation", "UNK")
             team = p.get("currentTeam", {})
             team_id = team.get("id")
-            team_name = TEAM_ID_TO_NAME.get(team_id, team.get("name"))
+            team_name = lookup_team(team_id, team.get("name"))
 
             if position in PITCHER_POSITIONS:
                 player_type = "pitcher"
@@ -86,18 +95,20 @@ def fetch_players_for_season(season):
 
 
 def fetch_db_players():
-    """Fetch all existing players from Supabase."""
+    """Fetch all existing players from Supabase. Pages by PLAYER_ID keyset
+    (PLAYER_ID > last seen) so each page is an index seek, not an OFFSET scan."""
     try:
         all_data = []
-        offset = 0
+        last_id = 0
         page_size = 1000
         while True:
-            resp = supabase.table("mlb_players").select("*").range(offset, offset + page_size - 1).execute()
+            resp = (supabase.table("mlb_players").select("*")
+                    .gt("PLAYER_ID", last_id).order("PLAYER_ID").limit(page_size).execute())
             batch = resp.data or []
             all_data.extend(batch)
             if len(batch) < page_size:
                 break
-            offset += page_size
+            last_id = batch[-1]["PLAYER_ID"]
         return all_data
     except Exception as e:
         logger.error(f"Failed to fetch DB players: {e}")
@@ -174,11 +185,11 @@ def run_full_mode():
     current_year = datetime.now().year
     all_players = {}
 
-    logger.info("Fetching players for all seasons...")
-    for year in range(2020, current_year + 1):
-        players = fetch_players_for_season(year)
-        for p in players:
-            # Keep latest version per player
+    logger.info("Fetching players for all seasons (newest first)...")
+    for year in range(current_year, 2019, -1):
+        # Newest season first: a player's latest version is the first seen,
+        # so older seasons only contribute players not seen yet.
+        for p in fetch_players_for_season(year, skip_ids=all_players):
             all_players[p["PLAYER_ID"]] = p
 
     players_list = list(all_players.values())
@@ -212,8 +223,9 @@ def run_current_mode():
         logger.info("No changes to upsert")
 
 
-def main():
-    mode = sys.argv[1] if len(sys.argv) > 1 else "current"
+def run(mode: str | None = None) -> int:
+    """Run the players pipeline in-process. Returns a process exit code."""
+    mode = mode or "current"
 
     if mode == "full":
         print("\n=== FULL MODE: backfill 2020 to present ===")
@@ -223,7 +235,12 @@ def main():
         run_current_mode()
     else:
         print(f"Unknown mode: {mode}. Use 'full' or 'current'.")
-        sys.exit(1)
+        return 1
+    return 0
+
+
+def main():
+    sys.exit(run(sys.argv[1] if len(sys.argv) > 1 else "current"))
 
 
 if __name__ == "__main__":
@@ -16,10 +16,13 @@ from datetime import datetime, timedelta, timezone
 
 REPO_ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "mlb-pipeline" / "src"))
 
 from shared.mlb.mlb_constants import TEAM_ID_TO_NAME
 
 import os
+import gzip
+import json
 import logging
 import pandas as pd
 import numpy as np
@@ -28,10 +31,14 @@ from supabase import create_client, Client
 from dotenv import load_dotenv
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from time import sleep
-import random
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
+
+from requests_cache import EXPIRE_IMMEDIATELY
+from cache import create_session, response_json, POOL_MAXSIZE
+
+try:
+    import orjson
+except ImportError:  # optional — falls back to the stdlib encoder
+    orjson = None
 
 load_dotenv()
 
@@ -51,8 +58,23 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 MLB_PLAYER_STATS_URL = "https://statsapi.mlb.com/api/v1/people/{player_id}/stats"
 MLB_SCHEDULE_URL = "https://statsapi.mlb.com/api/v1/schedule"
 
-UPSERT_BATCH_SIZE = 500
+UPSERT_BATCH_SIZE = int(os.environ.get("MLB_PLAYERSTATS_UPSERT_BATCH_SIZE", "5000"))
+# Stay under PostgREST's request body limit; bigger batches are split in half.
+MAX_UPSERT_BYTES = 8_000_000
+UPSERT_WORKERS = 4  # concurrent upsert batches; the supabase client pools connections
+# Opt-in: post upsert bodies gzip-compressed (~3x smaller) straight through the
+# PostgREST session. Batches the gateway rejects are resent uncompressed.
+GZIP_UPSERT = os.getenv("MLB_PLAYERSTATS_GZIP_UPSERT", "0") == "1"
 PAGE_SIZE = 1000
+# One worker per pooled connection; the cache module's token bucket keeps
+# the request rate under MLB's limit however many workers are in flight.
+FETCH_WORKERS = POOL_MAXSIZE
+# Redraw fan-out progress bars at most once a second / every 50 players so
+# the bar doesn't hold the GIL on every completed future.
+PROGRESS_OPTS = {"mininterval": 1.0, "miniters": 50}
+# Current mode upserts everything it fetched: the upsert is idempotent and
+# also picks up stat corrections. MLB_SKIP_DELTA=0 upserts only new ids.
+SKIP_DELTA = os.getenv("MLB_SKIP_DELTA", "1") == "1"
 
 # Stat field mappings
 BATTING_FIELDS = {
@@ -71,17 +93,15 @@ PITCHING_FIELDS = {
     "era": "ERA",
 }
 
+BATTING_ITEMS = tuple(BATTING_FIELDS.items())
+PITCHING_ITEMS = tuple(PITCHING_FIELDS.items())
+
+# API stat group -> (STAT_TYPE, (api_key, column) pairs)
+STAT_GROUPS = {
+    "hitting": ("batting", BATTING_ITEMS),
+    "pitching": ("pitching", PITCHING_ITEMS),
+}
 
-def create_session():
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=3, backoff_factor=2,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["GET"],
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("https://", adapter)
-    return session
 
 SESSION = create_session()
 
@@ -95,64 +115,67 @@ def make_id(game_id, player_id, stat_type):
 # ---------------------------------------------------------------------------
 def fetch_player_gamelog(player_id, group, seasons):
     """Fetch game log for a single player for given seasons.
-    group: 'hitting' or 'pitching'
+    group: 'hitting', 'pitching' or 'hitting,pitching' (one request, both groups)
     Returns list of normalized stat dicts."""
     rows = []
+    current_year = datetime.now().year
 
     for season in seasons:
         try:
-            sleep(random.uniform(0.05, 0.15))
             resp = SESSION.get(
                 MLB_PLAYER_STATS_URL.format(player_id=player_id),
                 params={"stats": "gameLog", "group": group, "season": season},
                 timeout=15,
+                # Past seasons are served from the cache; the current one is
+                # still changing, so always revalidate it.
+                expire_after=EXPIRE_IMMEDIATELY if season == current_year else None,
             )
             resp.raise_for_status()
-            data = resp.json()
-
-            stats_list = data.get("stats", [])
-            if not stats_list or not stats_list[0].get("splits"):
-                continue
+            data = response_json(resp)
 
-            field_map = BATTING_FIELDS if group == "hitting" else PITCHING_FIELDS
-            stat_type = "batting" if group == "hitting" else "pitching"
-
-            for split in stats_list[0]["splits"]:
-                raw = split.get("stat", {})
-                game_info = split.get("game", {})
-                team_info = split.get("team", {})
-                opponent_info = split.get("opponent", {})
-
-                game_pk = game_info.get("gamePk")
-                if not game_pk:
+            # One stats entry per requested group, tagged with its group name
+            for stats_entry in data.get("stats", []):
+                entry_group = (stats_entry.get("group") or {}).get("displayName") or group
+                if entry_group not in STAT_GROUPS:
                     continue
-
-                row = {
-                    "GAME_ID": game_pk,
-                    "PLAYER_ID": player_id,
-                    "GAME_DATE": split.get("date"),
-                    "SEASON_ID": season,
-                    "TEAM_ID": team_info.get("id"),
-                    "OPPONENT_ID": opponent_info.get("id"),
-                    "IS_HOME": split.get("isHome", None),
-                    "STAT_TYPE": stat_type,
-                }
-
-                # Map stat fields
-                for api_key, col_name in field_map.items():
-                    val = raw.get(api_key)
-                    row[col_name] = val
-
-                # Compute WHIP for pitching
-                if stat_type == "pitching":
-                    ip = raw.get("inningsPitched")
-                    h = raw.get("hits", 0)
-                    bb = raw.get("baseOnBalls", 0)
-                    if ip and float(ip) > 0:
-                        row["WHIP"] = round((h + bb) / float(ip), 3)
-
-                row["id"] = make_id(game_pk, player_id, stat_type)
-                rows.append(row)
+                stat_type, field_items = STAT_GROUPS[entry_group]
+
+                for split in stats_entry.get("splits") or []:
+                    raw = split.get("stat", {})
+                    game_info = split.get("game", {})
+                    team_info = split.get("team", {})
+                    opponent_info = split.get("opponent", {})
+
+                    game_pk = game_info.get("gamePk")
+                    if not game_pk:
+                        continue
+
+                    row = {
+                        "GAME_ID": game_pk,
+                        "PLAYER_ID": player_id,
+                        "GAME_DATE": split.get("date"),
+                        "SEASON_ID": season,
+                        "TEAM_ID": team_info.get("id"),
+                        "OPPONENT_ID": opponent_info.get("id"),
+                        "IS_HOME": split.get("isHome", None),
+                        "STAT_TYPE": stat_type,
+                    }
+
+                    # Map stat fields
+                    raw_get = raw.get
+                    for api_key, col_name in field_items:
+                        row[col_name] = raw_get(api_key)
+
+                    # Compute WHIP for pitching
+                    if stat_type == "pitching":
+                        ip = raw.get("inningsPitched")
+                        h = raw.get("hits", 0)
+                        bb = raw.get("baseOnBalls", 0)
+                        if ip and float(ip) > 0:
+                            row["WHIP"] = round((h + bb) / float(ip), 3)
+
+                    row["id"] = make_id(game_pk, player_id, stat_type)
+                    rows.append(row)
 
         except Exception as e:
             logger.debug(f"GameLog failed player={player_id} group={group} season={season}: {e}")
@@ -162,15 +185,13 @@ def fetch_player_gamelog(player_id, group, seasons):
 
 def fetch_player_all_stats(player_id, player_type, seasons):
     """Fetch all relevant stats for a player based on their type."""
-    rows = []
-
-    if player_type in ("batter", "two_way"):
-        rows.extend(fetch_player_gamelog(player_id, "hitting", seasons))
-
-    if player_type in ("pitcher", "two_way"):
-        rows.extend(fetch_player_gamelog(player_id, "pitching", seasons))
-
-    return rows
+    if player_type == "two_way":
+        return fetch_player_gamelog(player_id, "hitting,pitching", seasons)
+    if player_type == "pitcher":
+        return fetch_player_gamelog(player_id, "pitching", seasons)
+    if player_type == "batter":
+        return fetch_player_gamelog(player_id, "hitting", seasons)
+    return []
 
 
 # ---------------------------------------------------------------------------
@@ -195,81 +216,150 @@ def fetch_paginated(table, select, filters=None, order_col=None):
     return all_rows
 
 
-def fetch_db_playerstats(game_ids=None):
-    """Fetch existing playerstats from DB for given game IDs."""
-    if game_ids:
-        all_data = []
-        batch_size = 200
-        for i in range(0, len(game_ids), batch_size):
-            batch = game_ids[i:i + batch_size]
-            resp = supabase.table("mlb_playerstats").select("id,GAME_ID,PLAYER_ID,STAT_TYPE").in_("GAME_ID", batch).execute()
-            if resp.data:
-                all_data.extend(resp.data)
-        return all_data
-    return []
+# The IN filter puts every id in the URL; 200 per batch keeps it under
+# proxy URL-length limits (same as games.py and gamelogs.py).
+DB_IN_BATCH_SIZE = 200
+DB_FETCH_WORKERS = 4
+DB_MISSING_RPC = "mlb_playerstats_missing_ids"
+# Each call returns at most this many ids, so it stays under max-rows.
+DB_MISSING_RPC_BATCH_SIZE = 1000
+DB_PLAYER_IDS_RPC = "mlb_playerstats_player_ids"
 
 
-def _clean_payload(row):
-    """Convert stat row to Supabase-safe payload."""
-    def safe_int(val):
-        if val is None or (isinstance(val, float) and np.isnan(val)):
-            return None
-        try:
-            return int(val)
-        except (ValueError, TypeError):
-            return None
+def _fetch_db_ids_for_games(game_ids):
+    """ids of stored rows for one batch of games, paged past the max-rows cap."""
+    rows = []
+    offset = 0
+    while True:
+        resp = (supabase.table("mlb_playerstats").select("id").in_("GAME_ID", game_ids)
+                .order("id").range(offset, offset + PAGE_SIZE - 1).execute())
+        batch = resp.data or []
+        rows.extend(batch)
+        if len(batch) < PAGE_SIZE:
+            return rows
+        offset += PAGE_SIZE
+
+
+def fetch_db_playerstats(game_ids=None):
+    """Fetch ids of existing playerstats from DB for given game IDs."""
+    if not game_ids:
+        return []
+    batches = [game_ids[i:i + DB_IN_BATCH_SIZE] for i in range(0, len(game_ids), DB_IN_BATCH_SIZE)]
+    all_data = []
+    with ThreadPoolExecutor(max_workers=DB_FETCH_WORKERS) as executor:
+        for rows in executor.map(_fetch_db_ids_for_games, batches):
+            all_data.extend(rows)
+    return all_data
+
+
+def fetch_db_player_ids():
+    """Distinct PLAYER_IDs with stored stats, from the mlb_playerstats_player_ids
+    RPC (one array response); falls back to paging every row's PLAYER_ID."""
+    try:
+        resp = supabase.rpc(DB_PLAYER_IDS_RPC, {}).execute()
+        return set(int(pid) for pid in resp.data or [])
+    except Exception as e:
+        logger.warning(f"{DB_PLAYER_IDS_RPC} RPC failed ({e}), falling back to a full scan")
+    rows = fetch_paginated("mlb_playerstats", "PLAYER_ID", None, order_col="PLAYER_ID")
+    return set(int(r["PLAYER_ID"]) for r in rows)
+
+
+def find_missing_rows(rows):
+    """Rows whose id is not stored yet. The anti-join runs server-side via
+    the mlb_playerstats_missing_ids RPC; if that is not deployed, existing
+    ids are fetched per game and diffed here."""
+    ids = [r["id"] for r in rows]
+    try:
+        missing = set()
+        for i in range(0, len(ids), DB_MISSING_RPC_BATCH_SIZE):
+            resp = supabase.rpc(DB_MISSING_RPC, {"ids": ids[i:i + DB_MISSING_RPC_BATCH_SIZE]}).execute()
+            missing.update(r["id"] for r in resp.data or [])
+        return [r for r in rows if r["id"] in missing]
+    except Exception as e:
+        logger.warning(f"{DB_MISSING_RPC} RPC failed ({e}), falling back to id fetch")
+
+    game_ids = list(set(r["GAME_ID"] for r in rows))
+    existing_ids = set(r["id"] for r in fetch_db_playerstats(game_ids))
+    return [r for r in rows if r["id"] not in existing_ids]
+
+
+PAYLOAD_COLUMNS = [
+    "id", "GAME_ID", "PLAYER_ID", "GAME_DATE", "SEASON_ID", "TEAM_ID", "OPPONENT_ID",
+    "IS_HOME", "STAT_TYPE",
+    "AB", "H", "R", "DOUBLES", "TRIPLES", "HR", "RBI", "BB", "SO", "SB", "CS",
+    "HBP", "SF", "PA", "BA", "OBP", "SLG", "OPS",
+    "IP", "H_P", "R_P", "ER", "BB_P", "SO_P", "HR_P", "BF", "PIT", "ERA", "WHIP",
+]
+INT_COLUMNS = [
+    "GAME_ID", "PLAYER_ID", "SEASON_ID", "TEAM_ID", "OPPONENT_ID",
+    "AB", "H", "R", "DOUBLES", "TRIPLES", "HR", "RBI", "BB", "SO", "SB", "CS",
+    "HBP", "SF", "PA",
+    "H_P", "R_P", "ER", "BB_P", "SO_P", "HR_P", "BF", "PIT",
+]
+FLOAT_COLUMNS = ["BA", "OBP", "SLG", "OPS", "IP", "ERA", "WHIP"]
+NUMERIC_COLUMNS = INT_COLUMNS + FLOAT_COLUMNS
+
+
+def _clean_payloads(rows):
+    """Convert stat rows to Supabase-safe payloads.
+
+    Coerces the whole batch column-wise: unparseable values (e.g. "-.--"
+    ERA) and +/-inf become NULL, ints are truncated, floats rounded to 3 dp."""
+    df = pd.DataFrame(rows, columns=PAYLOAD_COLUMNS)
+    numeric = df[NUMERIC_COLUMNS].apply(pd.to_numeric, errors="coerce").replace([np.inf, -np.inf], np.nan)
+    df[INT_COLUMNS] = numeric[INT_COLUMNS].apply(np.trunc).astype("Int64")
+    df[FLOAT_COLUMNS] = numeric[FLOAT_COLUMNS].round(3)
+    # object dtype so to_dict yields native ints/floats and None for NULLs
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def _dumps(batch):
+    if orjson is not None:
+        return orjson.dumps(batch)
+    return json.dumps(batch).encode()
+
+
+def _post_gzip(body):
+    resp = supabase.postgrest.session.post(
+        "mlb_playerstats",
+        params={"on_conflict": "id"},
+        content=gzip.compress(body, compresslevel=1),
+        headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+            "Prefer": "resolution=merge-duplicates,return=minimal",
+        },
+    )
+    resp.raise_for_status()
 
-    def safe_float(val):
-        if val is None or (isinstance(val, float) and np.isnan(val)):
-            return None
+
+def _send_batch(batch, body):
+    if GZIP_UPSERT:
         try:
-            v = float(val)
-            if np.isinf(v):
-                return None
-            return round(v, 3)
-        except (ValueError, TypeError):
-            return None
-
-    return {
-        "id": row["id"],
-        "GAME_ID": safe_int(row.get("GAME_ID")),
-        "PLAYER_ID": safe_int(row.get("PLAYER_ID")),
-        "GAME_DATE": row.get("GAME_DATE"),
-        "SEASON_ID": safe_int(row.get("SEASON_ID")),
-        "TEAM_ID": safe_int(row.get("TEAM_ID")),
-        "OPPONENT_ID": safe_int(row.get("OPPONENT_ID")),
-        "IS_HOME": row.get("IS_HOME"),
-        "STAT_TYPE": row.get("STAT_TYPE"),
-        "AB": safe_int(row.get("AB")),
-        "H": safe_int(row.get("H")),
-        "R": safe_int(row.get("R")),
-        "DOUBLES": safe_int(row.get("DOUBLES")),
-        "TRIPLES": safe_int(row.get("TRIPLES")),
-        "HR": safe_int(row.get("HR")),
-        "RBI": safe_int(row.get("RBI")),
-        "BB": safe_int(row.get("BB")),
-        "SO": safe_int(row.get("SO")),
-        "SB": safe_int(row.get("SB")),
-        "CS": safe_int(row.get("CS")),
-        "HBP": safe_int(row.get("HBP")),
-        "SF": safe_int(row.get("SF")),
-        "PA": safe_int(row.get("PA")),
-        "BA": safe_float(row.get("BA")),
-        "OBP": safe_float(row.get("OBP")),
-        "SLG": safe_float(row.get("SLG")),
-        "OPS": safe_float(row.get("OPS")),
-        "IP": safe_float(row.get("IP")),
-        "H_P": safe_int(row.get("H_P")),
-        "R_P": safe_int(row.get("R_P")),
-        "ER": safe_int(row.get("ER")),
-        "BB_P": safe_int(row.get("BB_P")),
-        "SO_P": safe_int(row.get("SO_P")),
-        "HR_P": safe_int(row.get("HR_P")),
-        "BF": safe_int(row.get("BF")),
-        "PIT": safe_int(row.get("PIT")),
-        "ERA": safe_float(row.get("ERA")),
-        "WHIP": safe_float(row.get("WHIP")),
-    }
+            _post_gzip(body)
+            return
+        except Exception as e:
+            logger.debug(f"gzip upsert failed, resending uncompressed: {e}")
+    supabase.table("mlb_playerstats").upsert(batch, on_conflict="id").execute()
+
+
+def _upsert_batch(batch):
+    """Upsert one batch, halving it when it is too large or fails so only
+    the half holding a bad row is retried. Returns rows upserted."""
+    body = _dumps(batch)
+    if len(batch) > 1 and len(body) > MAX_UPSERT_BYTES:
+        mid = len(batch) // 2
+        return _upsert_batch(batch[:mid]) + _upsert_batch(batch[mid:])
+    try:
+        _send_batch(batch, body)
+        return len(batch)
+    except Exception as e:
+        if len(batch) == 1:
+            logger.error(f"Row failed id={batch[0].get('id')}: {e}")
+            return 0
+        logger.warning(f"Batch upsert failed ({len(batch)} rows), splitting: {e}")
+        mid = len(batch) // 2
+        return _upsert_batch(batch[:mid]) + _upsert_batch(batch[mid:])
 
 
 def upsert_playerstats(rows):
@@ -278,24 +368,16 @@ def upsert_playerstats(rows):
         logger.info("No playerstats to upsert")
         return
 
-    payloads = [_clean_payload(r) for r in rows]
+    payloads = _clean_payloads(rows)
     success = 0
 
-    with tqdm(total=len(payloads), desc="Upserting playerstats") as pbar:
-        for i in range(0, len(payloads), UPSERT_BATCH_SIZE):
-            batch = payloads[i:i + UPSERT_BATCH_SIZE]
-            try:
-                supabase.table("mlb_playerstats").upsert(batch, on_conflict="id").execute()
-                success += len(batch)
-            except Exception as e:
-                logger.warning(f"Batch upsert failed: {e}")
-                for payload in batch:
-                    try:
-                        supabase.table("mlb_playerstats").upsert(payload, on_conflict="id").execute()
-                        success += 1
-                    except Exception as row_err:
-                        logger.error(f"Row failed id={payload.get('id')}: {row_err}")
-            pbar.update(len(batch))
+    batches = [payloads[i:i + UPSERT_BATCH_SIZE] for i in range(0, len(payloads), UPSERT_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as executor, \
+            tqdm(total=len(payloads), desc="Upserting playerstats") as pbar:
+        futures = {executor.submit(_upsert_batch, batch): len(batch) for batch in batches}
+        for future in as_completed(futures):
+            success += future.result()
+            pbar.update(futures[future])
 
     logger.info(f"Upserted {success}/{len(payloads)} playerstats rows")
 
@@ -303,36 +385,47 @@ def upsert_playerstats(rows):
 # ---------------------------------------------------------------------------
 # 3. Mode implementations
 # ---------------------------------------------------------------------------
-def run_full_mode():
-    """Full backfill: all players x all seasons 2020 to present."""
-    current_year = datetime.now().year
-    seasons = list(range(2020, current_year + 1))
+ROSTER_LIST_FIELDS = ["HOME_LINEUP", "AWAY_LINEUP", "HOME_BULLPEN", "AWAY_BULLPEN"]
+ROSTER_SP_FIELDS = ["HOME_SP", "AWAY_SP"]
 
-    logger.info("Loading all players from DB...")
+
+def roster_player_ids(games):
+    """Sorted unique non-zero player ids from the games' lineups, bullpens
+    and starters, deduplicated with np.unique instead of a Python set."""
+    listed = np.fromiter(
+        (pid for g in games for f in ROSTER_LIST_FIELDS for pid in (g.get(f) or []) if pid),
+        dtype=np.int64,
+    )
+    starters = np.fromiter(
+        (pid for g in games for f in ROSTER_SP_FIELDS if (pid := g.get(f))),
+        dtype=np.int64,
+    )
+    return np.unique(np.concatenate([listed, starters])).tolist()
+
+
+def fetch_player_types():
+    """{PLAYER_ID: PLAYER_TYPE} for every player in mlb_players."""
     players = fetch_paginated("mlb_players", "PLAYER_ID,PLAYER_TYPE", order_col="PLAYER_ID")
-    if not players:
-        logger.error("No players in DB. Run players.py full first.")
-        return
-    logger.info(f"  {len(players)} players to process")
+    return {int(p["PLAYER_ID"]): p.get("PLAYER_TYPE", "batter") for p in players}
 
-    # No pre-delete needed — upsert with on_conflict="id" will overwrite existing rows.
-    # Deleting 400k+ rows often times out on Supabase's default statement timeout.
-    logger.info("Skipping pre-delete (upsert handles conflicts)...")
 
+def _run_pipeline(pids, seasons, type_map, delta_check=False, desc="Fetching player stats"):
+    """Fetch game logs for pids concurrently, dedupe by id and upsert.
+    With delta_check only ids not stored yet are upserted.
+    Returns the number of rows handed to upsert."""
     all_rows = []
     errors = []
 
-    def process_player(player):
-        pid = player["PLAYER_ID"]
-        ptype = player.get("PLAYER_TYPE", "batter")
+    def process_player(pid):
+        ptype = type_map.get(pid, "batter")
         try:
             return fetch_player_all_stats(pid, ptype, seasons)
         except Exception as e:
             return f"Error player {pid}: {e}"
 
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = {executor.submit(process_player, p): p for p in players}
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching player stats", unit="player"):
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        futures = [executor.submit(process_player, pid) for pid in pids]
+        for future in tqdm(as_completed(futures), total=len(futures), desc=desc, unit="player", **PROGRESS_OPTS):
             result = future.result()
             if isinstance(result, str):
                 errors.append(result)
@@ -340,18 +433,39 @@ def run_full_mode():
                 all_rows.extend(result)
 
     if errors:
-        logger.warning(f"  {len(errors)} errors during fetch")
+        logger.warning(f"  {len(errors)} errors during fetch:")
+        for err in errors[:20]:
+            logger.warning(f"    {err}")
 
     # Deduplicate by id
-    seen = set()
-    unique_rows = []
-    for r in all_rows:
-        if r["id"] not in seen:
-            seen.add(r["id"])
-            unique_rows.append(r)
+    rows = list({r["id"]: r for r in all_rows}.values())
+    logger.info(f"  {len(rows)} unique stat rows fetched")
+
+    if delta_check:
+        rows = find_missing_rows(rows)
+        logger.info(f"  {len(rows)} new rows to upsert")
+
+    upsert_playerstats(rows)
+    return len(rows)
+
+
+def run_full_mode():
+    """Full backfill: all players x all seasons 2020 to present."""
+    current_year = datetime.now().year
+    seasons = list(range(2020, current_year + 1))
+
+    logger.info("Loading all players from DB...")
+    type_map = fetch_player_types()
+    if not type_map:
+        logger.error("No players in DB. Run players.py full first.")
+        return
+    logger.info(f"  {len(type_map)} players to process")
 
-    logger.info(f"  {len(unique_rows)} unique stat rows to insert")
-    upsert_playerstats(unique_rows)
+    # No pre-delete needed — upsert with on_conflict="id" will overwrite existing rows.
+    # Deleting 400k+ rows often times out on Supabase's default statement timeout.
+    logger.info("Skipping pre-delete (upsert handles conflicts)...")
+
+    _run_pipeline(list(type_map), seasons, type_map)
 
 
 def run_current_mode():
@@ -376,16 +490,7 @@ def run_current_mode():
         return
 
     # Collect all player IDs from lineups
-    player_ids = set()
-    for g in games:
-        for field in ["HOME_LINEUP", "AWAY_LINEUP", "HOME_BULLPEN", "AWAY_BULLPEN"]:
-            for pid in (g.get(field) or []):
-                if pid:
-                    player_ids.add(int(pid))
-        for field in ["HOME_SP", "AWAY_SP"]:
-            pid = g.get(field)
-            if pid:
-                player_ids.add(int(pid))
+    player_ids = roster_player_ids(games)
 
     if not player_ids:
         logger.info("No player IDs found in recent games")
@@ -393,48 +498,7 @@ def run_current_mode():
 
     logger.info(f"  {len(player_ids)} unique players from recent games")
 
-    # Load player types from DB
-    players_db = fetch_paginated("mlb_players", "PLAYER_ID,PLAYER_TYPE", order_col="PLAYER_ID")
-    type_map = {p["PLAYER_ID"]: p.get("PLAYER_TYPE", "batter") for p in players_db}
-
-    all_rows = []
-
-    def process_player(pid):
-        ptype = type_map.get(pid, "batter")
-        try:
-            return fetch_player_all_stats(pid, ptype, seasons)
-        except Exception as e:
-            return f"Error player {pid}: {e}"
-
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = {executor.submit(process_player, pid): pid for pid in player_ids}
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching player stats", unit="player"):
-            result = future.result()
-            if isinstance(result, list):
-                all_rows.extend(result)
-
-    # Deduplicate
-    seen = set()
-    unique_rows = []
-    for r in all_rows:
-        if r["id"] not in seen:
-            seen.add(r["id"])
-            unique_rows.append(r)
-
-    logger.info(f"  {len(unique_rows)} stat rows fetched")
-
-    # Delta check
-    game_ids = list(set(r["GAME_ID"] for r in unique_rows))
-    existing = fetch_db_playerstats(game_ids)
-    existing_ids = set(r["id"] for r in existing)
-
-    deltas = [r for r in unique_rows if r["id"] not in existing_ids]
-    logger.info(f"  {len(deltas)} new rows to upsert")
-
-    if deltas:
-        upsert_playerstats(deltas)
-    else:
-        logger.info("No changes to upsert")
+    _run_pipeline(player_ids, seasons, fetch_player_types(), delta_check=not SKIP_DELTA)
 
 
 def run_backfill_mode():
@@ -450,23 +514,13 @@ def run_backfill_mode():
         "GAME_ID,HOME_LINEUP,AWAY_LINEUP,HOME_SP,AWAY_SP,HOME_BULLPEN,AWAY_BULLPEN", None,
         order_col="GAME_ID")
 
-    game_pids = set()
-    for g in games:
-        for field in ["HOME_LINEUP", "AWAY_LINEUP", "HOME_BULLPEN", "AWAY_BULLPEN"]:
-            for pid in (g.get(field) or []):
-                if pid:
-                    game_pids.add(int(pid))
-        for field in ["HOME_SP", "AWAY_SP"]:
-            pid = g.get(field)
-            if pid:
-                game_pids.add(int(pid))
+    game_pids = set(roster_player_ids(games))
 
     logger.info(f"  {len(game_pids)} unique players in game rosters")
 
     # Get all player IDs already in playerstats
     logger.info("Loading existing playerstats player IDs...")
-    existing_rows = fetch_paginated("mlb_playerstats", "PLAYER_ID", None, order_col="PLAYER_ID")
-    existing_pids = set(int(r["PLAYER_ID"]) for r in existing_rows)
+    existing_pids = fetch_db_player_ids()
     logger.info(f"  {len(existing_pids)} players already have stats")
 
     missing_pids = game_pids - existing_pids
@@ -476,50 +530,13 @@ def run_backfill_mode():
 
     logger.info(f"  {len(missing_pids)} players missing stats — fetching...")
 
-    # Get player types
-    players_db = fetch_paginated("mlb_players", "PLAYER_ID,PLAYER_TYPE", order_col="PLAYER_ID")
-    type_map = {int(p["PLAYER_ID"]): p.get("PLAYER_TYPE", "batter") for p in players_db}
-
-    all_rows = []
-    errors = []
-
-    def process_player(pid):
-        ptype = type_map.get(pid, "batter")
-        try:
-            return fetch_player_all_stats(pid, ptype, seasons)
-        except Exception as e:
-            return f"Error player {pid}: {e}"
-
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = {executor.submit(process_player, pid): pid for pid in missing_pids}
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Backfilling player stats", unit="player"):
-            result = future.result()
-            if isinstance(result, str):
-                errors.append(result)
-            elif result:
-                all_rows.extend(result)
-
-    if errors:
-        logger.warning(f"  {len(errors)} errors during fetch:")
-        for err in errors[:20]:
-            logger.warning(f"    {err}")
-
-    # Deduplicate
-    seen = set()
-    unique_rows = []
-    for r in all_rows:
-        if r["id"] not in seen:
-            seen.add(r["id"])
-            unique_rows.append(r)
-
-    logger.info(f"  {len(unique_rows)} new stat rows to upsert")
-    if unique_rows:
-        upsert_playerstats(unique_rows)
+    _run_pipeline(sorted(missing_pids), seasons, fetch_player_types(), desc="Backfilling player stats")
     logger.info("=== BACKFILL COMPLETE ===")
 
 
-def main():
-    mode = sys.argv[1] if len(sys.argv) > 1 else "current"
+def run(mode: str | None = None) -> int:
+    """Run the playerstats pipeline in-process. Returns a process exit code."""
+    mode = mode or "current"
 
     if mode == "full":
         print("\n=== FULL MODE: backfill 2020 to present ===")
@@ -531,7 +548,12 @@ def main():
         run_backfill_mode()
     else:
         print(f"Unknown mode: {mode}. Use 'full', 'current', or 'backfill'.")
-        sys.exit(1)
+        return 1
+    return 0
+
+
+def main():
+    sys.exit(run(sys.argv[1] if len(sys.argv) > 1 else "current"))
 
 
 if __name__ == "__main__":
@@ -14,7 +14,7 @@ Usage: python predict.py
 
 import sys
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
 REPO_ROOT = Path(__file__).resolve().parents[2]
@@ -22,7 +22,14 @@ sys.path.insert(0, str(REPO_ROOT))
 sys.path.insert(0, str(REPO_ROOT / "mlb-pipeline" / "src"))
 
 import os
+
+# One XGBoost/OpenMP thread per physical core (assumes 2-way SMT) instead of
+# one per logical CPU. Must be set before xgboost loads; an explicit
+# OMP_NUM_THREADS in the environment wins.
+XGB_THREADS = int(os.environ.setdefault("OMP_NUM_THREADS", str(max(1, (os.cpu_count() or 2) // 2))))
+
 import logging
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 import xgboost as xgb
@@ -49,20 +56,28 @@ SP_STATS = ["ERA", "WHIP", "SO", "BB", "HR", "IP"]
 BP_STATS = ["ERA", "WHIP", "SO", "BB", "HR", "IP"]
 WINDOWS = [10, 50]
 
-FEATURE_COLS = []
-for side in ["HOME", "AWAY"]:
-    for stat in BATTING_STATS:
-        for w in WINDOWS:
-            FEATURE_COLS.append(f"{side}_{stat}_{w}")
-    for stat in SP_STATS:
-        for w in WINDOWS:
-            FEATURE_COLS.append(f"{side}_SP_{stat}_{w}")
-    for stat in BP_STATS:
+
+def _build_feature_cols():
+    """All raw feature column names, in model order."""
+    cols = []
+    for side in ["HOME", "AWAY"]:
+        for stat in BATTING_STATS:
+            for w in WINDOWS:
+                cols.append(f"{side}_{stat}_{w}")
+        for stat in SP_STATS:
+            for w in WINDOWS:
+                cols.append(f"{side}_SP_{stat}_{w}")
+        for stat in BP_STATS:
+            for w in WINDOWS:
+                cols.append(f"{side}_BP_{stat}_{w}")
         for w in WINDOWS:
-            FEATURE_COLS.append(f"{side}_BP_{stat}_{w}")
-    for w in WINDOWS:
-        FEATURE_COLS.append(f"{side}_WIN_RATE_{w}")
-        FEATURE_COLS.append(f"{side}_GAMES_{w}")
+            cols.append(f"{side}_WIN_RATE_{w}")
+            cols.append(f"{side}_GAMES_{w}")
+    return tuple(cols)
+
+
+FEATURE_COLS = _build_feature_cols()
+_FEATURE_SET = frozenset(FEATURE_COLS)
 
 DIFF_FEATURES = {
     "DIFF_OPS_10": ("HOME_OPS_10", "AWAY_OPS_10"),
@@ -79,56 +94,82 @@ DIFF_FEATURES = {
     "DIFF_WIN_RATE_50": ("HOME_WIN_RATE_50", "AWAY_WIN_RATE_50"),
 }
 
-ALL_FEATURES = FEATURE_COLS + list(DIFF_FEATURES.keys())
+DIFF_HOME_COLS = [home for home, _ in DIFF_FEATURES.values()]
+DIFF_AWAY_COLS = [away for _, away in DIFF_FEATURES.values()]
+
+ALL_FEATURES = [*FEATURE_COLS, *DIFF_FEATURES]
 
 
 # ---------------------------------------------------------------------------
 # 1. Load model
 # ---------------------------------------------------------------------------
+@lru_cache(maxsize=2)
+def _load_booster(path_str, mtime_ns):
+    """Parse the booster JSON. Keyed on mtime so a retrained model reloads."""
+    booster = xgb.Booster()
+    booster.load_model(path_str)
+    booster.set_param({"nthread": XGB_THREADS})
+    return booster
+
+
 def load_model(path):
-    """Load XGBoost model from JSON file. Returns None if not found."""
+    """Load the XGBoost booster from JSON file. Returns None if not found.
+
+    Repeated calls in one process reuse the parsed booster until the file
+    changes."""
     if not path.exists():
         logger.warning(f"Model not found: {path}")
         logger.warning("Run train.py first to generate the model.")
         return None
 
-    model = xgb.XGBClassifier()
-    model.load_model(str(path))
+    booster = _load_booster(str(path), path.stat().st_mtime_ns)
     logger.info(f"Model loaded from {path}")
-    return model
+    return booster
 
 
 # ---------------------------------------------------------------------------
 # 2. Fetch today's scheduled games
 # ---------------------------------------------------------------------------
+def _to_nullable(values, dtype):
+    """Cast an already-numeric JSON column straight to a nullable dtype.
+    Falls back to to_numeric coercion if it holds non-numeric artifacts."""
+    try:
+        return pd.array(values.to_numpy(), dtype=dtype)
+    except (TypeError, ValueError):
+        return pd.to_numeric(values, errors="coerce").astype(dtype)
+
+
 def fetch_todays_games():
     """Fetch gamelogs for today's date with GAME_STATUS=1 (scheduled).
 
     "Today" is defined in US/Eastern time since MLB games are scheduled in ET.
-    We fetch all scheduled games and filter to today's date.
+    GAME_DATE holds the official date at midnight UTC, so the date filter is
+    applied server-side as a [today, tomorrow) range on that column.
     """
     eastern = ZoneInfo("America/New_York")
     now_et = datetime.now(eastern)
     today_date = now_et.date()
-
-    # Fetch all scheduled games
-    filters = [("eq", "GAME_STATUS", 1)]
-    rows = fetch_paginated("mlb_gamelogs", "*", filters)
+    tomorrow_date = today_date + timedelta(days=1)
+
+    filters = [
+        ("eq", "GAME_STATUS", 1),
+        ("gte", "GAME_DATE", f"{today_date.isoformat()}T00:00:00+00:00"),
+        ("lt", "GAME_DATE", f"{tomorrow_date.isoformat()}T00:00:00+00:00"),
+    ]
+    # A day's slate fits in one page, so keyset paging is a single request
+    # with no count(*) — an empty day returns straight away.
+    rows = fetch_paginated("mlb_gamelogs", "*", filters, keyset_col="GAME_ID")
     if not rows:
         return pd.DataFrame()
 
     df = pd.DataFrame(rows)
     df["GAME_DATE"] = pd.to_datetime(df["GAME_DATE"], utc=True)
-    df["GAME_ID"] = pd.to_numeric(df["GAME_ID"], errors="coerce").astype("Int64")
-    df["PREDICTION"] = pd.to_numeric(df.get("PREDICTION"), errors="coerce")
-    df["PREDICTION_PCT"] = pd.to_numeric(df.get("PREDICTION_PCT"), errors="coerce")
-
-    # Filter to today's date
-    df = df[df["GAME_DATE"].dt.date == today_date].copy()
+    for col, dtype in (("GAME_ID", "Int64"), ("PREDICTION", "Float32"), ("PREDICTION_PCT", "Float32")):
+        df[col] = _to_nullable(df.get(col, pd.Series(None, index=df.index, dtype=object)), dtype)
 
-    for col in FEATURE_COLS:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+    # Cast the feature block once, as float32 — all XGBoost needs
+    feature_cols = [col for col in df.columns if col in _FEATURE_SET]
+    df[feature_cols] = df[feature_cols].apply(pd.to_numeric, errors="coerce").astype(np.float32)
 
     return df
 
@@ -137,21 +178,42 @@ def fetch_todays_games():
 # 3. Add derived features
 # ---------------------------------------------------------------------------
 def add_diff_features(df):
-    """Add derived difference features (home minus away)."""
-    for name, (home_col, away_col) in DIFF_FEATURES.items():
-        if home_col in df.columns and away_col in df.columns:
-            df[name] = df[home_col] - df[away_col]
-        else:
-            df[name] = np.nan
+    """Add derived difference features (home minus away) as one block.
+    A missing source column yields NaN for its diff."""
+    home = df.reindex(columns=DIFF_HOME_COLS).to_numpy(dtype=np.float64)
+    away = df.reindex(columns=DIFF_AWAY_COLS).to_numpy(dtype=np.float64)
+    df[list(DIFF_FEATURES)] = home - away
     return df
 
 
 # ---------------------------------------------------------------------------
 # 4. Predict and write back
 # ---------------------------------------------------------------------------
-def predict_and_write(model, games_df):
+ROSTER_COLS = ["HOME_LINEUP", "AWAY_LINEUP", "HOME_SP", "AWAY_SP"]
+
+
+def roster_checks(games_df):
+    """One boolean column per ROSTER_COLS entry: lineup is a non-empty list,
+    starting pitcher is not null."""
+    def nonempty(col):
+        values = games_df[col].to_numpy(dtype=object)
+        return pd.Series(np.fromiter((isinstance(v, list) and len(v) > 0 for v in values),
+                                     dtype=bool, count=len(values)), index=games_df.index)
+
+    return pd.DataFrame({
+        "HOME_LINEUP": nonempty("HOME_LINEUP"),
+        "AWAY_LINEUP": nonempty("AWAY_LINEUP"),
+        "HOME_SP": games_df["HOME_SP"].notna(),
+        "AWAY_SP": games_df["AWAY_SP"].notna(),
+    }, index=games_df.index)
+
+
+def predict_and_write(booster, games_df):
     """Predict outcomes for new games and write to Supabase.
 
+    Features go to the booster as one float32 array via inplace_predict,
+    which returns the home-win probability directly (no DMatrix copy).
+
     Returns:
         tuple: (new_predictions_df, skipped_count)
     """
@@ -169,65 +231,79 @@ def predict_and_write(model, games_df):
     # Skip games missing roster data — both lineups (HOME_LINEUP, AWAY_LINEUP)
     # and both starting pitchers (HOME_SP, AWAY_SP) must be present. Without
     # these the key features are empty and we'd be making blind predictions.
-    def has_roster_data(row):
-        home_lu = row.get("HOME_LINEUP")
-        away_lu = row.get("AWAY_LINEUP")
-        home_sp = row.get("HOME_SP")
-        away_sp = row.get("AWAY_SP")
-        has_lineups = (home_lu is not None and isinstance(home_lu, list) and len(home_lu) > 0 and
-                       away_lu is not None and isinstance(away_lu, list) and len(away_lu) > 0)
-        has_sps = pd.notna(home_sp) and pd.notna(away_sp)
-        return has_lineups and has_sps
-
-    roster_mask = new_games.apply(has_roster_data, axis=1)
+    checks = roster_checks(new_games)
+    roster_mask = checks.all(axis=1)
     skipped = new_games[~roster_mask]
     predictable = new_games[roster_mask].copy()
 
     if len(skipped) > 0:
         logger.warning(f"  Skipping {len(skipped)} games with incomplete roster data (lineups/SPs not posted):")
-        for _, row in skipped.iterrows():
-            missing = []
-            home_lu = row.get("HOME_LINEUP")
-            away_lu = row.get("AWAY_LINEUP")
-            if not (home_lu is not None and isinstance(home_lu, list) and len(home_lu) > 0):
-                missing.append("HOME_LINEUP")
-            if not (away_lu is not None and isinstance(away_lu, list) and len(away_lu) > 0):
-                missing.append("AWAY_LINEUP")
-            if not pd.notna(row.get("HOME_SP")):
-                missing.append("HOME_SP")
-            if not pd.notna(row.get("AWAY_SP")):
-                missing.append("AWAY_SP")
-            logger.warning(f"    GAME_ID={row['GAME_ID']}: {row.get('AWAY_NAME', '?')} @ {row.get('HOME_NAME', '?')} — missing: {', '.join(missing)}")
+        for row, present in zip(skipped.itertuples(index=False), checks[~roster_mask].itertuples(index=False)):
+            missing = [col for col, ok in zip(ROSTER_COLS, present) if not ok]
+            logger.warning(f"    GAME_ID={row.GAME_ID}: {getattr(row, 'AWAY_NAME', '?')} @ {getattr(row, 'HOME_NAME', '?')} — missing: {', '.join(missing)}")
 
     if predictable.empty:
         return pd.DataFrame(), len(skipped)
 
-    X = predictable[ALL_FEATURES].astype(float)
-    probs = model.predict_proba(X)[:, 1]
+    # Score with the trees up to the early-stopping best iteration, as the
+    # sklearn wrapper's predict_proba did.
+    best = booster.attr("best_iteration")
+    iteration_range = (0, int(best) + 1) if best is not None else (0, 0)
+    X = predictable[ALL_FEATURES].to_numpy(dtype=np.float32)
+    probs = booster.inplace_predict(X, iteration_range=iteration_range)
 
+    preds = (probs >= 0.5).astype(np.uint8)
     predictable["PREDICTION_PCT"] = probs
-    predictable["PREDICTION"] = (probs >= 0.5).astype(int)
+    predictable["PREDICTION"] = preds
 
     logger.info(f"  Writing {len(predictable)} predictions to Supabase...")
-    for _, row in predictable.iterrows():
-        game_id = int(row["GAME_ID"])
-        pred = int(row["PREDICTION"])
-        prob = round(float(row["PREDICTION_PCT"]), 3)
+    # Round in float64 so the JSON carries 0.654, not float32's 0.65399998
+    pcts = np.round(probs.astype(np.float64), 3)
+    payload = [
+        {"GAME_ID": int(gid), "PREDICTION": int(pred), "PREDICTION_PCT": float(pct)}
+        for gid, pred, pct in zip(predictable["GAME_ID"].to_numpy(), preds, pcts)
+    ]
+    write_predictions(payload)
+
+    return predictable, len(skipped)
+
 
+def write_predictions(payload):
+    """Write PREDICTION/PREDICTION_PCT for many games in one upsert.
+
+    Only the listed columns are updated on conflict. Falls back to per-game
+    updates if the batch is rejected."""
+    try:
+        supabase.table("mlb_gamelogs").upsert(payload, on_conflict="GAME_ID").execute()
+        return
+    except Exception as e:
+        logger.warning(f"  Batch prediction write failed ({e}), writing games one at a time")
+
+    for row in payload:
         try:
             supabase.table("mlb_gamelogs").update({
-                "PREDICTION": pred,
-                "PREDICTION_PCT": prob,
-            }).eq("GAME_ID", game_id).execute()
+                "PREDICTION": row["PREDICTION"],
+                "PREDICTION_PCT": row["PREDICTION_PCT"],
+            }).eq("GAME_ID", row["GAME_ID"]).execute()
         except Exception as e:
-            logger.error(f"  Failed to write GAME_ID={game_id}: {e}")
-
-    return predictable, len(skipped)
+            logger.error(f"  Failed to write GAME_ID={row['GAME_ID']}: {e}")
 
 
 # ---------------------------------------------------------------------------
 # 5. Format and print output
 # ---------------------------------------------------------------------------
+def _name_column(df, col):
+    """Team-name column as object dtype ("???" if the column is absent)."""
+    if col not in df.columns:
+        return pd.Series("???", index=df.index, dtype=object)
+    return df[col].astype(object)
+
+
+def _clip(names, width):
+    """Truncate names to width; non-string values display as "???"."""
+    return names.str[:width].fillna("???")
+
+
 def print_predictions(games_df, new_predictions_df):
     """Print formatted table of ALL today's predictions."""
     today_str = datetime.now(ZoneInfo("America/New_York")).strftime("%Y-%m-%d")
@@ -236,10 +312,10 @@ def print_predictions(games_df, new_predictions_df):
 
     display = games_df.copy()
     if not new_predictions_df.empty:
-        for _, row in new_predictions_df.iterrows():
-            mask = display["GAME_ID"] == row["GAME_ID"]
-            display.loc[mask, "PREDICTION"] = row["PREDICTION"]
-            display.loc[mask, "PREDICTION_PCT"] = row["PREDICTION_PCT"]
+        # Patch in this run's predictions with one index-aligned update
+        display = display.set_index("GAME_ID")
+        display.update(new_predictions_df.set_index("GAME_ID")[["PREDICTION", "PREDICTION_PCT"]])
+        display = display.reset_index()
 
     display = display[display["PREDICTION"].notna()].copy()
 
@@ -253,22 +329,19 @@ def print_predictions(games_df, new_predictions_df):
     print(f"  {'Away Team':<26s}    {'Home Team':<26s} {'Pick':<8s} {'Prob':>7s}  {'Status'}")
     print(f"  {'-' * 84}")
 
-    for _, row in display.sort_values("GAME_DATE").iterrows():
-        away = row.get("AWAY_NAME", "???")
-        home = row.get("HOME_NAME", "???")
-        pred = int(row["PREDICTION"])
-        prob = float(row["PREDICTION_PCT"])
-        game_id = row["GAME_ID"]
-
-        pick = home if pred == 1 else away
-        pick_prob = prob if pred == 1 else (1 - prob)
-        status = "NEW" if game_id in new_ids else "EXISTING"
+    d = display.sort_values("GAME_DATE")
+    is_home_pick = d["PREDICTION"].to_numpy() == 1
+    away = _name_column(d, "AWAY_NAME")
+    home = _name_column(d, "HOME_NAME")
+    pick = pd.Series(np.where(is_home_pick, home, away), index=d.index, dtype=object)
+    prob = d["PREDICTION_PCT"].to_numpy(dtype=float)
+    pick_prob = np.where(is_home_pick, prob, 1 - prob)
+    status = np.where(d["GAME_ID"].isin(new_ids), "NEW", "EXISTING")
 
-        away_disp = away[:25] if isinstance(away, str) else "???"
-        home_disp = home[:25] if isinstance(home, str) else "???"
-        pick_disp = pick[:7] if isinstance(pick, str) else "???"
-
-        print(f"  {away_disp:<26s} @  {home_disp:<26s} {pick_disp:<8s} {pick_prob:>6.1%}  {status}")
+    lines = ("  " + _clip(away, 25).str.ljust(26) + " @  " + _clip(home, 25).str.ljust(26)
+             + " " + _clip(pick, 7).str.ljust(8) + " " + np.char.mod("%5.1f%%", pick_prob * 100)
+             + "  " + status)
+    print("\n".join(lines.tolist()))
 
     new_count = len(new_ids & set(display["GAME_ID"].tolist()))
     existing_count = len(display) - new_count
@@ -304,5 +377,11 @@ def main():
         print(f"  {skipped} games skipped (missing lineups/SPs — run games.py current + gamelogs.py current after rosters are posted)\n")
 
 
+def run(mode: str | None = None) -> int:
+    """Generate today's predictions in-process. Returns a process exit code."""
+    main()
+    return 0
+
+
 if __name__ == "__main__":
     main()
@@ -11,6 +11,7 @@ Trains an XGBoost binary classifier to predict home team wins.
 - Output: saved model at mlb-pipeline/models/mlb_winner.json
 
 Usage: python train.py
+       python train.py current   # skip if training data is unchanged
 """
 
 import sys
@@ -22,11 +23,19 @@ sys.path.insert(0, str(REPO_ROOT))
 sys.path.insert(0, str(REPO_ROOT / "mlb-pipeline" / "src"))
 
 import os
+
+# One XGBoost/OpenMP thread per physical core (assumes 2-way SMT) instead of
+# one per logical CPU. Must be set before xgboost loads; an explicit
+# OMP_NUM_THREADS in the environment wins.
+XGB_THREADS = int(os.environ.setdefault("OMP_NUM_THREADS", str(max(1, (os.cpu_count() or 2) // 2))))
+
 import logging
 import pandas as pd
 import numpy as np
 import xgboost as xgb
 import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from sklearn.metrics import (
     roc_auc_score, accuracy_score, classification_report,
     confusion_matrix, precision_score, recall_score, f1_score,
@@ -63,21 +72,28 @@ BP_STATS = ["ERA", "WHIP", "SO", "BB", "HR", "IP"]
 
 WINDOWS = [10, 50]
 
-# Build all raw feature column names
-FEATURE_COLS = []
-for side in ["HOME", "AWAY"]:
-    for stat in BATTING_STATS:
-        for w in WINDOWS:
-            FEATURE_COLS.append(f"{side}_{stat}_{w}")
-    for stat in SP_STATS:
-        for w in WINDOWS:
-            FEATURE_COLS.append(f"{side}_SP_{stat}_{w}")
-    for stat in BP_STATS:
+
+def _build_feature_cols():
+    """All raw feature column names, in model order."""
+    cols = []
+    for side in ["HOME", "AWAY"]:
+        for stat in BATTING_STATS:
+            for w in WINDOWS:
+                cols.append(f"{side}_{stat}_{w}")
+        for stat in SP_STATS:
+            for w in WINDOWS:
+                cols.append(f"{side}_SP_{stat}_{w}")
+        for stat in BP_STATS:
+            for w in WINDOWS:
+                cols.append(f"{side}_BP_{stat}_{w}")
         for w in WINDOWS:
-            FEATURE_COLS.append(f"{side}_BP_{stat}_{w}")
-    for w in WINDOWS:
-        FEATURE_COLS.append(f"{side}_WIN_RATE_{w}")
-        FEATURE_COLS.append(f"{side}_GAMES_{w}")
+            cols.append(f"{side}_WIN_RATE_{w}")
+            cols.append(f"{side}_GAMES_{w}")
+    return tuple(cols)
+
+
+FEATURE_COLS = _build_feature_cols()
+_FEATURE_SET = frozenset(FEATURE_COLS)
 
 # Derived difference features (home minus away)
 DIFF_FEATURES = {
@@ -95,7 +111,14 @@ DIFF_FEATURES = {
     "DIFF_WIN_RATE_50": ("HOME_WIN_RATE_50", "AWAY_WIN_RATE_50"),
 }
 
-ALL_FEATURES = FEATURE_COLS + list(DIFF_FEATURES.keys())
+DIFF_HOME_COLS = [home for home, _ in DIFF_FEATURES.values()]
+DIFF_AWAY_COLS = [away for _, away in DIFF_FEATURES.values()]
+
+ALL_FEATURES = [*FEATURE_COLS, *DIFF_FEATURES]
+
+# Columns pulled for training: raw features plus the split/label fields.
+# Diff features are derived locally, so they are not selected.
+TRAINING_COLS = ["GAME_ID", "GAME_DATE", "SEASON_ID", "GAME_OUTCOME", *FEATURE_COLS]
 
 
 # ---------------------------------------------------------------------------
@@ -105,8 +128,15 @@ def fetch_training_data():
     """Fetch completed gamelogs (GAME_STATUS 3 or 4) with known outcome."""
     logger.info("Fetching completed gamelogs from Supabase...")
 
-    rows_3 = fetch_paginated("mlb_gamelogs", "*", [("eq", "GAME_STATUS", 3)])
-    rows_4 = fetch_paginated("mlb_gamelogs", "*", [("eq", "GAME_STATUS", 4)])
+    # Both statuses page independently, so fetch them side by side. Only
+    # the training columns are selected — lineup JSON and box-score fields
+    # would otherwise dominate the payload.
+    select = ",".join(TRAINING_COLS)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        f3, f4 = (executor.submit(fetch_paginated, "mlb_gamelogs", select,
+                                  [("eq", "GAME_STATUS", status)], order_col="GAME_ID")
+                  for status in (3, 4))
+        rows_3, rows_4 = f3.result(), f4.result()
     all_rows = rows_3 + rows_4
 
     if not all_rows:
@@ -123,37 +153,79 @@ def fetch_training_data():
     df["GAME_DATE"] = pd.to_datetime(df["GAME_DATE"], utc=True)
     df["SEASON_ID"] = pd.to_numeric(df.get("SEASON_ID"), errors="coerce")
 
-    for col in FEATURE_COLS:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+    # Cast the feature block once, as float32 — all XGBoost needs
+    feature_cols = [col for col in df.columns if col in _FEATURE_SET]
+    df[feature_cols] = df[feature_cols].apply(pd.to_numeric, errors="coerce").astype(np.float32)
 
     return df
 
 
+def training_data_fingerprint():
+    """
+    Cheap fingerprint of the completed-game training set.
+
+    Hashes the row count, max GAME_ID and max UPDATED_AT of completed
+    gamelogs — two single-row queries instead of the full fetch. A new
+    final game bumps the count; recomputed features or a corrected outcome
+    bump UPDATED_AT (set by the trigger in migration 006). Without that
+    migration it falls back to CREATED_AT, which only moves on insert.
+    """
+    def base(stamp_col):
+        return (supabase.table("mlb_gamelogs")
+                .select(f"GAME_ID, {stamp_col}", count="exact")
+                .in_("GAME_STATUS", [3, 4])
+                .filter("GAME_OUTCOME", "not.is", "null"))
+
+    def latest(stamp_col):
+        resp = base(stamp_col).order(stamp_col, desc=True).limit(1).execute()
+        return resp.data[0][stamp_col] if resp.data else None
+
+    by_id = base("GAME_ID").order("GAME_ID", desc=True).limit(1).execute()
+    try:
+        max_stamp = latest("UPDATED_AT")
+    except Exception as e:
+        logger.warning(f"UPDATED_AT unavailable ({e}) — apply migration 006; "
+                       "fingerprinting on CREATED_AT, which misses in-place updates")
+        max_stamp = latest("CREATED_AT")
+
+    max_game_id = by_id.data[0]["GAME_ID"] if by_id.data else None
+    raw = f"{by_id.count}|{max_game_id}|{max_stamp}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def stored_fingerprint(path=None):
+    """Return the data fingerprint recorded in the last training report, if any."""
+    path = path or REPORT_PATH
+    try:
+        with open(path) as f:
+            return json.load(f).get("dataset", {}).get("fingerprint")
+    except (OSError, ValueError):
+        return None
+
+
 # ---------------------------------------------------------------------------
 # 2. Build feature matrix
 # ---------------------------------------------------------------------------
 def add_diff_features(df):
-    """Add derived difference features (home minus away)."""
-    for name, (home_col, away_col) in DIFF_FEATURES.items():
-        if home_col in df.columns and away_col in df.columns:
-            df[name] = df[home_col] - df[away_col]
-        else:
-            df[name] = np.nan
+    """Add derived difference features (home minus away) as one block.
+    A missing source column yields NaN for its diff."""
+    home = df.reindex(columns=DIFF_HOME_COLS).to_numpy(dtype=np.float64)
+    away = df.reindex(columns=DIFF_AWAY_COLS).to_numpy(dtype=np.float64)
+    df[list(DIFF_FEATURES)] = home - away
     return df
 
 
 def build_feature_matrix(df):
-    """Extract features and target. XGBoost handles NaN natively — no dropping."""
-    df = add_diff_features(df)
+    """Extract features and target. XGBoost handles NaN natively — no dropping.
 
-    # Ensure all feature columns exist
-    for col in ALL_FEATURES:
-        if col not in df.columns:
-            df[col] = np.nan
+    The feature matrix is materialized once as a float32 ndarray in
+    ALL_FEATURES column order (missing columns are all-NaN); y is an int
+    ndarray. Both stay row-aligned with the returned df."""
+    df = add_diff_features(df)
+    X = df.reindex(columns=ALL_FEATURES).to_numpy(dtype=np.float32)
 
     # Log null stats for visibility
-    null_counts = df[FEATURE_COLS].isna().sum()
+    null_counts = pd.Series(np.isnan(X[:, :len(FEATURE_COLS)]).sum(axis=0), index=FEATURE_COLS)
     cols_with_nulls = null_counts[null_counts > 0]
     if len(cols_with_nulls) > 0:
         total = len(df)
@@ -174,8 +246,7 @@ def build_feature_matrix(df):
     if len(df) < 100:
         logger.warning(f"Only {len(df)} training samples — results may be unreliable")
 
-    X = df[ALL_FEATURES].astype(float)
-    y = df["GAME_OUTCOME"].astype(int)
+    y = df["GAME_OUTCOME"].to_numpy(dtype=int)
 
     return X, y, df
 
@@ -184,16 +255,21 @@ def build_feature_matrix(df):
 # 3. Chronological train/test split
 # ---------------------------------------------------------------------------
 def time_split(X, y, df, test_fraction=0.20):
-    """Split data chronologically. Last test_fraction by date goes to test."""
-    sorted_idx = df["GAME_DATE"].sort_values().index
-    X = X.loc[sorted_idx]
-    y = y.loc[sorted_idx]
-    df = df.loc[sorted_idx]
+    """Split data chronologically. Last test_fraction by date goes to test.
+
+    X and y are row-aligned ndarrays; they are reordered once and the
+    train/test sets are slices of that. Also returns the date-sorted df and
+    the cutoff position so callers can read the train/test date ranges
+    without sorting again."""
+    order = np.argsort(df["GAME_DATE"].to_numpy(), kind="stable")
+    X = X[order]
+    y = y[order]
+    df = df.iloc[order]
 
     cutoff = int(len(X) * (1 - test_fraction))
 
-    X_train, X_test = X.iloc[:cutoff], X.iloc[cutoff:]
-    y_train, y_test = y.iloc[:cutoff], y.iloc[cutoff:]
+    X_train, X_test = X[:cutoff], X[cutoff:]
+    y_train, y_test = y[:cutoff], y[cutoff:]
     df_test = df.iloc[cutoff:]
 
     train_end = df.iloc[cutoff - 1]["GAME_DATE"]
@@ -204,19 +280,25 @@ def time_split(X, y, df, test_fraction=0.20):
     logger.info(f"  Train home-win rate: {y_train.mean():.3f}")
     logger.info(f"  Test  home-win rate: {y_test.mean():.3f}")
 
-    return X_train, X_test, y_train, y_test, df_test
+    return X_train, X_test, y_train, y_test, df_test, df, cutoff
 
 
 # ---------------------------------------------------------------------------
 # 4. Train model
 # ---------------------------------------------------------------------------
 def train_model(X_train, y_train, X_test, y_test):
-    """Train XGBoost classifier with early stopping."""
+    """Train XGBoost classifier with early stopping.
+
+    tree_method="hist" builds trees from bucketed histograms; with it the
+    sklearn wrapper feeds fit() a QuantileDMatrix (the eval set references
+    the training quantiles) instead of a full DMatrix."""
     logger.info("Training XGBoost classifier...")
 
     model = xgb.XGBClassifier(
         objective="binary:logistic",
         eval_metric="auc",
+        tree_method="hist",
+        n_jobs=XGB_THREADS,
         n_estimators=300,
         max_depth=4,
         learning_rate=0.05,
@@ -235,6 +317,8 @@ def train_model(X_train, y_train, X_test, y_test):
         eval_set=[(X_test, y_test)],
         verbose=True,
     )
+    # Fitted on ndarrays — attach the names so the saved booster keeps them
+    model.get_booster().feature_names = list(ALL_FEATURES)
 
     logger.info(f"  Best iteration: {model.best_iteration}")
     return model
@@ -243,34 +327,49 @@ def train_model(X_train, y_train, X_test, y_test):
 # ---------------------------------------------------------------------------
 # 5. Evaluate model
 # ---------------------------------------------------------------------------
+def _season_runs(season_ids):
+    """Sort order plus (season, start, stop) runs over a season-id array.
+    NaN seasons are dropped."""
+    sids = pd.to_numeric(pd.Series(season_ids), errors="coerce").to_numpy(dtype=float)
+    order = np.argsort(sids, kind="stable")
+    order = order[~np.isnan(sids[order])]
+    sorted_sids = sids[order]
+    if not len(order):
+        return order, sorted_sids, order, order
+    starts = np.flatnonzero(np.r_[True, sorted_sids[1:] != sorted_sids[:-1]])
+    stops = np.r_[starts[1:], len(order)]
+    return order, sorted_sids[starts], starts, stops
+
+
 def compute_season_breakdown(y_test, y_pred, y_prob, df_test):
-    """Compute accuracy, AUC, and record counts per season in the test set."""
+    """Compute accuracy, AUC, and record counts per season in the test set.
+
+    Rows are sorted by season once; games, hits and home wins for every
+    season come from one reduceat pass over the contiguous runs."""
+    order, seasons, starts, stops = _season_runs(df_test["SEASON_ID"].to_numpy())
+    if not len(seasons):
+        return {}
+
+    y = np.asarray(y_test)[order]
+    hits = (np.asarray(y_pred)[order] == y).astype(np.int64)
+    probs = np.asarray(y_prob)[order]
+    games = stops - starts
+    hit_counts = np.add.reduceat(hits, starts)
+    home_wins = np.add.reduceat(y.astype(np.int64), starts)
+
     results = {}
-    season_ids = df_test["SEASON_ID"].values
-
-    for sid in sorted(set(season_ids)):
-        if pd.isna(sid):
-            continue
-        mask = season_ids == sid
-        y_t = y_test.values[mask]
-        y_p = y_pred[mask]
-        y_pr = y_prob[mask]
-
-        n = int(mask.sum())
-        acc = round(float(accuracy_score(y_t, y_p)), 4)
-
-        if len(set(y_t)) > 1:
-            auc = round(float(roc_auc_score(y_t, y_pr)), 4)
-        else:
-            auc = None
-
-        label = str(int(sid))
-        results[label] = {
+    for sid, start, stop, n, n_hit, n_home in zip(seasons, starts, stops, games, hit_counts, home_wins):
+        # AUC is undefined for a season whose test games all went one way
+        auc = None
+        if 0 < n_home < n:
+            auc = round(float(roc_auc_score(y[start:stop], probs[start:stop])), 4)
+
+        results[str(int(sid))] = {
             "season_id": int(sid),
-            "games": n,
-            "accuracy": acc,
+            "games": int(n),
+            "accuracy": round(float(n_hit / n), 4),
             "roc_auc": auc,
-            "home_win_rate": round(float(y_t.mean()), 4),
+            "home_win_rate": round(float(n_home / n), 4),
         }
 
     return results
@@ -292,8 +391,9 @@ def evaluate_model(model, X_test, y_test, df_test, train_info=None):
     rec_home = recall_score(y_test, y_pred, pos_label=1)
     f1_home = f1_score(y_test, y_pred, pos_label=1)
 
-    importance = model.feature_importances_
-    feat_imp = pd.Series(importance, index=ALL_FEATURES).sort_values(ascending=False)
+    # Average split gain per feature; features never split on are absent
+    gain = model.get_booster().get_score(importance_type="gain")
+    feat_imp = sorted(gain.items(), key=lambda kv: -kv[1])
 
     season_breakdown = compute_season_breakdown(y_test, y_pred, y_prob, df_test)
 
@@ -311,9 +411,9 @@ def evaluate_model(model, X_test, y_test, df_test, train_info=None):
     print()
     print(classification_report(y_test, y_pred, target_names=["Away Win", "Home Win"]))
 
-    print("Top 15 Feature Importances:")
+    print("Top 15 Feature Importances (gain):")
     print("-" * 40)
-    for feat, imp in feat_imp.head(15).items():
+    for feat, imp in feat_imp[:15]:
         print(f"  {feat:<30s} {imp:.4f}")
     print()
 
@@ -329,6 +429,7 @@ def evaluate_model(model, X_test, y_test, df_test, train_info=None):
         "model_file": MODEL_PATH.name,
         "xgboost_params": {
             "objective": "binary:logistic",
+            "tree_method": "hist",
             "max_depth": 4,
             "learning_rate": 0.05,
             "n_estimators": 300,
@@ -376,9 +477,7 @@ def evaluate_model(model, X_test, y_test, df_test, train_info=None):
             },
         },
         "season_accuracy": season_breakdown,
-        "feature_importances": {
-            feat: round(float(imp), 6) for feat, imp in feat_imp.items()
-        },
+        "feature_importances": {feat: round(imp, 6) for feat, imp in feat_imp},
     }
 
     return auc, acc, report
@@ -396,16 +495,16 @@ def save_report(report, path):
 # 6. Save model
 # ---------------------------------------------------------------------------
 def save_model(model, path):
-    """Save XGBoost model to JSON."""
+    """Save the trained booster to JSON (predict.py loads it as a raw Booster)."""
     path.parent.mkdir(parents=True, exist_ok=True)
-    model.save_model(str(path))
+    model.get_booster().save_model(str(path))
     logger.info(f"Model saved to {path}")
 
 
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
-def main():
+def main(fingerprint=None):
     start = datetime.now(timezone.utc)
     logger.info("=== MLB GAME OUTCOME MODEL — TRAINING ===")
 
@@ -417,22 +516,22 @@ def main():
     logger.info(f"  Overall home-win rate: {y.mean():.3f}")
 
     logger.info("Splitting train/test (chronological 80/20)...")
-    X_train, X_test, y_train, y_test, df_test = time_split(X, y, df)
+    X_train, X_test, y_train, y_test, df_test, df_sorted, cutoff = time_split(X, y, df)
 
     model = train_model(X_train, y_train, X_test, y_test)
 
-    sorted_df = df.sort_values("GAME_DATE")
-    cutoff = int(len(sorted_df) * 0.80)
+    dates = df_sorted["GAME_DATE"]
     train_info = {
         "total_samples": len(X),
         "train_samples": len(X_train),
-        "train_date_range": f"{sorted_df.iloc[0]['GAME_DATE'].date()} to {sorted_df.iloc[cutoff - 1]['GAME_DATE'].date()}",
-        "test_date_range": f"{sorted_df.iloc[cutoff]['GAME_DATE'].date()} to {sorted_df.iloc[-1]['GAME_DATE'].date()}",
+        "train_date_range": f"{dates.iloc[0].date()} to {dates.iloc[cutoff - 1].date()}",
+        "test_date_range": f"{dates.iloc[cutoff].date()} to {dates.iloc[-1].date()}",
         "home_win_rate_overall": round(float(y.mean()), 4),
         "home_win_rate_train": round(float(y_train.mean()), 4),
     }
 
     auc, acc, report = evaluate_model(model, X_test, y_test, df_test, train_info)
+    report["dataset"]["fingerprint"] = fingerprint
 
     save_model(model, MODEL_PATH)
     save_report(report, REPORT_PATH)
@@ -441,5 +540,25 @@ def main():
     logger.info(f"=== TRAINING COMPLETE in {elapsed:.1f}s | AUC={auc:.4f} | Acc={acc:.4f} ===")
 
 
+def run(mode: str | None = None) -> int:
+    """
+    Train and save the model in-process. Returns a process exit code.
+
+    In 'current' mode training is skipped when the completed-gamelogs
+    fingerprint matches the one recorded with the saved model. Other modes
+    always retrain and don't query the fingerprint.
+    """
+    if mode != "current":
+        main()
+        return 0
+
+    fingerprint = training_data_fingerprint()
+    if MODEL_PATH.exists() and fingerprint == stored_fingerprint():
+        logger.info(f"model up-to-date (fingerprint={fingerprint}) — skipping training")
+        return 0
+    main(fingerprint)
+    return 0
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(run(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,14 @@
+-- MLB games lookup by id list
+-- Run this in the Supabase SQL Editor (Dashboard > SQL Editor)
+-- ================================================================
+
+-- games.py fetch_db_games posts the id list in the request body instead of
+-- encoding it into a GET URL as an IN filter, so one call covers up to
+-- PostgREST's max-rows (1000) games.
+CREATE OR REPLACE FUNCTION public.mlb_games_by_ids(ids bigint[])
+RETURNS SETOF public.mlb_games
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT * FROM public.mlb_games WHERE "GAME_ID" = ANY(ids);
+$$;
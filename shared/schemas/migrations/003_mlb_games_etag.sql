@@ -0,0 +1,9 @@
+-- MLB games live-feed ETag
+-- Run this in the Supabase SQL Editor (Dashboard > SQL Editor)
+-- ================================================================
+
+-- ETag of the live-feed response the lineup/SP/bullpen columns were parsed
+-- from. games.py sends it back as If-None-Match in current mode and keeps
+-- the stored lineups when the feed has not changed.
+ALTER TABLE public.mlb_games
+  ADD COLUMN IF NOT EXISTS "ETAG" text null;
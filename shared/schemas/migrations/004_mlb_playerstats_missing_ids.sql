@@ -0,0 +1,15 @@
+-- MLB playerstats anti-join by id list
+-- Run this in the Supabase SQL Editor (Dashboard > SQL Editor)
+-- ================================================================
+
+-- playerstats.py run_current_mode posts the ids it fetched and gets back
+-- only those not stored yet, so existing rows never leave the database.
+-- Returns a table rather than SETOF text so PostgREST emits [{"id": ...}].
+CREATE OR REPLACE FUNCTION public.mlb_playerstats_missing_ids(ids text[])
+RETURNS TABLE (id text)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT i FROM unnest(ids) AS i
+  WHERE NOT EXISTS (SELECT 1 FROM public.mlb_playerstats p WHERE p.id = i);
+$$;
@@ -0,0 +1,17 @@
+-- MLB playerstats distinct player ids
+-- Run this in the Supabase SQL Editor (Dashboard > SQL Editor)
+-- ================================================================
+
+-- playerstats.py run_backfill_mode only needs the set of players that
+-- already have stats. Returning one bigint[] (a single JSON array) keeps the
+-- response out of PostgREST's max-rows paging instead of scanning every
+-- stat row page by page.
+CREATE OR REPLACE FUNCTION public.mlb_playerstats_player_ids()
+RETURNS bigint[]
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT coalesce(array_agg(DISTINCT "PLAYER_ID"), '{}')
+  FROM public.mlb_playerstats
+  WHERE "PLAYER_ID" IS NOT NULL;
+$$;
@@ -0,0 +1,31 @@
+-- MLB gamelogs UPDATED_AT
+-- Run this in the Supabase SQL Editor (Dashboard > SQL Editor)
+-- ================================================================
+
+-- gamelogs.py upserts rows in place, so CREATED_AT never moves when features
+-- are recomputed or an outcome is corrected. train.py's data fingerprint
+-- hashes max("UPDATED_AT") so such changes trigger a retrain. The trigger
+-- only bumps the timestamp when a column actually changed, so re-upserting
+-- identical rows does not force one.
+ALTER TABLE public.mlb_gamelogs
+  ADD COLUMN IF NOT EXISTS "UPDATED_AT" timestamp with time zone not null default now();
+
+CREATE OR REPLACE FUNCTION public.mlb_gamelogs_set_updated_at()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF NEW IS DISTINCT FROM OLD THEN
+    NEW."UPDATED_AT" := now();
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_mlb_gamelogs_updated_at ON public.mlb_gamelogs;
+CREATE TRIGGER trg_mlb_gamelogs_updated_at
+  BEFORE UPDATE ON public.mlb_gamelogs
+  FOR EACH ROW EXECUTE FUNCTION public.mlb_gamelogs_set_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_mlb_gamelogs_updated_at
+  ON public.mlb_gamelogs USING btree ("UPDATED_AT");
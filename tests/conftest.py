@@ -12,6 +12,7 @@ All tests use synthetic data — no network calls, no Supabase reads/writes.
 
 import os
 import sys
+import tempfile
 import importlib.util
 from pathlib import Path
 from unittest.mock import MagicMock, patch
@@ -19,6 +20,10 @@ from unittest.mock import MagicMock, patch
 # Ensure env vars exist so modules don't crash on import
 os.environ.setdefault("SUPABASE_URL", "https://fake.supabase.co")
 os.environ.setdefault("SUPABASE_KEY", "fake-key-for-testing")
+# Keep the MLB HTTP response cache out of the working tree
+os.environ.setdefault(
+    "MLB_CACHE_PATH", os.path.join(tempfile.gettempdir(), "edgemaster_test_mlb_http.sqlite")
+)
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(REPO_ROOT))
@@ -84,3 +89,7 @@ if _saved is not None:
     sys.modules["gamelogs"] = _saved
 else:
     sys.modules.pop("gamelogs", None)
+
+mlb_playerstats = _load_module_from_path(
+    "mlb_playerstats", REPO_ROOT / "mlb-pipeline" / "src" / "playerstats.py"
+)
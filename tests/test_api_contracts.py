@@ -93,6 +93,21 @@ class TestMLBScheduleAPI:
         assert "home" in linescore["teams"]
         assert "runs" in linescore["teams"]["home"]
 
+    def test_schedule_hydrates_pitchers_and_lineups(self):
+        """probablePitcher/lineups hydration feeds HOME_SP and HOME_LINEUP."""
+        resp = _safe_get(self.URL, params={
+            "sportId": 1,
+            "startDate": "2024-07-04",
+            "endDate": "2024-07-04",
+            "gameType": "R",
+            "hydrate": "linescore,probablePitcher,lineups",
+        })
+        games = resp.json()["dates"][0]["games"]
+        game = next(g for g in games if g.get("lineups"))
+
+        assert "id" in game["teams"]["home"]["probablePitcher"]
+        assert all("id" in p for p in game["lineups"]["homePlayers"])
+
     def test_schedule_status_mapping(self):
         """detailedState and abstractGameState should be present for status mapping."""
         resp = _safe_get(self.URL, params={
@@ -272,6 +287,19 @@ class TestMLBPlayerStatsAPI:
         for key in expected_keys:
             assert key in stat, f"Missing pitching stat key: {key}"
 
+    def test_combined_group_gamelog_tags_groups(self):
+        """playerstats requests group=hitting,pitching for two-way players and
+        splits the response by each stats entry's group.displayName."""
+        ohtani_id = 660271
+        resp = _safe_get(
+            f"https://statsapi.mlb.com/api/v1/people/{ohtani_id}/stats",
+            params={"stats": "gameLog", "group": "hitting,pitching", "season": 2023},
+        )
+        stats = resp.json()["stats"]
+
+        groups = {s.get("group", {}).get("displayName") for s in stats}
+        assert {"hitting", "pitching"} <= groups, f"Groups in response: {groups}"
+
 
 # ===========================================================================
 # NBA API (via shared.nba.nba_api_client)
@@ -8,11 +8,13 @@ merge logic, player classification) using synthetic data.
 No network calls, no Supabase.
 """
 
+import json
 import sys
 from pathlib import Path
 from datetime import datetime
 
 import numpy as np
+import pytest
 import pandas as pd
 from unittest.mock import patch, MagicMock
 
@@ -313,6 +315,70 @@ class TestMLBGameStatusConstants:
         assert mlb_games.GAME_STATUS_POSTPONED == 4
 
 
+# ===========================================================================
+# MLB — shared HTTP response cache
+# ===========================================================================
+class TestMLBHttpCache:
+
+    def test_session_is_cached(self):
+        from requests_cache import CachedSession
+        assert isinstance(mlb_games.SESSION, CachedSession)
+        assert isinstance(mlb_players.SESSION, CachedSession)
+
+    def test_endpoint_ttls(self):
+        from requests_cache import DO_NOT_CACHE
+        settings = mlb_games.SESSION.settings.urls_expire_after
+        assert settings["statsapi.mlb.com/api/v1/schedule*"] == 300
+        assert settings["statsapi.mlb.com/api/v1.1/game/*/feed/live*"] == 60
+        assert settings["statsapi.mlb.com/api/v1/people/*/stats*"] == 30 * 86400
+        # Rosters must expire before the next daily run, even an early one
+        assert settings["statsapi.mlb.com/api/v1/sports/1/players*"] < 86400
+        assert settings["statsapi.mlb.com/api/v1/teams/*/roster*"] < 86400
+        assert settings["*"] == DO_NOT_CACHE
+
+    def test_network_requests_are_rate_limited(self):
+        import cache
+        adapter = mlb_games.SESSION.get_adapter("https://statsapi.mlb.com/api/v1/schedule")
+        assert isinstance(adapter, cache.RateLimitedAdapter)
+
+    def test_token_bucket_waits_when_empty(self, monkeypatch):
+        import cache
+        clock = {"now": 100.0}
+        sleeps = []
+        monkeypatch.setattr(cache.time, "monotonic", lambda: clock["now"])
+        monkeypatch.setattr(cache.time, "sleep", sleeps.append)
+
+        bucket = cache.TokenBucket(rate=10, burst=2)
+        for _ in range(4):
+            bucket.acquire()
+        assert sleeps == pytest.approx([0.1, 0.2])  # burst of 2, then queued at 10/s
+
+        clock["now"] += 1.0
+        bucket.acquire()
+        assert len(sleeps) == 2  # refilled
+
+    def test_http2_get_retries_rate_limited(self, monkeypatch):
+        import cache
+        monkeypatch.setattr(cache.time, "sleep", lambda s: None)
+        client = MagicMock()
+        client.get.side_effect = [_feed_response(429), _feed_response(503), _feed_response(200)]
+
+        resp = cache.http2_get(client, "https://statsapi.mlb.com/x", timeout=1)
+        assert resp.status_code == 200
+        assert client.get.call_count == 3
+
+    def test_response_json_matches_stdlib(self):
+        import cache
+        resp = _feed_response(data={"gamePk": 1, "teams": {"home": {"score": 5}}, "x": None})
+        assert cache.response_json(resp) == resp.json()
+
+    def test_cache_path_env_override(self, monkeypatch, tmp_path):
+        import cache
+        target = tmp_path / "http.sqlite"
+        monkeypatch.setenv("MLB_CACHE_PATH", str(target))
+        assert cache.cache_path() == target
+
+
 # ===========================================================================
 # MLB Games — merge_games_and_lineups
 # ===========================================================================
@@ -348,6 +414,34 @@ class TestMLBMergeGamesAndLineups:
         assert result[1]["HOME_LINEUP"] == []
         assert result[1]["HOME_SP"] is None
 
+    def test_unchanged_feed_keeps_stored_lineup(self):
+        games = [{"GAME_ID": 100, "HOME_NAME": "Dodgers"}]
+        db_map = {100: {"GAME_ID": 100, "HOME_LINEUP": [1, 2, 3], "HOME_SP": 501,
+                        "AWAY_BULLPEN": [602], "ETAG": '"abc"'}}
+        result = mlb_games.merge_games_and_lineups(games, {100: None}, db_map)
+
+        assert result[0]["HOME_LINEUP"] == [1, 2, 3]
+        assert result[0]["HOME_SP"] == 501
+        assert result[0]["AWAY_BULLPEN"] == [602]
+        assert result[0]["ETAG"] == '"abc"'
+
+    def test_schedule_values_fill_empty_feed_fields(self):
+        games = [{"GAME_ID": 100, "HOME_SP": 501, "HOME_LINEUP": [1, 2], "AWAY_SP": 601}]
+        lineups = {100: {"HOME_SP": None, "HOME_LINEUP": [], "AWAY_SP": 602, "HOME_BULLPEN": [9]}}
+        result = mlb_games.merge_games_and_lineups(games, lineups)
+
+        assert result[0]["HOME_SP"] == 501
+        assert result[0]["HOME_LINEUP"] == [1, 2]
+        assert result[0]["AWAY_SP"] == 602  # actual starter beats probable
+        assert result[0]["HOME_BULLPEN"] == [9]
+
+    def test_needs_live_feed(self):
+        assert mlb_games.needs_live_feed({"GAME_STATUS": 2})
+        assert mlb_games.needs_live_feed({"GAME_STATUS": 3})
+        assert mlb_games.needs_live_feed({"GAME_STATUS": 1, "AWAY_LINEUP": [1]})
+        assert not mlb_games.needs_live_feed({"GAME_STATUS": 1, "HOME_LINEUP": []})
+        assert not mlb_games.needs_live_feed({"GAME_STATUS": 4})
+
     def test_missing_lineup_uses_defaults(self):
         games = [{"GAME_ID": 999, "HOME_NAME": "Test"}]
         lineups = {}  # No lineup data
@@ -445,6 +539,201 @@ class TestMLBFindDeltas:
         result = mlb_games.find_deltas([new_game], [db_game])
         assert len(result) == 1  # Lineup changed
 
+    def test_bullpen_order_ignored(self):
+        base = {"GAME_ID": 100, "GAME_STATUS": 3, "HOME_LINEUP": [1, 2]}
+        new_game = {**base, "HOME_BULLPEN": [502, 503, 501]}
+        db_game = {**base, "HOME_BULLPEN": [501, 502, 503]}
+        assert mlb_games.find_deltas([new_game], [db_game]) == []
+
+    def test_lineup_order_matters(self):
+        base = {"GAME_ID": 100, "GAME_STATUS": 1}
+        result = mlb_games.find_deltas([{**base, "HOME_LINEUP": [2, 1]}], [{**base, "HOME_LINEUP": [1, 2]}])
+        assert len(result) == 1
+
+    def test_lineup_nones_ignored(self):
+        base = {"GAME_ID": 100, "GAME_STATUS": 1, "HOME_SP": 501}
+        new_game = {**base, "HOME_LINEUP": [1, None, 3], "AWAY_LINEUP": None}
+        db_game = {**base, "HOME_LINEUP": [1, 3], "AWAY_LINEUP": []}
+        assert mlb_games.find_deltas([new_game], [db_game]) == []
+
+
+# ===========================================================================
+# MLB Games — fetch_lineup
+# ===========================================================================
+def _feed_response(status=200, etag=None, data=None):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.headers = {"ETag": etag} if etag else {}
+    resp.json.return_value = data or {}
+    resp.content = json.dumps(data or {}).encode()
+    return resp
+
+
+class TestMLBFetchSchedule:
+
+    def test_parses_final_game(self, monkeypatch):
+        data = {"dates": [{"games": [{
+            "gamePk": 745652,
+            "officialDate": "2024-07-04",
+            "status": {"detailedState": "Final", "abstractGameState": "Final"},
+            "teams": {
+                "home": {"team": {"id": 119, "name": "LA"}, "probablePitcher": {"id": 501}},
+                "away": {"team": {"id": 109, "name": "AZ"}, "score": 3},
+            },
+            "linescore": {"teams": {"home": {"runs": 5}}},
+            "lineups": {"homePlayers": [{"id": 1}, {"id": 2}]},
+        }]}]}
+        session = MagicMock()
+        session.get.return_value = _feed_response(200, data=data)
+        monkeypatch.setattr(mlb_games, "SESSION", session)
+
+        (game,) = mlb_games.fetch_schedule("2024-07-04", "2024-07-04")
+        assert game["GAME_STATUS"] == mlb_games.GAME_STATUS_FINAL
+        assert (game["HOME_RUNS"], game["AWAY_RUNS"], game["TOTAL_RUNS"]) == (5, 3, 8)
+        assert game["GAME_OUTCOME"] == 1
+        assert (game["HOME_ID"], game["AWAY_ID"], game["SEASON_ID"]) == (119, 109, 2024)
+        assert game["HOME_NAME"] == mlb_games.TEAM_ID_TO_NAME.get(119, "LA")
+        assert game["HOME_SP"] == 501 and game["AWAY_SP"] is None
+        assert game["HOME_LINEUP"] == [1, 2] and game["AWAY_LINEUP"] == []
+
+
+class TestMLBFetchLineup:
+
+    def test_unchanged_etag_skips_parse(self, monkeypatch):
+        session = MagicMock()
+        session.get.return_value = _feed_response(304)
+        monkeypatch.setattr(mlb_games, "FEED_CLIENT", session)
+
+        assert mlb_games.fetch_lineup(1, etag='"v1"') is None
+        assert session.get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+    def test_changed_etag_is_parsed_and_returned(self, monkeypatch):
+        data = {"liveData": {"boxscore": {"teams": {"home": {"pitchers": [501, 502]}}}}}
+        session = MagicMock()
+        session.get.return_value = _feed_response(200, etag='"v2"', data=data)
+        monkeypatch.setattr(mlb_games, "FEED_CLIENT", session)
+
+        result = mlb_games.fetch_lineup(1, etag='"v1"')
+        assert result["ETAG"] == '"v2"'
+        assert result["HOME_SP"] == 501
+
+    def test_lineup_from_team_batting_order(self, monkeypatch):
+        team = {"battingOrder": [11, 12, 13], "players": {}}
+        data = {"liveData": {"boxscore": {"teams": {"home": team}}}}
+        session = MagicMock()
+        session.get.return_value = _feed_response(200, data=data)
+        monkeypatch.setattr(mlb_games, "FEED_CLIENT", session)
+
+        assert mlb_games.fetch_lineup(1)["HOME_LINEUP"] == [11, 12, 13] + [None] * 6
+
+    def test_lineup_from_player_codes(self, monkeypatch):
+        players = {
+            "ID1": {"person": {"id": 21}, "battingOrder": "200"},
+            "ID2": {"person": {"id": 22}, "battingOrder": "100"},
+            "ID3": {"person": {"id": 23}, "battingOrder": "101"},  # substitute
+        }
+        data = {"liveData": {"boxscore": {"teams": {"away": {"players": players}}}}}
+        session = MagicMock()
+        session.get.return_value = _feed_response(200, data=data)
+        monkeypatch.setattr(mlb_games, "FEED_CLIENT", session)
+
+        assert mlb_games.fetch_lineup(1)["AWAY_LINEUP"][:3] == [22, 21, None]
+
+    def test_unposted_lineup_is_empty(self, monkeypatch):
+        data = {"liveData": {"boxscore": {"teams": {"home": {"players": {"ID1": {"person": {"id": 1}}}}}}}}
+        session = MagicMock()
+        session.get.return_value = _feed_response(200, data=data)
+        monkeypatch.setattr(mlb_games, "FEED_CLIENT", session)
+
+        result = mlb_games.fetch_lineup(1)
+        assert result["HOME_LINEUP"] == []
+        assert result["AWAY_LINEUP"] == []
+
+    def test_bullpen_deduped_in_order(self, monkeypatch):
+        team = {"pitchers": [501, 505, 503], "bullpen": [503, 502, 504]}
+        data = {"liveData": {"boxscore": {"teams": {"home": team}}}}
+        session = MagicMock()
+        session.get.return_value = _feed_response(200, data=data)
+        monkeypatch.setattr(mlb_games, "FEED_CLIENT", session)
+
+        assert mlb_games.fetch_lineup(1)["HOME_BULLPEN"] == [503, 502, 504, 505]
+
+
+class TestMLBFetchLineupsParallel:
+
+    def test_bounded_window_collects_all(self, monkeypatch):
+        import threading
+        lock = threading.Lock()
+        in_flight = {"now": 0, "peak": 0}
+
+        def fake_fetch(pk, etag=None):
+            with lock:
+                in_flight["now"] += 1
+                in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+            with lock:
+                in_flight["now"] -= 1
+            if pk == 7:
+                raise ValueError("boom")
+            return {"HOME_SP": pk}
+
+        monkeypatch.setattr(mlb_games, "fetch_lineup", fake_fetch)
+        monkeypatch.setattr(mlb_games, "LINEUP_WINDOW", 3)
+
+        lineups = mlb_games.fetch_lineups_parallel(list(range(40)))
+        assert set(lineups) == set(range(40))
+        assert lineups[7] == {}
+        assert lineups[5] == {"HOME_SP": 5}
+        assert in_flight["peak"] <= 3
+
+
+class TestMLBRunCurrentMode:
+
+    def test_final_games_skip_lineup_fetch(self, monkeypatch):
+        schedule = [
+            {"GAME_ID": 1, "GAME_STATUS": 3},
+            {"GAME_ID": 2, "GAME_STATUS": 1, "HOME_LINEUP": [11, 12]},
+            {"GAME_ID": 3, "GAME_STATUS": 1, "HOME_LINEUP": [], "HOME_SP": 701},
+        ]
+        stored = [{"GAME_ID": 1, "GAME_STATUS": 3, "HOME_SP": 501, "HOME_LINEUP": [7]}]
+        fetched = []
+        upserted = []
+        monkeypatch.setattr(mlb_games, "fetch_schedule", lambda *a: [dict(g) for g in schedule])
+        monkeypatch.setattr(mlb_games, "fetch_db_games", lambda **kw: stored)
+        monkeypatch.setattr(mlb_games, "fetch_lineups_parallel",
+                            lambda pks, etags=None: fetched.extend(pks) or {pk: {} for pk in pks})
+        monkeypatch.setattr(mlb_games, "upsert_games", upserted.extend)
+
+        mlb_games.run_current_mode()
+        assert fetched == [2]  # 1 is final, 3 has no posted lineup yet
+        assert [g["GAME_ID"] for g in upserted] == [2, 3]  # game 1 unchanged from stored row
+        assert upserted[1]["HOME_SP"] == 701  # probable pitcher from the schedule
+
+
+# ===========================================================================
+# MLB Games — fetch_db_games
+# ===========================================================================
+class TestMLBFetchDbGames:
+
+    def test_single_rpc_for_id_list(self, monkeypatch):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = [{"GAME_ID": 1}, {"GAME_ID": 2}]
+        monkeypatch.setattr(mlb_games, "supabase", client)
+
+        result = mlb_games.fetch_db_games(game_ids=list(range(1, 451)))
+        assert result == [{"GAME_ID": 1}, {"GAME_ID": 2}]
+        client.rpc.assert_called_once_with("mlb_games_by_ids", {"ids": list(range(1, 451))})
+        client.table.assert_not_called()
+
+    def test_falls_back_to_in_batches(self, monkeypatch):
+        client = MagicMock()
+        client.rpc.side_effect = Exception("PGRST202: function not found")
+        client.table.return_value.select.return_value.in_.return_value.execute.return_value.data = [{"GAME_ID": 1}]
+        monkeypatch.setattr(mlb_games, "supabase", client)
+
+        result = mlb_games.fetch_db_games(game_ids=list(range(1, 451)))
+        assert len(result) == 3  # 450 ids -> 3 IN batches of 200
+        assert client.table.return_value.select.return_value.in_.call_count == 3
+
 
 # ===========================================================================
 # MLB Games — _clean_payload
@@ -509,10 +798,60 @@ class TestMLBCleanPayload:
         assert payload["GAME_OUTCOME"] is None
         assert payload["HOME_SP"] is None
 
+    def test_batch_keeps_ints_next_to_nulls(self):
+        games = [
+            {"GAME_ID": 1, "GAME_OUTCOME": 1, "HOME_SP": 501, "HOME_LINEUP": [1, None, 3]},
+            {"GAME_ID": 2, "GAME_OUTCOME": None, "HOME_SP": 0, "GAME_STATUS": None},
+        ]
+        first, second = mlb_games._clean_payloads(games)
+        assert type(first["GAME_OUTCOME"]) is int and type(first["HOME_SP"]) is int
+        assert first["HOME_LINEUP"] == [1, 3]
+        assert second["GAME_OUTCOME"] is None
+        assert second["HOME_SP"] is None  # 0 is not a pitcher id
+        assert second["GAME_STATUS"] == mlb_games.GAME_STATUS_SCHEDULED
+        assert second["HOME_LINEUP"] == []
+
 
 # ===========================================================================
 # MLB Players — Player Type Classification
 # ===========================================================================
+class TestMLBUpsertGames:
+
+    def _game(self, pk):
+        return {"GAME_ID": pk, "SEASON_ID": 2024, "GAME_STATUS": 1, "ETAG": f'"e{pk}"'}
+
+    def test_missing_etag_column_retries_without_it(self, monkeypatch):
+        monkeypatch.setattr(mlb_games, "_send_etag", True)
+        sent = []
+
+        def upsert(batch, on_conflict=None):
+            sent.append(batch)
+            if any("ETAG" in p for p in batch):
+                raise Exception("{'code': 'PGRST204', 'message': \"Could not find the 'ETAG' column of 'mlb_games'\"}")
+            return MagicMock()
+
+        client = MagicMock()
+        client.table.return_value.upsert.side_effect = upsert
+        monkeypatch.setattr(mlb_games, "supabase", client)
+        monkeypatch.setattr(mlb_games, "UPSERT_BATCH_SIZE", 2)
+
+        mlb_games.upsert_games([self._game(1), self._game(2), self._game(3)])
+        # First batch retried once without ETAG; later batches skip it up front
+        assert [[p["GAME_ID"] for p in b] for b in sent] == [[1, 2], [1, 2], [3]]
+        assert all("ETAG" not in p for b in sent[1:] for p in b)
+
+    def test_other_errors_fall_back_to_rows_with_etag(self, monkeypatch):
+        monkeypatch.setattr(mlb_games, "_send_etag", True)
+        client = MagicMock()
+        client.table.return_value.upsert.return_value.execute.side_effect = [Exception("timeout"), None, None]
+        monkeypatch.setattr(mlb_games, "supabase", client)
+
+        mlb_games.upsert_games([self._game(1), self._game(2)])
+        rows = [c.args[0] for c in client.table.return_value.upsert.call_args_list[1:]]
+        assert [r[0]["ETAG"] for r in rows] == ['"e1"', '"e2"']
+        assert mlb_games._send_etag
+
+
 class TestMLBPlayerTypeClassification:
 
     def test_pitcher_positions(self):
@@ -589,3 +928,51 @@ class TestMLBPlayerFindDeltas:
         ]
         result = mlb_players.find_deltas(new_players, db_players)
         assert len(result) == 1
+
+
+# ===========================================================================
+# MLB Players — fetch_db_players
+# ===========================================================================
+class TestMLBFetchDbPlayers:
+
+    def test_keyset_pages(self, monkeypatch):
+        rows = [{"PLAYER_ID": i} for i in range(1, 1501)]
+        seen = []
+
+        def page(last_id):
+            seen.append(last_id)
+            resp = MagicMock()
+            resp.data = [r for r in rows if r["PLAYER_ID"] > last_id][:1000]
+            return resp
+
+        client = MagicMock()
+        chain = client.table.return_value.select.return_value
+        chain.gt.side_effect = lambda col, last_id: MagicMock(**{
+            "order.return_value.limit.return_value.execute.return_value": page(last_id)})
+        monkeypatch.setattr(mlb_players, "supabase", client)
+
+        result = mlb_players.fetch_db_players()
+        assert [r["PLAYER_ID"] for r in result] == list(range(1, 1501))
+        assert seen == [0, 1000]
+
+
+class TestMLBPlayersFullMode:
+
+    def test_newest_season_wins(self, monkeypatch):
+        people = {
+            2023: [{"id": 1, "fullName": "Old Team", "currentTeam": {"id": 109}},
+                   {"id": 2, "fullName": "Retired"}],
+            2024: [{"id": 1, "fullName": "New Team", "currentTeam": {"id": 119}}],
+        }
+        session = MagicMock()
+        session.get.side_effect = lambda url, params, timeout: _feed_response(
+            data={"people": people.get(params["season"], [])})
+        upserted = []
+        monkeypatch.setattr(mlb_players, "SESSION", session)
+        monkeypatch.setattr(mlb_players, "upsert_players", upserted.extend)
+        monkeypatch.setattr(mlb_players, "datetime", MagicMock(**{"now.return_value.year": 2024}))
+
+        mlb_players.run_full_mode()
+        by_id = {p["PLAYER_ID"]: p for p in upserted}
+        assert set(by_id) == {1, 2}
+        assert by_id[1]["TEAM_ID"] == 119
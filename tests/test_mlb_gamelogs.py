@@ -5,14 +5,25 @@ Tests for MLB gamelogs feature engineering logic.
 Tests the pure computational functions using synthetic data:
 - compute_player_batting_rolling: per-player rolling with shift(1)
 - compute_player_pitching_rolling: same for pitching stats
-- get_latest_player_rolling: latest values extraction
+- _shifted_rolling_mean: running-sum rolling matches pandas shift(1).rolling
+- PlayerRolling: float32 table + (player, game) row index
+- get_latest_player_rolling: latest row extraction
 - compute_team_win_rolling: team win rate rolling
 - build_gamelogs: lineup-weighted feature assembly
 - LINEUP_WEIGHTS: normalization correctness
+- upsert_gamelogs: concurrent batches with row-by-row fallback
+- fetch_paginated: concurrent page prefetch, rows kept in order; keyset mode
+- fetch_frame: keyset pages converted to one DataFrame
+- delete_stale_gamelogs: only rows missing from the rebuild are deleted
+- run_current_mode: concurrent fetch, target games taken from the history window
 """
 
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
 import numpy as np
 import pandas as pd
+import pytest
 
 # Import the pre-loaded modules from conftest (avoids name collisions)
 from conftest import mlb_gamelogs
@@ -128,6 +139,70 @@ def make_mlb_games_df(n=5):
     })
 
 
+def rolling_stats(rolling, pid, gid):
+    """{stat_window: value} for one player-game of a PlayerRolling table."""
+    return rolling.as_dict(rolling.row_index[(pid, gid)])
+
+
+def player_game_ids(rolling, pid):
+    return sorted(g for p, g in rolling.row_index if p == pid)
+
+
+class FakeQuery:
+    """Minimal stand-in for a postgrest query builder over in-memory rows."""
+
+    def __init__(self, rows, log, with_count=True):
+        self.rows = list(rows)
+        self.log = log
+        self.with_count = with_count
+        self.count = None
+        self.lo, self.hi = 0, None
+
+    def select(self, cols, count=None):
+        self.count = count
+        return self
+
+    def eq(self, col, val):
+        self.rows = [r for r in self.rows if r[col] == val]
+        return self
+
+    def gt(self, col, val):
+        self.rows = [r for r in self.rows if r[col] > val]
+        return self
+
+    def limit(self, n):
+        self.lo, self.hi = 0, n - 1
+        return self
+
+    def order(self, col, desc=False):
+        self.rows = sorted(self.rows, key=lambda r: r[col], reverse=desc)
+        return self
+
+    def range(self, lo, hi):
+        self.lo, self.hi = lo, hi
+        return self
+
+    def execute(self):
+        self.log.append(self.lo)
+        count = len(self.rows) if self.count and self.with_count else None
+        return SimpleNamespace(data=self.rows[self.lo:self.hi + 1], count=count)
+
+
+def fake_table_client(rows, with_count=True):
+    log = []
+    client = MagicMock()
+    client.table.side_effect = lambda name: FakeQuery(rows, log, with_count)
+    return client, log
+
+
+def empty_batting_rolling():
+    return mlb_gamelogs.compute_player_batting_rolling(pd.DataFrame())
+
+
+def empty_pitching_rolling():
+    return mlb_gamelogs.compute_player_pitching_rolling(pd.DataFrame())
+
+
 # ---------------------------------------------------------------------------
 # Tests
 # ---------------------------------------------------------------------------
@@ -151,23 +226,33 @@ class TestLineupWeights:
         expected = [9, 8, 7, 6, 5, 4, 3, 2, 1]
         assert list(mlb_gamelogs.LINEUP_WEIGHTS) == expected
 
+    def test_weights_by_mask(self):
+        table = mlb_gamelogs.LINEUP_WEIGHTS_BY_MASK
+        assert table.shape == (512, 9)
+        np.testing.assert_allclose(table[511], mlb_gamelogs.LINEUP_WEIGHTS_NORM, rtol=1e-6)
+        assert not table[0].any()
+        # batters 1 and 3 only -> 9/16 and 7/16
+        np.testing.assert_allclose(table[0b101][[0, 2]], [9 / 16, 7 / 16], rtol=1e-6)
+        assert table[0b101].sum() == pytest.approx(1.0)
+
 
 class TestComputePlayerBattingRolling:
 
-    def test_returns_dict_structure(self):
+    def test_returns_table_structure(self):
         batting = make_batting_df([100, 200], n_games_per_player=3)
         result = mlb_gamelogs.compute_player_batting_rolling(batting)
 
-        assert isinstance(result, dict)
-        assert 100 in result
-        assert 200 in result
+        assert isinstance(result, mlb_gamelogs.PlayerRolling)
+        assert result.values.dtype == np.float32
+        assert player_game_ids(result, 100) == [1000, 1001, 1002]
+        assert player_game_ids(result, 200) == [1000, 1001, 1002]
 
     def test_rolling_keys_per_game(self):
         batting = make_batting_df([100], n_games_per_player=3)
         result = mlb_gamelogs.compute_player_batting_rolling(batting)
 
         # Each game should have keys like "BA_10", "BA_50", etc.
-        game_vals = list(result[100].values())[1]  # second game
+        game_vals = rolling_stats(result, 100, 1001)  # second game
         for stat in mlb_gamelogs.BATTING_ROLLING_STATS:
             for window in mlb_gamelogs.WINDOWS:
                 key = f"{stat}_{window}"
@@ -178,8 +263,8 @@ class TestComputePlayerBattingRolling:
         batting = make_batting_df([100], n_games_per_player=3)
         result = mlb_gamelogs.compute_player_batting_rolling(batting)
 
-        first_game_id = min(result[100].keys())
-        first_vals = result[100][first_game_id]
+        first_game_id = player_game_ids(result, 100)[0]
+        first_vals = rolling_stats(result, 100, first_game_id)
         assert first_vals["BA_10"] is None, "First game rolling should be None (shift)"
 
     def test_no_data_leakage(self):
@@ -187,9 +272,9 @@ class TestComputePlayerBattingRolling:
         batting = make_batting_df([100], n_games_per_player=5)
         result = mlb_gamelogs.compute_player_batting_rolling(batting)
 
-        game_ids = sorted(result[100].keys())
+        game_ids = player_game_ids(result, 100)
         # Game 2 (index 2) rolling_10 should be avg of game 0 and game 1
-        game_2_ba = result[100][game_ids[2]]["BA_10"]
+        game_2_ba = rolling_stats(result, 100, game_ids[2])["BA_10"]
 
         ba_values = batting[batting["PLAYER_ID"] == 100].sort_values("GAME_DATE")["BA"].values
         expected = (ba_values[0] + ba_values[1]) / 2
@@ -199,25 +284,27 @@ class TestComputePlayerBattingRolling:
 
     def test_empty_input(self):
         result = mlb_gamelogs.compute_player_batting_rolling(pd.DataFrame())
-        assert result == {}
+        assert result.row_index == {}
+        assert result.missing_row == 0
+        assert np.isnan(result.values).all()
 
 
 class TestComputePlayerPitchingRolling:
 
-    def test_returns_dict_structure(self):
+    def test_returns_table_structure(self):
         pitching = make_pitching_df([500, 600], n_games_per_player=3)
         result = mlb_gamelogs.compute_player_pitching_rolling(pitching)
 
-        assert 500 in result
-        assert 600 in result
+        assert player_game_ids(result, 500)
+        assert player_game_ids(result, 600)
 
     def test_stat_name_remapping(self):
         """Pitching rolling should use output names (e.g., SO_P → SO)."""
         pitching = make_pitching_df([500], n_games_per_player=3)
         result = mlb_gamelogs.compute_player_pitching_rolling(pitching)
 
-        game_ids = sorted(result[500].keys())
-        vals = result[500][game_ids[1]]  # second game
+        game_ids = player_game_ids(result, 500)
+        vals = rolling_stats(result, 500, game_ids[1])  # second game
 
         for output_stat in mlb_gamelogs.PITCHING_OUTPUT_STATS:
             for window in mlb_gamelogs.WINDOWS:
@@ -225,21 +312,90 @@ class TestComputePlayerPitchingRolling:
                 assert key in vals, f"Missing remapped key: {key}"
 
 
+class TestShiftedRollingMean:
+
+    def test_matches_pandas_rolling(self):
+        rng = np.random.RandomState(0)
+        groups = np.sort(rng.randint(0, 20, 500))
+        values = rng.uniform(0, 5, (500, 2))
+        values[rng.rand(500, 2) < 0.2] = np.nan
+
+        start = mlb_gamelogs._group_starts(groups)
+        for window in [3, 10, 50]:
+            mean, count = mlb_gamelogs._shifted_rolling_mean(values, start, window)
+            shifted = pd.DataFrame(values).groupby(groups).shift(1)
+            expected = (shifted.groupby(groups).rolling(window, min_periods=1).mean()
+                        .reset_index(level=0, drop=True).sort_index().to_numpy())
+            np.testing.assert_allclose(mean, expected, rtol=1e-9, equal_nan=True)
+            assert ((count > 0) == ~np.isnan(mean)).all()
+
+    def test_window_never_crosses_groups(self):
+        groups = np.array([1, 1, 2, 2])
+        values = np.array([[1.0], [3.0], [100.0], [5.0]])
+        mean, count = mlb_gamelogs._shifted_rolling_mean(
+            values, mlb_gamelogs._group_starts(groups), 10)
+        assert np.isnan(mean[0, 0]) and np.isnan(mean[2, 0])
+        assert mean[1, 0] == 1.0 and mean[3, 0] == 100.0
+        assert count[:, 0].tolist() == [0, 1, 0, 1]
+
+
+class TestPlayerRollingLookup:
+
+    def test_exact_game_row(self):
+        batting = make_batting_df([100], n_games_per_player=3)
+        rolling = mlb_gamelogs.compute_player_batting_rolling(batting)
+        assert rolling.lookup(100, 1001) == rolling.row_index[(100, 1001)]
+
+    def test_falls_back_to_latest(self):
+        batting = make_batting_df([100], n_games_per_player=3)
+        rolling = mlb_gamelogs.compute_player_batting_rolling(batting)
+        latest = mlb_gamelogs.get_latest_player_rolling(rolling)
+        assert rolling.lookup(100, 9999, latest) == rolling.row_index[(100, 1002)]
+
+    def test_unknown_player_gets_missing_row(self):
+        batting = make_batting_df([100], n_games_per_player=3)
+        rolling = mlb_gamelogs.compute_player_batting_rolling(batting)
+        row = rolling.lookup(12345, 1001, {})
+        assert row == rolling.missing_row
+        assert np.isnan(rolling.values[row]).all()
+
+    def test_lookup_many_matches_lookup(self):
+        batting = make_batting_df([100, 200], n_games_per_player=3)
+        rolling = mlb_gamelogs.compute_player_batting_rolling(batting)
+        pids = [100, 200, 100, 12345]
+        gids = [1001, 1000, 9999, 1001]
+        rows = rolling.lookup_many(pids, gids)
+        assert rows.tolist() == [rolling.lookup(p, g) for p, g in zip(pids, gids)]
+
+
 class TestGetLatestPlayerRolling:
 
-    def test_returns_latest_game_values(self):
+    def test_returns_latest_game_row(self):
         batting = make_batting_df([100], n_games_per_player=5)
         rolling = mlb_gamelogs.compute_player_batting_rolling(batting)
         latest = mlb_gamelogs.get_latest_player_rolling(rolling)
 
         assert 100 in latest
         # Latest should be from the last game
-        last_game_id = max(rolling[100].keys())
-        assert latest[100] == rolling[100][last_game_id]
+        last_game_id = player_game_ids(rolling, 100)[-1]
+        assert latest[100] == rolling.row_index[(100, last_game_id)]
 
     def test_empty_input(self):
-        result = mlb_gamelogs.get_latest_player_rolling({})
-        assert result == {}
+        empty = mlb_gamelogs.compute_player_batting_rolling(pd.DataFrame())
+        assert mlb_gamelogs.get_latest_player_rolling(empty) == {}
+
+    def test_latest_is_most_recent_date(self):
+        """A resumed/rescheduled game with a lower GAME_ID but later date is latest."""
+        batting = make_batting_df([100], n_games_per_player=3)
+        batting.loc[batting.index[-1], "GAME_ID"] = 900
+        rolling = mlb_gamelogs.compute_player_batting_rolling(batting)
+        assert rolling.latest[100] == rolling.row_index[(100, 900)]
+
+    def test_latest_rows_follow_player_codes(self):
+        batting = make_batting_df([300, 100, 200], n_games_per_player=4)
+        rolling = mlb_gamelogs.compute_player_batting_rolling(batting)
+        codes = rolling.player_index.get_indexer([100, 200, 300])
+        assert rolling.latest_rows[codes].tolist() == [rolling.latest[p] for p in [100, 200, 300]]
 
 
 class TestComputeTeamWinRolling:
@@ -343,7 +499,7 @@ class TestBuildGamelogs:
     def test_game_metadata_preserved(self):
         games = make_mlb_games_df(n=2)
         records = mlb_gamelogs.build_gamelogs(
-            games, {}, {}, {}, {}, {}, {}
+            games, empty_batting_rolling(), empty_pitching_rolling(), {}, {}, {}, {}
         )
         rec = records[0]
         assert "GAME_ID" in rec
@@ -353,11 +509,207 @@ class TestBuildGamelogs:
         assert "HOME_LINEUP" in rec
         assert "HOME_SP" in rec
 
+    def test_raw_game_date_passes_through(self):
+        games = make_mlb_games_df(n=2)
+        games["GAME_DATE"] = ["2024-04-01T18:05:00+00:00", "2024-04-02T23:10:00+00:00"]
+        records = mlb_gamelogs.build_gamelogs(
+            games, empty_batting_rolling(), empty_pitching_rolling(), {}, {}, {}, {}
+        )
+        assert [r["GAME_DATE"] for r in records] == list(games["GAME_DATE"])
+
     def test_empty_games(self):
         empty = pd.DataFrame()
-        records = mlb_gamelogs.build_gamelogs(empty, {}, {}, {}, {}, {}, {})
+        records = mlb_gamelogs.build_gamelogs(
+            empty, empty_batting_rolling(), empty_pitching_rolling(), {}, {}, {}, {}
+        )
         assert records == []
 
+    def test_lineup_weighted_average(self):
+        """Batting feature = lineup-weight-normalized average of available batters."""
+        games = make_mlb_games_df(n=3)
+        batting = make_batting_df(list(range(101, 110)), n_games_per_player=3)
+        b_rolling = mlb_gamelogs.compute_player_batting_rolling(batting)
+
+        records = mlb_gamelogs.build_gamelogs(
+            games, b_rolling, empty_pitching_rolling(), {},
+            mlb_gamelogs.get_latest_player_rolling(b_rolling), {}, {}
+        )
+
+        vals = np.array([rolling_stats(b_rolling, pid, 1001)["OPS_10"] for pid in range(101, 110)])
+        expected = float(np.dot(mlb_gamelogs.LINEUP_WEIGHTS_NORM, vals))
+        assert abs(records[1]["HOME_OPS_10"] - expected) < 1e-3
+        # Away lineup has no stats at all
+        assert records[1]["AWAY_OPS_10"] is None
+
+
+class TestUpsertGamelogs:
+
+    def _fake_supabase(self, monkeypatch, fail_batches=False):
+        calls = []
+
+        def upsert(payload, on_conflict=None):
+            calls.append(payload)
+            q = MagicMock()
+            if fail_batches and isinstance(payload, list):
+                q.execute.side_effect = Exception("batch rejected")
+            return q
+
+        client = MagicMock()
+        client.table.return_value.upsert.side_effect = upsert
+        monkeypatch.setattr(mlb_gamelogs, "supabase", client)
+        return calls
+
+    def test_batches_all_records(self, monkeypatch):
+        calls = self._fake_supabase(monkeypatch)
+        records = [{"GAME_ID": i, "HOME_BA_10": 0.25} for i in range(1000)]
+        mlb_gamelogs.upsert_gamelogs(records)
+
+        assert len(calls) == 3  # 400 + 400 + 200
+        sent = sorted(r["GAME_ID"] for batch in calls for r in batch)
+        assert sent == list(range(1000))
+
+    def test_failed_batch_falls_back_to_rows(self, monkeypatch):
+        calls = self._fake_supabase(monkeypatch, fail_batches=True)
+        records = [{"GAME_ID": i} for i in range(5)]
+        mlb_gamelogs.upsert_gamelogs(records)
+
+        rows = [c for c in calls if isinstance(c, dict)]
+        assert sorted(r["GAME_ID"] for r in rows) == list(range(5))
+
+    def test_nan_cleaned_before_upsert(self, monkeypatch):
+        calls = self._fake_supabase(monkeypatch)
+        mlb_gamelogs.upsert_gamelogs([{"GAME_ID": np.int64(1), "HOME_BA_10": float("nan")}])
+
+        sent = calls[0][0]
+        assert sent["HOME_BA_10"] is None
+        assert type(sent["GAME_ID"]) is int
+
+
+class TestCleanRecords:
+
+    def test_column_types_preserved(self):
+        records = [
+            {"GAME_ID": np.int64(1), "GAME_OUTCOME": 1, "HOME_BA_10": 0.25,
+             "HOME_LINEUP": [1, 2], "HOME_NAME": "Dodgers"},
+            {"GAME_ID": np.int64(2), "GAME_OUTCOME": None, "HOME_BA_10": float("inf"),
+             "HOME_LINEUP": None, "HOME_NAME": None},
+        ]
+        cleaned = mlb_gamelogs.clean_records(records)
+
+        assert cleaned[0] == {"GAME_ID": 1, "GAME_OUTCOME": 1, "HOME_BA_10": 0.25,
+                              "HOME_LINEUP": [1, 2], "HOME_NAME": "Dodgers"}
+        assert type(cleaned[0]["GAME_OUTCOME"]) is int  # not upcast to 1.0
+        assert cleaned[1]["GAME_OUTCOME"] is None
+        assert cleaned[1]["HOME_BA_10"] is None  # inf scrubbed
+        assert cleaned[1]["HOME_LINEUP"] is None
+
+    def test_pandas_missing_values(self):
+        cleaned = mlb_gamelogs.clean_records([{"A": pd.NA, "B": pd.NaT, "C": np.float32("nan")}])
+        assert cleaned == [{"A": None, "B": None, "C": None}]
+
+
+class TestFetchPaginated:
+
+    def test_fetches_all_pages_in_order(self, monkeypatch):
+        rows = [{"id": i, "GAME_STATUS": 3} for i in range(25)]
+        client, log = fake_table_client(rows)
+        monkeypatch.setattr(mlb_gamelogs, "supabase", client)
+        monkeypatch.setattr(mlb_gamelogs, "PAGE_SIZE", 10)
+
+        result = mlb_gamelogs.fetch_paginated("t", "*", order_col="id")
+        assert [r["id"] for r in result] == list(range(25))
+        assert sorted(log) == [0, 10, 20]
+
+    def test_applies_filters(self, monkeypatch):
+        rows = [{"id": i, "GAME_STATUS": 3 if i % 2 else 4} for i in range(30)]
+        client, _ = fake_table_client(rows)
+        monkeypatch.setattr(mlb_gamelogs, "supabase", client)
+        monkeypatch.setattr(mlb_gamelogs, "PAGE_SIZE", 10)
+
+        result = mlb_gamelogs.fetch_paginated("t", "*", [("eq", "GAME_STATUS", 3)], order_col="id")
+        assert [r["id"] for r in result] == list(range(1, 30, 2))
+
+    def test_without_count_falls_back_to_serial(self, monkeypatch):
+        rows = [{"id": i} for i in range(20)]
+        client, log = fake_table_client(rows, with_count=False)
+        monkeypatch.setattr(mlb_gamelogs, "supabase", client)
+        monkeypatch.setattr(mlb_gamelogs, "PAGE_SIZE", 10)
+
+        result = mlb_gamelogs.fetch_paginated("t", "*", order_col="id")
+        assert [r["id"] for r in result] == list(range(20))
+        assert log == [0, 10, 20]
+
+    def test_keyset_pagination(self, monkeypatch):
+        rows = [{"id": f"g{i:03d}", "GAME_STATUS": 3} for i in range(25)]
+        client, log = fake_table_client(rows)
+        monkeypatch.setattr(mlb_gamelogs, "supabase", client)
+        monkeypatch.setattr(mlb_gamelogs, "PAGE_SIZE", 10)
+
+        result = mlb_gamelogs.fetch_paginated("t", "*", keyset_col="id")
+        assert [r["id"] for r in result] == [f"g{i:03d}" for i in range(25)]
+        assert log == [0, 0, 0]  # every page starts at the keyset, never an offset
+
+    def test_fetch_frame_concatenates_pages(self, monkeypatch):
+        rows = [{"id": i, "GAME_STATUS": 3, "X": i * 0.5} for i in range(25)]
+        client, _ = fake_table_client(rows)
+        monkeypatch.setattr(mlb_gamelogs, "supabase", client)
+        monkeypatch.setattr(mlb_gamelogs, "PAGE_SIZE", 10)
+
+        df = mlb_gamelogs.fetch_frame("t", "id,X", "id")
+        assert list(df.columns) == ["id", "X"]
+        assert df["id"].tolist() == list(range(25))
+
+    def test_fetch_frame_empty(self, monkeypatch):
+        client, _ = fake_table_client([])
+        monkeypatch.setattr(mlb_gamelogs, "supabase", client)
+        assert mlb_gamelogs.fetch_frame("t", "*", "id").empty
+
+
+class TestDeleteStaleGamelogs:
+
+    def test_deletes_only_missing_ids(self, monkeypatch):
+        client = MagicMock()
+        monkeypatch.setattr(mlb_gamelogs, "supabase", client)
+        monkeypatch.setattr(mlb_gamelogs, "fetch_paginated",
+                            lambda *a, **kw: [{"GAME_ID": i} for i in range(1, 6)])
+
+        assert mlb_gamelogs.delete_stale_gamelogs({1, 2, 4}) == 2
+        client.table.return_value.delete.return_value.in_.assert_called_once_with("GAME_ID", [3, 5])
+
+    def test_nothing_stale(self, monkeypatch):
+        client = MagicMock()
+        monkeypatch.setattr(mlb_gamelogs, "supabase", client)
+        monkeypatch.setattr(mlb_gamelogs, "fetch_paginated", lambda *a, **kw: [{"GAME_ID": 1}])
+
+        assert mlb_gamelogs.delete_stale_gamelogs({1}) == 0
+        client.table.return_value.delete.assert_not_called()
+
+
+class TestRunCurrentMode:
+
+    def test_fetch_concurrently_keeps_order(self):
+        results = mlb_gamelogs.fetch_concurrently(
+            (lambda x: x * 2, {"x": 1}), (lambda x: x * 3, {"x": 1}))
+        assert results == [2, 3]
+
+    def test_target_games_are_recent_slice(self, monkeypatch):
+        games = make_mlb_games_df(n=10)
+        today = pd.Timestamp.now(tz="UTC").normalize()
+        games["GAME_DATE"] = [today - pd.Timedelta(days=9 - i) for i in range(10)]
+
+        monkeypatch.setattr(mlb_gamelogs, "fetch_games", lambda **kw: games)
+        monkeypatch.setattr(mlb_gamelogs, "fetch_batting_stats", lambda **kw: pd.DataFrame())
+        monkeypatch.setattr(mlb_gamelogs, "fetch_pitching_stats", lambda **kw: pd.DataFrame())
+        upserted = []
+        monkeypatch.setattr(mlb_gamelogs, "upsert_gamelogs", upserted.extend)
+
+        mlb_gamelogs.run_current_mode()
+
+        # games dated within the last 3 days (now - 3d, same as the server-side filter)
+        assert [r["GAME_ID"] for r in upserted] == [1007, 1008, 1009]
+        # win rate still uses the full history
+        assert upserted[-1]["HOME_GAMES_10"] == 9
+
 
 class TestRollingWindowConfig:
 
@@ -0,0 +1,405 @@
+# tests/test_mlb_playerstats.py
+"""
+Tests for the MLB playerstats pipeline.
+
+- _clean_payloads: vectorized coercion to Supabase-safe payloads
+- upsert_playerstats: concurrent batches; oversized or failing ones split in half;
+  opt-in gzip bodies with uncompressed fallback
+- fetch_player_gamelog: split parsing, cache revalidation of the current season,
+  both groups from one request for two-way players
+- fetch_db_playerstats: id-only IN batches, paged past the max-rows cap
+- find_missing_rows: server-side anti-join RPC with client-side fallback
+- fetch_db_player_ids: distinct-ids RPC with full-scan fallback
+- roster_player_ids: unique ids across lineups, bullpens and starters
+- run_current_mode: upserts everything unless the delta check is enabled
+- _run_pipeline / run_backfill_mode: shared fetch -> dedupe -> upsert path
+"""
+
+import gzip
+import json
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from conftest import mlb_playerstats
+
+
+def make_stat_row(**overrides):
+    row = {
+        "id": "745000_660271_batting",
+        "GAME_ID": 745000,
+        "PLAYER_ID": 660271,
+        "GAME_DATE": "2024-04-01",
+        "SEASON_ID": 2024,
+        "TEAM_ID": 119,
+        "OPPONENT_ID": 137,
+        "IS_HOME": True,
+        "STAT_TYPE": "batting",
+        "AB": 4, "H": 2, "R": 1, "HR": 1, "RBI": 3,
+        "BA": ".287", "OBP": ".372", "SLG": ".654", "OPS": "1.026",
+    }
+    row.update(overrides)
+    return row
+
+
+class TestMLBCleanPayloads:
+
+    def test_all_columns_present(self):
+        payload = mlb_playerstats._clean_payloads([make_stat_row()])[0]
+        assert list(payload) == mlb_playerstats.PAYLOAD_COLUMNS
+        assert payload["WHIP"] is None and payload["ER"] is None
+
+    def test_string_rates_parsed_and_rounded(self):
+        payload = mlb_playerstats._clean_payloads([make_stat_row(BA=".28666", IP="5.1")])[0]
+        assert payload["BA"] == 0.287
+        assert payload["IP"] == 5.1
+        assert payload["OPS"] == 1.026
+
+    def test_native_python_types(self):
+        """Payloads go through json.dumps — no numpy scalars or NaN allowed."""
+        payload = mlb_playerstats._clean_payloads([make_stat_row()])[0]
+        assert type(payload["GAME_ID"]) is int
+        assert type(payload["AB"]) is int
+        assert type(payload["BA"]) is float
+        json.dumps(payload, allow_nan=False)
+
+    def test_unparseable_and_inf_become_null(self):
+        rows = [
+            make_stat_row(ERA="-.--", WHIP=float("inf"), AB="x"),
+            make_stat_row(ERA=np.inf, WHIP=np.nan, AB=None),
+        ]
+        for payload in mlb_playerstats._clean_payloads(rows):
+            assert payload["ERA"] is None
+            assert payload["WHIP"] is None
+            assert payload["AB"] is None
+
+    def test_ints_truncated(self):
+        payload = mlb_playerstats._clean_payloads([make_stat_row(AB="4", H=2.7)])[0]
+        assert payload["AB"] == 4
+        assert payload["H"] == 2
+
+    def test_passthrough_columns(self):
+        rows = [make_stat_row(), make_stat_row(IS_HOME=None, GAME_DATE=None)]
+        first, second = mlb_playerstats._clean_payloads(rows)
+        assert first["IS_HOME"] is True
+        assert first["GAME_DATE"] == "2024-04-01"
+        assert first["STAT_TYPE"] == "batting"
+        assert second["IS_HOME"] is None
+        assert second["GAME_DATE"] is None
+
+
+def _recording_supabase(bad_ids=()):
+    """Supabase mock recording each upsert batch; raises if it holds a bad id."""
+    calls = []
+    client = MagicMock()
+
+    def upsert(batch, on_conflict=None):
+        calls.append([r["id"] for r in batch])
+        query = MagicMock()
+        if any(r["id"] in bad_ids for r in batch):
+            query.execute.side_effect = RuntimeError("bad row")
+        return query
+
+    client.table.return_value.upsert.side_effect = upsert
+    return client, calls
+
+
+class TestMLBUpsertPlayerstats:
+
+    def _rows(self, n):
+        return [make_stat_row(id=f"g{i}") for i in range(n)]
+
+    def test_single_batch(self, monkeypatch):
+        client, calls = _recording_supabase()
+        monkeypatch.setattr(mlb_playerstats, "supabase", client)
+        mlb_playerstats.upsert_playerstats(self._rows(10))
+        assert calls == [[f"g{i}" for i in range(10)]]
+
+    def test_failure_bisects_to_bad_row(self, monkeypatch):
+        client, calls = _recording_supabase(bad_ids={"g5"})
+        monkeypatch.setattr(mlb_playerstats, "supabase", client)
+        mlb_playerstats.upsert_playerstats(self._rows(8))
+        succeeded = {i for c in calls for i in c} - {"g5"}
+        assert succeeded == {f"g{i}" for i in range(8)} - {"g5"}
+        # Fewer calls than the old row-by-row fallback
+        assert len(calls) < 1 + 8
+        assert ["g5"] in calls
+
+    def test_oversized_batch_split_before_sending(self, monkeypatch):
+        client, calls = _recording_supabase()
+        monkeypatch.setattr(mlb_playerstats, "supabase", client)
+        one_row = len(mlb_playerstats._dumps(mlb_playerstats._clean_payloads(self._rows(1))))
+        monkeypatch.setattr(mlb_playerstats, "MAX_UPSERT_BYTES", one_row * 3)
+        mlb_playerstats.upsert_playerstats(self._rows(8))
+        assert all(len(c) <= 2 for c in calls)
+        assert sorted(i for c in calls for i in c) == sorted(f"g{i}" for i in range(8))
+
+    def test_gzip_upsert_posts_compressed_body(self, monkeypatch):
+        client, calls = _recording_supabase()
+        monkeypatch.setattr(mlb_playerstats, "supabase", client)
+        monkeypatch.setattr(mlb_playerstats, "GZIP_UPSERT", True)
+        mlb_playerstats.upsert_playerstats(self._rows(3))
+        post = client.postgrest.session.post
+        assert post.call_count == 1
+        kwargs = post.call_args.kwargs
+        assert kwargs["headers"]["Content-Encoding"] == "gzip"
+        assert kwargs["params"] == {"on_conflict": "id"}
+        sent = json.loads(gzip.decompress(kwargs["content"]))
+        assert [r["id"] for r in sent] == ["g0", "g1", "g2"]
+        assert calls == []  # SDK upsert not used
+
+    def test_gzip_rejected_resends_uncompressed(self, monkeypatch):
+        client, calls = _recording_supabase()
+        client.postgrest.session.post.return_value.raise_for_status.side_effect = RuntimeError("415")
+        monkeypatch.setattr(mlb_playerstats, "supabase", client)
+        monkeypatch.setattr(mlb_playerstats, "GZIP_UPSERT", True)
+        mlb_playerstats.upsert_playerstats(self._rows(3))
+        assert calls == [["g0", "g1", "g2"]]
+
+    def test_batches_upserted_concurrently(self, monkeypatch):
+        client, calls = _recording_supabase()
+        monkeypatch.setattr(mlb_playerstats, "supabase", client)
+        monkeypatch.setattr(mlb_playerstats, "UPSERT_BATCH_SIZE", 3)
+        mlb_playerstats.upsert_playerstats(self._rows(8))
+        assert sorted(len(c) for c in calls) == [2, 3, 3]
+        assert sorted(i for c in calls for i in c) == sorted(f"g{i}" for i in range(8))
+
+
+def make_split(game_pk, stat, date="2024-04-01"):
+    return {
+        "date": date,
+        "isHome": True,
+        "game": {"gamePk": game_pk},
+        "team": {"id": 119},
+        "opponent": {"id": 137},
+        "stat": stat,
+    }
+
+
+def gamelog_response(splits, groups=None):
+    """groups: {"hitting": splits, ...} for a multi-group response."""
+    resp = MagicMock()
+    resp.status_code = 200
+    if groups is None:
+        data = {"stats": [{"splits": splits}]}
+    else:
+        data = {"stats": [{"group": {"displayName": g}, "splits": sp} for g, sp in groups.items()]}
+    resp.json.return_value = data
+    resp.content = json.dumps(data).encode()
+    return resp
+
+
+class TestMLBFetchPlayerGamelog:
+
+    def _session(self, monkeypatch, splits):
+        session = MagicMock()
+        session.get.return_value = gamelog_response(splits)
+        monkeypatch.setattr(mlb_playerstats, "SESSION", session)
+        return session
+
+    def test_pitching_split_parsed(self, monkeypatch):
+        stat = {"inningsPitched": "6.0", "hits": 4, "baseOnBalls": 2, "strikeOuts": 8, "era": "3.00"}
+        self._session(monkeypatch, [make_split(745000, stat)])
+        rows = mlb_playerstats.fetch_player_gamelog(543037, "pitching", [2024])
+        assert len(rows) == 1
+        row = rows[0]
+        assert row["id"] == "745000_543037_pitching"
+        assert row["SO_P"] == 8 and row["IP"] == "6.0"
+        assert row["WHIP"] == 1.0
+
+    def test_splits_without_game_skipped(self, monkeypatch):
+        self._session(monkeypatch, [make_split(None, {"atBats": 4})])
+        assert mlb_playerstats.fetch_player_gamelog(660271, "hitting", [2024]) == []
+
+    def test_two_way_single_request(self, monkeypatch):
+        session = self._session(monkeypatch, [])
+        session.get.return_value = gamelog_response(None, groups={
+            "hitting": [make_split(745000, {"atBats": 4, "homeRuns": 1})],
+            "pitching": [make_split(745000, {"inningsPitched": "5.0", "hits": 3, "baseOnBalls": 2})],
+        })
+        rows = mlb_playerstats.fetch_player_all_stats(660271, "two_way", [2024])
+        assert session.get.call_count == 1
+        assert session.get.call_args.kwargs["params"]["group"] == "hitting,pitching"
+        by_type = {r["STAT_TYPE"]: r for r in rows}
+        assert by_type["batting"]["HR"] == 1
+        assert by_type["pitching"]["WHIP"] == 1.0
+        assert by_type["pitching"]["id"] == "745000_660271_pitching"
+
+    def test_player_type_dispatch(self, monkeypatch):
+        session = self._session(monkeypatch, [])
+        for ptype, group in [("batter", "hitting"), ("pitcher", "pitching")]:
+            mlb_playerstats.fetch_player_all_stats(1, ptype, [2024])
+            assert session.get.call_args.kwargs["params"]["group"] == group
+
+    def test_only_current_season_revalidated(self, monkeypatch):
+        from requests_cache import EXPIRE_IMMEDIATELY
+        session = self._session(monkeypatch, [])
+        current = datetime.now().year
+        mlb_playerstats.fetch_player_gamelog(660271, "hitting", [current - 1, current])
+        expire = {c.kwargs["params"]["season"]: c.kwargs["expire_after"]
+                  for c in session.get.call_args_list}
+        assert expire == {current - 1: None, current: EXPIRE_IMMEDIATELY}
+
+
+class TestMLBFetchDbPlayerstats:
+
+    def test_batches_and_pages(self, monkeypatch):
+        stored = {g: [{"id": f"{g}_{p}_batting"} for p in range(3)] for g in range(5)}
+        calls = []
+
+        def query_for(game_ids):
+            rows = sorted((r for g in game_ids for r in stored.get(g, [])), key=lambda r: r["id"])
+            q = MagicMock()
+
+            def rng(lo, hi):
+                calls.append((tuple(game_ids), lo))
+                out = MagicMock()
+                out.execute.return_value.data = rows[lo:hi + 1]
+                return out
+
+            q.order.return_value.range.side_effect = rng
+            return q
+
+        client = MagicMock()
+        client.table.return_value.select.return_value.in_.side_effect = lambda col, ids: query_for(ids)
+        monkeypatch.setattr(mlb_playerstats, "supabase", client)
+        monkeypatch.setattr(mlb_playerstats, "DB_IN_BATCH_SIZE", 2)
+        monkeypatch.setattr(mlb_playerstats, "PAGE_SIZE", 4)
+
+        rows = mlb_playerstats.fetch_db_playerstats(list(range(5)))
+        assert sorted(r["id"] for r in rows) == sorted(r["id"] for v in stored.values() for r in v)
+        client.table.return_value.select.assert_called_with("id")
+        # 6 rows for a 2-game batch need a second page
+        assert ((0, 1), 4) in calls
+        assert mlb_playerstats.fetch_db_playerstats([]) == []
+
+
+class TestMLBFindMissingRows:
+
+    def _rows(self):
+        return [make_stat_row(id=f"g{i}", GAME_ID=i) for i in range(5)]
+
+    def test_rpc_anti_join(self, monkeypatch):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = [{"id": "g1"}, {"id": "g3"}]
+        monkeypatch.setattr(mlb_playerstats, "supabase", client)
+        missing = mlb_playerstats.find_missing_rows(self._rows())
+        assert [r["id"] for r in missing] == ["g1", "g3"]
+        name, params = client.rpc.call_args.args
+        assert name == "mlb_playerstats_missing_ids"
+        assert params["ids"] == [f"g{i}" for i in range(5)]
+
+    def test_rpc_batched(self, monkeypatch):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = []
+        monkeypatch.setattr(mlb_playerstats, "supabase", client)
+        monkeypatch.setattr(mlb_playerstats, "DB_MISSING_RPC_BATCH_SIZE", 2)
+        assert mlb_playerstats.find_missing_rows(self._rows()) == []
+        assert client.rpc.call_count == 3
+
+    def test_falls_back_without_rpc(self, monkeypatch):
+        client = MagicMock()
+        client.rpc.side_effect = RuntimeError("function not found")
+        monkeypatch.setattr(mlb_playerstats, "supabase", client)
+        monkeypatch.setattr(mlb_playerstats, "fetch_db_playerstats",
+                            lambda game_ids: [{"id": "g0"}, {"id": "g2"}, {"id": "g4"}])
+        missing = mlb_playerstats.find_missing_rows(self._rows())
+        assert [r["id"] for r in missing] == ["g1", "g3"]
+
+
+class TestMLBRosterPlayerIds:
+
+    def test_unique_sorted_ints(self):
+        games = [
+            {"HOME_LINEUP": [30, 10, None], "AWAY_LINEUP": [20], "HOME_SP": 40, "AWAY_SP": 0,
+             "HOME_BULLPEN": [41, 40], "AWAY_BULLPEN": None},
+            {"HOME_LINEUP": [10], "AWAY_LINEUP": [], "HOME_SP": None, "AWAY_SP": 50},
+        ]
+        ids = mlb_playerstats.roster_player_ids(games)
+        assert ids == [10, 20, 30, 40, 41, 50]
+        assert all(type(pid) is int for pid in ids)
+
+    def test_no_games(self):
+        assert mlb_playerstats.roster_player_ids([]) == []
+
+
+class TestMLBPlayerstatsCurrentMode:
+
+    def _run(self, monkeypatch, skip_delta):
+        games = [{"GAME_ID": 1, "HOME_LINEUP": [10, 11], "AWAY_LINEUP": [20],
+                  "HOME_SP": 12, "AWAY_SP": None, "HOME_BULLPEN": [], "AWAY_BULLPEN": None}]
+        players = [{"PLAYER_ID": 12, "PLAYER_TYPE": "pitcher"}]
+
+        def fake_paginated(table, select, filters=None, order_col=None):
+            return games if table == "mlb_games" else players
+
+        fetched = []
+
+        def fake_stats(pid, ptype, seasons):
+            fetched.append((pid, ptype))
+            return [make_stat_row(id=f"1_{pid}", PLAYER_ID=pid)]
+
+        upserted = []
+        monkeypatch.setattr(mlb_playerstats, "fetch_paginated", fake_paginated)
+        monkeypatch.setattr(mlb_playerstats, "fetch_player_all_stats", fake_stats)
+        monkeypatch.setattr(mlb_playerstats, "upsert_playerstats", upserted.extend)
+        monkeypatch.setattr(mlb_playerstats, "find_missing_rows", lambda rows: rows[:1])
+        monkeypatch.setattr(mlb_playerstats, "SKIP_DELTA", skip_delta)
+        mlb_playerstats.run_current_mode()
+        return sorted(fetched), upserted
+
+    def test_upserts_all_rows_by_default(self, monkeypatch):
+        fetched, upserted = self._run(monkeypatch, skip_delta=True)
+        assert fetched == [(10, "batter"), (11, "batter"), (12, "pitcher"), (20, "batter")]
+        assert len(upserted) == 4
+
+    def test_delta_check_when_enabled(self, monkeypatch):
+        _, upserted = self._run(monkeypatch, skip_delta=False)
+        assert len(upserted) == 1
+
+
+class TestMLBFetchDbPlayerIds:
+
+    def test_rpc_array(self, monkeypatch):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = [660271, 543037]
+        monkeypatch.setattr(mlb_playerstats, "supabase", client)
+        assert mlb_playerstats.fetch_db_player_ids() == {660271, 543037}
+        assert client.rpc.call_args.args[0] == "mlb_playerstats_player_ids"
+
+    def test_falls_back_to_scan(self, monkeypatch):
+        client = MagicMock()
+        client.rpc.side_effect = RuntimeError("function not found")
+        monkeypatch.setattr(mlb_playerstats, "supabase", client)
+        monkeypatch.setattr(mlb_playerstats, "fetch_paginated",
+                            lambda *a, **k: [{"PLAYER_ID": 1}, {"PLAYER_ID": 1}, {"PLAYER_ID": 2}])
+        assert mlb_playerstats.fetch_db_player_ids() == {1, 2}
+
+
+class TestMLBPlayerstatsPipeline:
+
+    def test_dedupes_and_survives_player_errors(self, monkeypatch):
+        def fake_stats(pid, ptype, seasons):
+            if pid == 3:
+                raise RuntimeError("boom")
+            return [make_stat_row(id="shared"), make_stat_row(id=f"own_{pid}")]
+
+        upserted = []
+        monkeypatch.setattr(mlb_playerstats, "fetch_player_all_stats", fake_stats)
+        monkeypatch.setattr(mlb_playerstats, "upsert_playerstats", upserted.extend)
+        n = mlb_playerstats._run_pipeline([1, 2, 3], [2024], {})
+        assert n == 3
+        assert sorted(r["id"] for r in upserted) == ["own_1", "own_2", "shared"]
+
+    def test_backfill_fetches_only_missing_players(self, monkeypatch):
+        games = [{"HOME_LINEUP": [1, 2], "AWAY_LINEUP": [3], "HOME_SP": 4, "AWAY_SP": None}]
+        monkeypatch.setattr(mlb_playerstats, "fetch_paginated",
+                            lambda table, *a, **k: games if table == "mlb_games"
+                            else [{"PLAYER_ID": 4, "PLAYER_TYPE": "pitcher"}])
+        monkeypatch.setattr(mlb_playerstats, "fetch_db_player_ids", lambda: {1, 3})
+        calls = []
+        monkeypatch.setattr(mlb_playerstats, "_run_pipeline",
+                            lambda pids, seasons, type_map, **k: calls.append((pids, type_map)))
+        mlb_playerstats.run_backfill_mode()
+        assert calls == [([2, 4], {4: "pitcher"})]
@@ -6,11 +6,24 @@ Tests the pure computational functions using synthetic data:
 - Feature definitions: correct count and naming
 - add_diff_features: difference computation
 - build_feature_matrix: feature extraction (XGBoost handles NaN — no dropping)
+- fetch_training_data: both completed statuses fetched concurrently, training columns only
 - time_split: chronological splitting with no leakage
-- load_model: graceful handling of missing model files
-- has_roster_data: lineup/SP validation for predictions
+- train_model: hist trees with early stopping on the test split
+- evaluate_model: report importances are split gain, highest first
+- compute_season_breakdown: per-season accuracy/AUC from sorted season runs
+- load_model: graceful handling of missing model files, cached per file version
+- fetch_todays_games: today's date filter applied server-side
+- run('current'): training skipped when the data fingerprint is unchanged
+- training_data_fingerprint: tracks UPDATED_AT, falls back to CREATED_AT
+- roster_checks: lineup/SP validation for predictions
+- predict_and_write: incomplete rosters skipped, predictions written in one upsert
+- print_predictions: table rows for new and existing picks
 """
 
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
 import numpy as np
 import pandas as pd
 
@@ -110,8 +123,10 @@ class TestMLBBuildFeatureMatrix:
         df = make_mlb_training_df(50)
         X, y, result_df = mlb_train.build_feature_matrix(df)
 
-        assert len(X) == len(y)
-        assert len(X.columns) == 108
+        assert len(X) == len(y) == len(result_df)
+        assert X.shape == (50, 108)
+        assert X.dtype == np.float32
+        assert isinstance(y, np.ndarray)
 
     def test_does_not_drop_nan_rows(self):
         """MLB uses XGBoost native NaN handling — rows are NOT dropped."""
@@ -131,8 +146,29 @@ class TestMLBBuildFeatureMatrix:
             "GAME_OUTCOME": [1, 0],
         })
         X, y, _ = mlb_train.build_feature_matrix(df)
-        assert len(X.columns) == 108
-        assert X.isna().all().all()  # all values NaN since no feature data
+        assert X.shape[1] == 108
+        assert np.isnan(X).all()  # all values NaN since no feature data
+
+
+class TestMLBFetchTrainingData:
+
+    def test_fetches_both_statuses_concurrently(self, monkeypatch):
+        import threading
+        barrier = threading.Barrier(2, timeout=5)
+        calls = []
+
+        def fake_paginated(table, select, filters=None, order_col=None, **kwargs):
+            status = filters[0][2]
+            calls.append((table, status, order_col))
+            assert select.split(",") == mlb_train.TRAINING_COLS
+            barrier.wait()  # deadlocks (times out) unless both run at once
+            return [{"GAME_ID": status * 10 + i, "GAME_DATE": "2024-04-01T00:00:00+00:00",
+                     "GAME_OUTCOME": i % 2, "SEASON_ID": 2024} for i in range(2)]
+
+        monkeypatch.setattr(mlb_train, "fetch_paginated", fake_paginated)
+        df = mlb_train.fetch_training_data()
+        assert sorted(calls) == [("mlb_gamelogs", 3, "GAME_ID"), ("mlb_gamelogs", 4, "GAME_ID")]
+        assert df["GAME_ID"].tolist() == [30, 31, 40, 41]
 
 
 class TestMLBTimeSplit:
@@ -140,7 +176,7 @@ class TestMLBTimeSplit:
     def test_split_sizes(self):
         df = make_mlb_training_df(100)
         X, y, _ = mlb_train.build_feature_matrix(df)
-        X_train, X_test, y_train, y_test, df_test = mlb_train.time_split(X, y, df)
+        X_train, X_test, y_train, y_test, df_test, _, _ = mlb_train.time_split(X, y, df)
 
         assert len(X_train) == 80
         assert len(X_test) == 20
@@ -148,19 +184,142 @@ class TestMLBTimeSplit:
     def test_chronological_order(self):
         df = make_mlb_training_df(100)
         X, y, df2 = mlb_train.build_feature_matrix(df)
-        X_train, X_test, _, _, df_test = mlb_train.time_split(X, y, df2)
+        X_train, X_test, _, _, df_test, _, _ = mlb_train.time_split(X, y, df2)
 
-        train_max = df2.loc[X_train.index, "GAME_DATE"].max()
+        _, _, _, _, _, df_sorted, cutoff = mlb_train.time_split(X, y, df2)
+        train_max = df_sorted["GAME_DATE"].iloc[:cutoff].max()
         test_min = df_test["GAME_DATE"].min()
         assert test_min >= train_max
 
-    def test_no_index_overlap(self):
-        df = make_mlb_training_df(100)
-        X, y, _ = mlb_train.build_feature_matrix(df)
-        X_train, X_test, _, _, _ = mlb_train.time_split(X, y, df)
+    def test_rows_stay_aligned_after_sort(self):
+        df = make_mlb_training_df(100).sample(frac=1, random_state=1)
+        X, y, df2 = mlb_train.build_feature_matrix(df)
+        X_train, X_test, y_train, y_test, df_test, df_sorted, _ = mlb_train.time_split(X, y, df2)
+
+        col = mlb_train.ALL_FEATURES.index("HOME_OPS_10")
+        np.testing.assert_array_equal(np.concatenate([X_train, X_test])[:, col],
+                                      df_sorted["HOME_OPS_10"].to_numpy(dtype=np.float32))
+        np.testing.assert_array_equal(y_test, df_test["GAME_OUTCOME"].to_numpy())
 
-        overlap = set(X_train.index) & set(X_test.index)
-        assert len(overlap) == 0
+    def test_returns_sorted_df_and_cutoff(self):
+        df = make_mlb_training_df(100).sample(frac=1, random_state=0)
+        X, y, df2 = mlb_train.build_feature_matrix(df)
+        X_train, _, _, _, df_test, df_sorted, cutoff = mlb_train.time_split(X, y, df2)
+
+        assert cutoff == len(X_train) == 80
+        assert df_sorted["GAME_DATE"].is_monotonic_increasing
+        assert df_sorted.index[cutoff:].equals(df_test.index)
+
+
+class TestMLBTrainModel:
+
+    def test_hist_trees_with_early_stopping(self):
+        df = make_mlb_training_df(200)
+        X, y, df2 = mlb_train.build_feature_matrix(df)
+        X_train, X_test, y_train, y_test, _, _, _ = mlb_train.time_split(X, y, df2)
+
+        model = mlb_train.train_model(X_train, y_train, X_test, y_test)
+        assert model.get_params()["tree_method"] == "hist"
+        assert model.get_params()["n_jobs"] == mlb_train.XGB_THREADS
+        assert model.get_booster().feature_names == mlb_train.ALL_FEATURES
+        assert model.best_iteration < 300
+
+    def test_report_importances_are_sorted_gain(self, capsys):
+        df = make_mlb_training_df(200)
+        X, y, df2 = mlb_train.build_feature_matrix(df)
+        X_train, X_test, y_train, y_test, df_test, _, _ = mlb_train.time_split(X, y, df2)
+        model = mlb_train.train_model(X_train, y_train, X_test, y_test)
+
+        _, _, report = mlb_train.evaluate_model(model, X_test, y_test, df_test)
+        importances = report["feature_importances"]
+        gain = model.get_booster().get_score(importance_type="gain")
+        assert list(importances) == sorted(gain, key=gain.get, reverse=True)
+        assert set(importances) <= set(mlb_train.ALL_FEATURES)
+        assert list(importances.values()) == sorted(importances.values(), reverse=True)
+
+
+class TestMLBSeasonBreakdown:
+
+    def test_per_season_metrics(self):
+        df_test = pd.DataFrame({"SEASON_ID": [2023, 2023, 2023, 2024, 2024, np.nan]})
+        y_test = np.array([1, 0, 1, 1, 1, 0])
+        y_pred = np.array([1, 1, 1, 0, 1, 0])
+        y_prob = np.array([0.9, 0.6, 0.7, 0.4, 0.8, 0.1])
+
+        result = mlb_train.compute_season_breakdown(y_test, y_pred, y_prob, df_test)
+        assert list(result) == ["2023", "2024"]  # NaN season dropped
+        assert result["2023"] == {"season_id": 2023, "games": 3, "accuracy": 0.6667,
+                                  "roc_auc": 1.0, "home_win_rate": 0.6667}
+        # All-home season: AUC undefined
+        assert result["2024"]["roc_auc"] is None
+        assert result["2024"]["accuracy"] == 0.5
+
+    def test_interleaved_seasons_match_masked_metrics(self):
+        from sklearn.metrics import accuracy_score, roc_auc_score
+
+        rng = np.random.RandomState(7)
+        sids = rng.choice([2021, 2022, 2023], 300)
+        y_test = rng.randint(0, 2, 300)
+        y_prob = rng.rand(300)
+        y_pred = (y_prob >= 0.5).astype(int)
+
+        result = mlb_train.compute_season_breakdown(y_test, y_pred, y_prob, pd.DataFrame({"SEASON_ID": sids}))
+        assert list(result) == ["2021", "2022", "2023"]
+        for sid in (2021, 2022, 2023):
+            mask = sids == sid
+            info = result[str(sid)]
+            assert info["games"] == mask.sum()
+            assert info["accuracy"] == round(accuracy_score(y_test[mask], y_pred[mask]), 4)
+            assert info["roc_auc"] == round(roc_auc_score(y_test[mask], y_prob[mask]), 4)
+
+    def test_no_seasons(self):
+        df_test = pd.DataFrame({"SEASON_ID": [np.nan, np.nan]})
+        assert mlb_train.compute_season_breakdown(np.array([1, 0]), np.array([1, 0]),
+                                                  np.array([0.6, 0.4]), df_test) == {}
+
+
+class TestMLBFetchTodaysGames:
+
+    def test_date_range_pushed_to_query(self, monkeypatch):
+        calls = []
+
+        def fake_fetch(table, select, filters=None, **kwargs):
+            calls.append(filters)
+            assert kwargs == {"keyset_col": "GAME_ID"}  # no exact count
+            return [{"GAME_ID": "7", "GAME_DATE": "2025-06-01T00:00:00+00:00",
+                     "GAME_STATUS": 1, "PREDICTION": None, "PREDICTION_PCT": None,
+                     "HOME_OPS_10": "0.812", "AWAY_OPS_10": None}]
+
+        monkeypatch.setattr(mlb_predict, "fetch_paginated", fake_fetch)
+        df = mlb_predict.fetch_todays_games()
+
+        filters = {(method, col): val for method, col, val in calls[0]}
+        assert filters[("eq", "GAME_STATUS")] == 1
+        start = pd.Timestamp(filters[("gte", "GAME_DATE")])
+        end = pd.Timestamp(filters[("lt", "GAME_DATE")])
+        assert start.tzinfo is not None and end - start == pd.Timedelta(days=1)
+        # Rows returned by the query are kept as-is — no client-side date filter
+        assert df["GAME_ID"].tolist() == [7]
+        assert df["GAME_ID"].dtype == "Int64"
+        assert df["PREDICTION"].dtype == "Float32" and df["PREDICTION"].isna().all()
+        assert df["HOME_OPS_10"].dtype == np.float32
+        assert df["HOME_OPS_10"].iloc[0] == np.float32(0.812)
+        assert pd.isna(df["AWAY_OPS_10"].iloc[0])
+
+    def test_numeric_columns_cast_to_nullable_dtypes(self, monkeypatch):
+        rows = [{"GAME_ID": 1, "GAME_DATE": "2025-06-01T00:00:00+00:00", "PREDICTION": 1, "PREDICTION_PCT": 0.655},
+                {"GAME_ID": 2, "GAME_DATE": "2025-06-01T00:00:00+00:00", "PREDICTION": None, "PREDICTION_PCT": None}]
+        monkeypatch.setattr(mlb_predict, "fetch_paginated", lambda *a, **k: rows)
+        df = mlb_predict.fetch_todays_games()
+
+        assert df["GAME_ID"].tolist() == [1, 2]
+        assert df["PREDICTION"].dtype == "Float32"
+        assert df["PREDICTION"].isna().tolist() == [False, True]
+        assert df["PREDICTION_PCT"].iloc[0] == np.float32(0.655)
+
+    def test_no_rows_returns_empty(self, monkeypatch):
+        monkeypatch.setattr(mlb_predict, "fetch_paginated", lambda *a, **k: [])
+        assert mlb_predict.fetch_todays_games().empty
 
 
 class TestMLBLoadModel:
@@ -178,12 +337,115 @@ class TestMLBLoadModel:
         model.fit(X, y, eval_set=[(X, y)], verbose=False)
 
         model_path = tmp_path / "test_model.json"
-        model.save_model(str(model_path))
+        mlb_train.save_model(model, model_path)
 
         loaded = mlb_predict.load_model(model_path)
-        assert loaded is not None
-        probs = loaded.predict_proba(X)
-        assert probs.shape == (20, 2)
+        assert isinstance(loaded, xgb.Booster)
+        config = json.loads(loaded.save_config())
+        assert int(config["learner"]["generic_param"]["nthread"]) == mlb_predict.XGB_THREADS
+        probs = loaded.inplace_predict(X.astype(np.float32))
+        assert probs.shape == (20,)
+        np.testing.assert_allclose(probs, model.predict_proba(X)[:, 1], rtol=1e-6)
+
+    def test_reload_cached_until_file_changes(self, tmp_path):
+        import os
+        import xgboost as xgb
+
+        model = xgb.XGBClassifier(n_estimators=2, max_depth=1)
+        X = np.random.rand(20, 5)
+        model.fit(X, np.random.randint(0, 2, 20))
+        model_path = tmp_path / "test_model.json"
+        mlb_train.save_model(model, model_path)
+
+        first = mlb_predict.load_model(model_path)
+        assert mlb_predict.load_model(model_path) is first
+
+        mtime = model_path.stat().st_mtime_ns
+        os.utime(model_path, ns=(mtime + 10**9, mtime + 10**9))
+        assert mlb_predict.load_model(model_path) is not first
+
+
+class TestMLBTrainFingerprint:
+
+    def _setup(self, monkeypatch, tmp_path, stored="abc123", current="abc123"):
+        model_path = tmp_path / "mlb_winner.json"
+        model_path.write_text("{}")
+        report_path = tmp_path / "mlb_winner_report.json"
+        report_path.write_text(json.dumps({"dataset": {"fingerprint": stored}}))
+        monkeypatch.setattr(mlb_train, "MODEL_PATH", model_path)
+        monkeypatch.setattr(mlb_train, "REPORT_PATH", report_path)
+        monkeypatch.setattr(mlb_train, "training_data_fingerprint", lambda: current)
+        calls = []
+        monkeypatch.setattr(mlb_train, "main", lambda fp=None: calls.append(fp))
+        return calls
+
+    def test_current_skips_when_unchanged(self, monkeypatch, tmp_path):
+        calls = self._setup(monkeypatch, tmp_path)
+        assert mlb_train.run("current") == 0
+        assert calls == []
+
+    def test_current_trains_when_changed(self, monkeypatch, tmp_path):
+        calls = self._setup(monkeypatch, tmp_path, current="def456")
+        assert mlb_train.run("current") == 0
+        assert calls == ["def456"]
+
+    def test_current_trains_when_model_missing(self, monkeypatch, tmp_path):
+        calls = self._setup(monkeypatch, tmp_path)
+        mlb_train.MODEL_PATH.unlink()
+        mlb_train.run("current")
+        assert calls == ["abc123"]
+
+    def test_default_mode_always_trains_without_fingerprint(self, monkeypatch, tmp_path):
+        calls = self._setup(monkeypatch, tmp_path)
+
+        def fingerprint():
+            raise AssertionError("fingerprint queried outside current mode")
+
+        monkeypatch.setattr(mlb_train, "training_data_fingerprint", fingerprint)
+        mlb_train.run()
+        assert calls == [None]
+
+    def _fake_supabase(self, monkeypatch, count=10, max_id=99, updated="2025-06-01T00:00:00",
+                       updated_error=None):
+        """Single-row fingerprint queries answered by the ordered column."""
+        def table(_):
+            query = MagicMock()
+            state = {}
+            query.select.side_effect = lambda cols, **kw: state.update(cols=cols) or query
+            query.in_.return_value = query
+            query.filter.return_value = query
+            query.order.side_effect = lambda col, desc=False: state.update(col=col) or query
+            query.limit.return_value = query
+
+            def execute():
+                col = state["col"]
+                if col == "UPDATED_AT" and updated_error:
+                    raise updated_error
+                value = {"GAME_ID": max_id, "UPDATED_AT": updated, "CREATED_AT": "2025-01-01"}[col]
+                return SimpleNamespace(data=[{col: value}], count=count)
+
+            query.execute.side_effect = execute
+            return query
+
+        client = MagicMock()
+        client.table.side_effect = table
+        monkeypatch.setattr(mlb_train, "supabase", client)
+
+    def test_fingerprint_changes_on_in_place_update(self, monkeypatch):
+        self._fake_supabase(monkeypatch)
+        before = mlb_train.training_data_fingerprint()
+        self._fake_supabase(monkeypatch)
+        assert mlb_train.training_data_fingerprint() == before
+        # Same rows, same count — only UPDATED_AT moved (recomputed features)
+        self._fake_supabase(monkeypatch, updated="2025-06-02T00:00:00")
+        assert mlb_train.training_data_fingerprint() != before
+
+    def test_fingerprint_falls_back_to_created_at(self, monkeypatch):
+        self._fake_supabase(monkeypatch, updated_error=RuntimeError("column does not exist"))
+        assert len(mlb_train.training_data_fingerprint()) == 16
+
+    def test_stored_fingerprint_missing_report(self, tmp_path):
+        assert mlb_train.stored_fingerprint(tmp_path / "nope.json") is None
 
 
 class TestMLBRosterValidation:
@@ -239,3 +501,134 @@ class TestMLBRosterValidation:
         })
         has_sps = pd.notna(row.get("HOME_SP")) and pd.notna(row.get("AWAY_SP"))
         assert not has_sps
+
+
+def make_mlb_schedule_df(n=4):
+    """Scheduled games with features, full rosters and no prediction yet."""
+    df = make_mlb_training_df(n)
+    df["GAME_STATUS"] = 1
+    df["PREDICTION"] = np.nan
+    df["PREDICTION_PCT"] = np.nan
+    df["HOME_NAME"] = "Los Angeles Dodgers"
+    df["AWAY_NAME"] = "San Francisco Giants"
+    df["HOME_LINEUP"] = [list(range(100, 109)) for _ in range(n)]
+    df["AWAY_LINEUP"] = [list(range(200, 209)) for _ in range(n)]
+    df["HOME_SP"] = pd.array([501] * n, dtype="Int64")
+    df["AWAY_SP"] = pd.array([601] * n, dtype="Int64")
+    return df
+
+
+class FakeModel:
+    """Booster stand-in: home win prob = HOME_WIN_RATE_10 / 5 clipped to [0, 1]."""
+
+    def attr(self, key):
+        return None
+
+    def inplace_predict(self, X, iteration_range=(0, 0)):
+        assert X.dtype == np.float32
+        col = mlb_predict.ALL_FEATURES.index("HOME_WIN_RATE_10")
+        return np.clip(X[:, col] / 5.0, 0, 1)
+
+
+class TestMLBRosterChecks:
+
+    def test_flags_each_missing_piece(self):
+        df = make_mlb_schedule_df(4)
+        df.at[1, "HOME_LINEUP"] = None
+        df.at[2, "AWAY_LINEUP"] = []
+        df.loc[3, "AWAY_SP"] = pd.NA
+
+        checks = mlb_predict.roster_checks(df)
+        assert list(checks.columns) == mlb_predict.ROSTER_COLS
+        assert checks.all(axis=1).tolist() == [True, False, False, False]
+        assert not checks.loc[1, "HOME_LINEUP"]
+        assert not checks.loc[2, "AWAY_LINEUP"]
+        assert not checks.loc[3, "AWAY_SP"]
+
+
+class TestMLBPredictAndWrite:
+
+    def test_skips_incomplete_and_predicts_rest(self, monkeypatch):
+        client = MagicMock()
+        monkeypatch.setattr(mlb_predict, "supabase", client)
+        df = make_mlb_schedule_df(4)
+        df.at[0, "HOME_LINEUP"] = []
+        df.loc[1, "HOME_SP"] = pd.NA
+
+        predicted, skipped = mlb_predict.predict_and_write(FakeModel(), df)
+        assert skipped == 2
+        assert predicted["GAME_ID"].tolist() == [3, 4]
+        assert set(predicted["PREDICTION"]) <= {0, 1}
+        assert predicted["PREDICTION_PCT"].between(0, 1).all()
+
+        # One batched upsert carrying only the prediction columns
+        client.table.return_value.upsert.assert_called_once()
+        payload = client.table.return_value.upsert.call_args.args[0]
+        assert [r["GAME_ID"] for r in payload] == [3, 4]
+        assert all(set(r) == {"GAME_ID", "PREDICTION", "PREDICTION_PCT"} for r in payload)
+        assert all(type(r["GAME_ID"]) is int and type(r["PREDICTION"]) is int for r in payload)
+        assert [r["PREDICTION_PCT"] for r in payload] == [
+            round(float(p), 3) for p in predicted["PREDICTION_PCT"]]
+        assert client.table.return_value.upsert.call_args.kwargs == {"on_conflict": "GAME_ID"}
+        client.table.return_value.update.assert_not_called()
+
+    def test_real_booster_uses_best_iteration(self, monkeypatch, tmp_path):
+        import xgboost as xgb
+
+        monkeypatch.setattr(mlb_predict, "supabase", MagicMock())
+        train = make_mlb_training_df(200)
+        X = mlb_train.add_diff_features(train)[mlb_predict.ALL_FEATURES].to_numpy(dtype=np.float32)
+        y = train["GAME_OUTCOME"].to_numpy()
+        clf = xgb.XGBClassifier(n_estimators=50, max_depth=2, early_stopping_rounds=3)
+        clf.fit(X[:150], y[:150], eval_set=[(X[150:], y[150:])], verbose=False)
+        assert clf.best_iteration + 1 < 50  # stopped early
+
+        model_path = tmp_path / "model.json"
+        mlb_train.save_model(clf, model_path)
+        df = make_mlb_schedule_df(5)
+        predicted, _ = mlb_predict.predict_and_write(mlb_predict.load_model(model_path), df)
+
+        expected = clf.predict_proba(mlb_train.add_diff_features(df)[mlb_predict.ALL_FEATURES].to_numpy(dtype=np.float32))[:, 1]
+        np.testing.assert_allclose(predicted["PREDICTION_PCT"], expected, rtol=1e-6)
+
+    def test_batch_failure_falls_back_to_updates(self, monkeypatch):
+        client = MagicMock()
+        client.table.return_value.upsert.return_value.execute.side_effect = RuntimeError("nope")
+        monkeypatch.setattr(mlb_predict, "supabase", client)
+
+        mlb_predict.predict_and_write(FakeModel(), make_mlb_schedule_df(3))
+        update = client.table.return_value.update
+        assert update.call_count == 3
+        assert set(update.call_args.args[0]) == {"PREDICTION", "PREDICTION_PCT"}
+
+    def test_already_predicted_not_rewritten(self, monkeypatch):
+        client = MagicMock()
+        monkeypatch.setattr(mlb_predict, "supabase", client)
+        df = make_mlb_schedule_df(2)
+        df["PREDICTION"] = 1.0
+
+        predicted, skipped = mlb_predict.predict_and_write(FakeModel(), df)
+        assert predicted.empty and skipped == 0
+        client.table.assert_not_called()
+
+
+class TestMLBPrintPredictions:
+
+    def test_rows_formatted_in_date_order(self, capsys):
+        df = pd.DataFrame({
+            "GAME_ID": [1, 2, 3],
+            "GAME_DATE": pd.to_datetime(["2025-06-02", "2025-06-01", "2025-06-01"], utc=True),
+            "AWAY_NAME": ["San Francisco Giants", None, "Chicago Cubs"],
+            "HOME_NAME": ["Los Angeles Dodgers", "Boston Red Sox", "St. Louis Cardinals"],
+            "PREDICTION": [1.0, 0.0, np.nan],
+            "PREDICTION_PCT": [0.654, 0.3, np.nan],
+        })
+        new = pd.DataFrame({"GAME_ID": [3], "PREDICTION": [0], "PREDICTION_PCT": [0.25]})
+
+        mlb_predict.print_predictions(df, new)
+        rows = [line for line in capsys.readouterr().out.splitlines() if " @  " in line]
+        assert rows == [
+            "  ???                        @  Boston Red Sox             ???       70.0%  EXISTING",
+            "  Chicago Cubs               @  St. Louis Cardinals        Chicago   75.0%  NEW",
+            "  San Francisco Giants       @  Los Angeles Dodgers        Los Ang   65.4%  EXISTING",
+        ]
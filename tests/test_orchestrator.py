@@ -11,6 +11,7 @@ Tests the pipeline script structure and configuration:
 
 import os
 import sys
+import tempfile
 from pathlib import Path
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
@@ -140,3 +141,461 @@ class TestGitHubActionsExist:
         for name in ["nba-pipeline.yml", "mlb-pipeline.yml"]:
             path = REPO_ROOT / ".github" / "workflows" / name
             assert path.stat().st_size > 100, f"{name} appears to be empty"
+
+
+def _load_mlb_orchestrator():
+    import importlib.util
+    path = REPO_ROOT / "mlb-pipeline" / "run_pipeline.py"
+    spec = importlib.util.spec_from_file_location("mlb_run_pipeline", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    # keep step timing records out of the working tree
+    mod.TIMINGS_PATH = os.path.join(tempfile.gettempdir(), "edgemaster_test_timings.jsonl")
+    return mod
+
+
+class _FakeStep:
+    """Stand-in for a src/<step>.py module exposing run(mode)."""
+
+    def __init__(self, rc=0, exc=None):
+        self.rc = rc
+        self.exc = exc
+        self.calls = []
+
+    def run(self, mode=None):
+        self.calls.append(mode)
+        if self.exc is not None:
+            raise self.exc
+        return self.rc
+
+
+class TestMLBRunScriptInProcess:
+
+    def test_calls_run_with_mode(self):
+        mod = _load_mlb_orchestrator()
+        step = _FakeStep()
+        mod._MODULES["games"] = step
+        assert mod.run_script("games.py", "current") is True
+        assert step.calls == ["current"]
+
+    def test_module_is_reused(self):
+        mod = _load_mlb_orchestrator()
+        step = _FakeStep()
+        mod._MODULES["games"] = step
+        mod.run_script("games.py", "current")
+        mod.run_script("games.py", "current")
+        assert mod.load_step("games.py") is step
+        assert len(step.calls) == 2
+
+    def test_nonzero_exit_code_fails(self):
+        mod = _load_mlb_orchestrator()
+        mod._MODULES["games"] = _FakeStep(rc=1)
+        assert mod.run_script("games.py", "bogus") is False
+
+    def test_exception_and_sys_exit_fail(self):
+        mod = _load_mlb_orchestrator()
+        mod._MODULES["train"] = _FakeStep(exc=SystemExit(1))
+        mod._MODULES["predict"] = _FakeStep(exc=RuntimeError("boom"))
+        assert mod.run_script("train.py") is False
+        assert mod.run_script("predict.py") is False
+
+
+class TestMLBLiveDaemon:
+
+    def test_stops_on_sigterm_after_iteration(self, monkeypatch, tmp_path):
+        import signal
+
+        mod = _load_mlb_orchestrator()
+        monkeypatch.setattr(mod, "LIVE_LOCK_PATH", str(tmp_path / "live.lock"))
+        monkeypatch.setattr(mod, "_has_games_today", lambda: True)
+        iterations = []
+
+        def fake_run_steps(steps):
+            iterations.append(list(steps))
+            os.kill(os.getpid(), signal.SIGTERM)
+            return None
+
+        monkeypatch.setattr(mod, "run_steps", fake_run_steps)
+        old_term = signal.getsignal(signal.SIGTERM)
+        old_int = signal.getsignal(signal.SIGINT)
+        try:
+            mod.run_live_daemon(interval=0)
+        finally:
+            signal.signal(signal.SIGTERM, old_term)
+            signal.signal(signal.SIGINT, old_int)
+
+        assert iterations == [mod.LIVE_STEPS]
+
+
+class TestMLBStepDag:
+
+    def _record_runs(self, mod, monkeypatch, fail=()):
+        import threading
+        order = []
+        lock = threading.Lock()
+
+        def fake_run_script(name, mode=None, final_exec=False):
+            with lock:
+                order.append(name)
+            return name not in fail
+
+        monkeypatch.setattr(mod, "run_script", fake_run_script)
+        return order
+
+    def test_dependencies_run_first(self, monkeypatch):
+        mod = _load_mlb_orchestrator()
+        order = self._record_runs(mod, monkeypatch)
+        steps = [("games.py", "current"), ("players.py", "current"),
+                 ("playerstats.py", "current"), ("gamelogs.py", "current"),
+                 ("train.py", None), ("predict.py", None)]
+
+        assert mod.run_dag(steps) is None
+        assert sorted(order) == sorted(s for s, _ in steps)
+        for script, deps in mod.STEP_DEPS.items():
+            for dep in deps:
+                assert order.index(dep) < order.index(script)
+
+    def test_failure_blocks_dependents(self, monkeypatch):
+        mod = _load_mlb_orchestrator()
+        order = self._record_runs(mod, monkeypatch, fail={"playerstats.py"})
+        steps = [("games.py", "full"), ("players.py", "full"),
+                 ("playerstats.py", "full"), ("gamelogs.py", "full")]
+
+        assert mod.run_dag(steps) == "playerstats.py"
+        assert "gamelogs.py" not in order
+
+    def test_deps_outside_step_list_are_ignored(self, monkeypatch):
+        mod = _load_mlb_orchestrator()
+        order = self._record_runs(mod, monkeypatch)
+        assert mod.run_dag(mod.LIVE_STEPS) is None
+        assert order == ["games.py", "gamelogs.py", "predict.py"]
+
+    def test_memory_budget_serializes_steps(self, monkeypatch):
+        import threading
+        import time
+        mod = _load_mlb_orchestrator()
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def fake_run_script(name, mode=None):
+            with lock:
+                active.append(name)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(name)
+            return True
+
+        monkeypatch.setattr(mod, "run_script", fake_run_script)
+        steps = [("games.py", "full"), ("players.py", "full")]
+        # 1 GB budget: games.py (1.0) and players.py (0.5) can't overlap
+        assert mod.run_dag(steps, memory_gb=1.0) is None
+        assert max(peak) == 1
+
+    def test_oversized_step_still_runs_alone(self, monkeypatch):
+        mod = _load_mlb_orchestrator()
+        order = self._record_runs(mod, monkeypatch)
+        assert mod.run_dag([("train.py", None)], memory_gb=0.5) is None
+        assert order == ["train.py"]
+
+
+class TestMLBRunScriptIsolated:
+
+    def _setup(self, monkeypatch, tmp_path, body):
+        mod = _load_mlb_orchestrator()
+        (tmp_path / "games.py").write_text(body)
+        monkeypatch.setattr(mod, "SRC_DIR", str(tmp_path))
+        monkeypatch.setattr(mod, "PIPELINE_DIR", str(tmp_path))
+        monkeypatch.setattr(mod, "ISOLATED", True)
+        return mod
+
+    def test_forwards_child_output(self, monkeypatch, tmp_path, caplog):
+        import logging
+        mod = self._setup(monkeypatch, tmp_path,
+                          "import sys\nprint('hello from', sys.argv[1])\n")
+        with caplog.at_level(logging.INFO):
+            assert mod.run_script("games.py", "current") is True
+        assert "[games.py] hello from current" in caplog.text
+
+    def test_nonzero_exit_fails(self, monkeypatch, tmp_path):
+        mod = self._setup(monkeypatch, tmp_path, "import sys\nsys.exit(3)\n")
+        assert mod.run_script("games.py", "current") is False
+
+    def test_deadline_kills_hung_step(self, monkeypatch, tmp_path):
+        mod = self._setup(monkeypatch, tmp_path, "import time\ntime.sleep(30)\n")
+        monkeypatch.setitem(mod.STEP_DEADLINE_SEC, ("games.py", "current"), 0.5)
+        assert mod.run_script("games.py", "current") is False
+
+
+class TestMLBLiveLock:
+
+    def test_skips_when_previous_run_active(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("LIVE_JITTER_SEC", "0")
+        from filelock import FileLock
+        mod = _load_mlb_orchestrator()
+        lock_path = str(tmp_path / "live.lock")
+        monkeypatch.setattr(mod, "LIVE_LOCK_PATH", lock_path)
+        monkeypatch.setattr(mod, "_has_games_today", lambda: True)
+        calls = []
+        monkeypatch.setattr(mod, "run_steps", lambda steps, **kw: calls.append(steps))
+
+        held = FileLock(lock_path)
+        held.acquire(timeout=0)
+        try:
+            mod.run_live()  # returns cleanly instead of sys.exit
+        finally:
+            held.release()
+
+        assert calls == []
+
+    def test_runs_and_releases_lock(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("LIVE_JITTER_SEC", "0")
+        from filelock import FileLock
+        mod = _load_mlb_orchestrator()
+        lock_path = str(tmp_path / "live.lock")
+        monkeypatch.setattr(mod, "LIVE_LOCK_PATH", lock_path)
+        monkeypatch.setattr(mod, "_has_games_today", lambda: True)
+        calls = []
+        monkeypatch.setattr(mod, "run_steps", lambda steps, **kw: calls.append(steps))
+
+        mod.run_live()
+
+        assert calls == [mod.LIVE_STEPS]
+        FileLock(lock_path).acquire(timeout=0)  # free again
+
+    def test_stale_holder_is_reported_not_killed(self, monkeypatch, tmp_path, caplog):
+        import json
+        import time
+        mod = _load_mlb_orchestrator()
+        lock_path = str(tmp_path / "live.lock")
+        monkeypatch.setattr(mod, "LIVE_LOCK_PATH", lock_path)
+        with open(lock_path + ".info", "w") as f:
+            json.dump({"pid": 999999, "heartbeat": time.time() - 2 * mod.STALE_LOCK_SEC}, f)
+        killed = []
+        monkeypatch.setattr(mod.os, "kill", lambda pid, sig: killed.append(pid))
+
+        with caplog.at_level("WARNING"):
+            mod._report_stale_lock()
+        assert killed == []
+        assert "999999" in caplog.text
+
+    def test_live_holder_heartbeat_keeps_updating(self, monkeypatch, tmp_path):
+        import json
+        import time
+        mod = _load_mlb_orchestrator()
+        lock_path = str(tmp_path / "live.lock")
+        monkeypatch.setattr(mod, "LIVE_LOCK_PATH", lock_path)
+        monkeypatch.setattr(mod, "HEARTBEAT_SEC", 0.02)
+        killed = []
+        monkeypatch.setattr(mod.os, "kill", lambda pid, sig: killed.append(pid))
+
+        def heartbeat():
+            with open(lock_path + ".info") as f:
+                return json.load(f)["heartbeat"]
+
+        lock = mod.acquire_live_lock()
+        try:
+            first = heartbeat()
+            time.sleep(0.2)
+            assert heartbeat() > first  # refreshed while held
+            assert mod.acquire_live_lock() is None  # second run skips
+            assert killed == []
+        finally:
+            mod.release_live_lock(lock)
+
+        time.sleep(0.05)  # let an in-flight write land
+        last = heartbeat()
+        time.sleep(0.1)
+        assert heartbeat() == last  # thread stopped on release
+
+
+class TestMLBLiveJitter:
+
+    def test_sleeps_within_configured_window(self, monkeypatch, tmp_path):
+        mod = _load_mlb_orchestrator()
+        monkeypatch.setattr(mod, "LIVE_LOCK_PATH", str(tmp_path / "live.lock"))
+        monkeypatch.setattr(mod, "_has_games_today", lambda: True)
+        monkeypatch.setattr(mod, "run_steps", lambda steps, **kw: None)
+        monkeypatch.setenv("LIVE_JITTER_SEC", "5")
+        slept = []
+        monkeypatch.setattr(mod.time, "sleep", lambda s: slept.append(s))
+
+        mod.run_live()
+
+        assert len(slept) == 1 and 0 <= slept[0] <= 5
+
+    def test_zero_disables_jitter(self, monkeypatch, tmp_path):
+        mod = _load_mlb_orchestrator()
+        monkeypatch.setattr(mod, "LIVE_LOCK_PATH", str(tmp_path / "live.lock"))
+        monkeypatch.setattr(mod, "_has_games_today", lambda: True)
+        monkeypatch.setattr(mod, "run_steps", lambda steps, **kw: None)
+        monkeypatch.setenv("LIVE_JITTER_SEC", "0")
+        slept = []
+        monkeypatch.setattr(mod.time, "sleep", lambda s: slept.append(s))
+
+        mod.run_live()
+
+        assert slept == []
+
+
+class TestMLBGamesTodayProbe:
+
+    class _Resp:
+        def __init__(self, total):
+            self.total = total
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"totalGames": self.total}
+
+    def test_no_games_skips_live(self, monkeypatch, tmp_path):
+        mod = _load_mlb_orchestrator()
+        monkeypatch.setattr(mod, "LIVE_LOCK_PATH", str(tmp_path / "live.lock"))
+        monkeypatch.setattr(mod.requests, "get", lambda *a, **k: self._Resp(0))
+        calls = []
+        monkeypatch.setattr(mod, "run_steps", lambda steps, **kw: calls.append(steps))
+
+        mod.run_live()
+        assert calls == []
+
+    def test_answer_is_cached(self, monkeypatch):
+        mod = _load_mlb_orchestrator()
+        probes = []
+
+        def fake_get(*args, **kwargs):
+            probes.append(kwargs["params"]["date"])
+            return self._Resp(15)
+
+        monkeypatch.setattr(mod.requests, "get", fake_get)
+        assert mod._has_games_today() is True
+        assert mod._has_games_today() is True
+        assert len(probes) == 1
+
+    def test_probe_failure_fails_open(self, monkeypatch):
+        mod = _load_mlb_orchestrator()
+
+        def boom(*args, **kwargs):
+            raise ConnectionError("statsapi down")
+
+        monkeypatch.setattr(mod.requests, "get", boom)
+        assert mod._has_games_today() is True
+
+
+class TestMLBFinalExec:
+
+    def test_isolated_final_step_execs(self, monkeypatch):
+        mod = _load_mlb_orchestrator()
+        monkeypatch.setattr(mod, "ISOLATED", True)
+        execs = []
+        monkeypatch.setattr(mod.os, "chdir", lambda path: None)
+        monkeypatch.setattr(mod.os, "execv", lambda exe, argv: execs.append(argv))
+        monkeypatch.setattr(mod, "_run_isolated", lambda name, mode, label: 0)
+
+        assert mod.run_steps(mod.LIVE_STEPS, final_exec=True) is None
+        assert len(execs) == 1
+        assert execs[0][1].endswith("predict.py")
+
+    def test_in_process_ignores_final_exec(self, monkeypatch):
+        mod = _load_mlb_orchestrator()
+        step = _FakeStep()
+        mod._MODULES["predict"] = step
+        monkeypatch.setattr(mod.os, "execv", lambda *a: _fail_execv())
+
+        assert mod.run_script("predict.py", final_exec=True) is True
+        assert step.calls == [None]
+
+
+def _fail_execv():
+    raise AssertionError("os.execv should not be called in-process")
+
+
+class TestMLBHistoricalCheckpoint:
+
+    STEPS = [("games.py", "full"), ("players.py", "full"),
+             ("playerstats.py", "full"), ("gamelogs.py", "full")]
+
+    def _setup(self, monkeypatch, tmp_path, fail=()):
+        mod = _load_mlb_orchestrator()
+        monkeypatch.setattr(mod, "CHECKPOINT_PATH", str(tmp_path / ".state.json"))
+        ran = []
+
+        def fake_run_script(name, mode=None, final_exec=False):
+            ran.append(name)
+            return name not in fail
+
+        monkeypatch.setattr(mod, "run_script", fake_run_script)
+        return mod, ran
+
+    def test_successes_are_recorded(self, monkeypatch, tmp_path):
+        mod, ran = self._setup(monkeypatch, tmp_path, fail={"gamelogs.py"})
+        assert mod.run_dag(self.STEPS, state={}) == "gamelogs.py"
+        state = mod.load_checkpoint()
+        assert set(state) == {"games.py", "players.py", "playerstats.py"}
+
+    def test_resume_skips_completed_steps(self, monkeypatch, tmp_path):
+        mod, ran = self._setup(monkeypatch, tmp_path, fail={"gamelogs.py"})
+        mod.run_dag(self.STEPS, state={})
+
+        mod, ran = self._setup(monkeypatch, tmp_path)
+        assert mod.run_dag(self.STEPS, state=mod.load_checkpoint()) is None
+        assert ran == ["gamelogs.py"]
+
+    def test_stale_dependency_forces_rerun(self, monkeypatch, tmp_path):
+        mod, ran = self._setup(monkeypatch, tmp_path)
+        # players.py finished after playerstats.py last time → redo playerstats
+        state = {"games.py": 1.0, "players.py": 3.0, "playerstats.py": 2.0}
+        assert mod.run_dag(self.STEPS, state=state) is None
+        assert ran == ["playerstats.py", "gamelogs.py"]
+
+    def test_all_steps_checkpointed_runs_nothing(self, monkeypatch, tmp_path):
+        mod, ran = self._setup(monkeypatch, tmp_path)
+        state = {"games.py": 1.0, "players.py": 2.0, "playerstats.py": 3.0, "gamelogs.py": 4.0}
+        assert mod.run_dag(self.STEPS, state=state) is None
+        assert ran == []
+
+
+class TestMLBStepTimings:
+
+    def test_run_script_appends_jsonl_record(self, monkeypatch, tmp_path):
+        import json
+        mod = _load_mlb_orchestrator()
+        path = tmp_path / "timings.jsonl"
+        monkeypatch.setattr(mod, "TIMINGS_PATH", str(path))
+        monkeypatch.setattr(mod, "PIPELINE_MODE", "live")
+        mod._MODULES["games"] = _FakeStep()
+        mod._MODULES["predict"] = _FakeStep(rc=1)
+
+        mod.run_script("games.py", "current")
+        mod.run_script("predict.py")
+
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [(r["mode"], r["script"], r["step_mode"], r["rc"]) for r in records] == [
+            ("live", "games.py", "current", 0),
+            ("live", "predict.py", None, 1),
+        ]
+        assert all(r["elapsed"] >= 0 for r in records)
+
+    def test_report_summarizes_percentiles(self):
+        import importlib.util
+        import pandas as pd
+        spec = importlib.util.spec_from_file_location(
+            "mlb_report", REPO_ROOT / "mlb-pipeline" / "report.py")
+        report = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(report)
+
+        df = pd.DataFrame({
+            "mode": ["live"] * 4,
+            "script": ["games.py"] * 4,
+            "elapsed": [1.0, 2.0, 3.0, 10.0],
+            "rc": [0, 0, 1, 0],
+            "start": [0, 1, 2, 3],
+        })
+        table = report.summarize(df)
+        row = table.loc[("live", "games.py")]
+        assert row["runs"] == 4
+        assert row["failed"] == 1
+        assert row["p50"] == 2.5
+        assert row["max"] == 10.0